@@ -34,12 +34,6 @@ from qgis.PyQt.QtCore import QT_VERSION_STR, QSettings  # NOQA We can't move to
 from raven.handlers.logging import SentryHandler  # NOQA
 from safe.common.utilities import log_file_path  # NOQA
 from safe.common.version import get_version  # NOQA
-from safe.definitions.provenance import (
-    provenance_gdal_version,
-    provenance_os,
-    provenance_qgis_version,
-    provenance_qt_version,
-)  # NOQA
 from safe.definitions.sentry import PRODUCTION_SERVER  # NOQA
 from safe.utilities.i18n import tr  # NOQA
 from safe.utilities.gis import qgis_version_detailed  # NOQA
@@ -168,6 +162,15 @@ def setup_logger(logger_name, log_file=None, sentry_url=None):
     environment_flag = 'INASAFE_SENTRY' in os.environ
 
     if environment_flag or qsettings_flag:
+        # The provenance definitions are imported only if Sentry is used,
+        # they are not needed when QGIS is loading the plugin.
+        from safe.definitions.provenance import (
+            provenance_gdal_version,
+            provenance_os,
+            provenance_qgis_version,
+            provenance_qt_version,
+        )
+
         if sentry_url is None:
             sentry_url = PRODUCTION_SERVER
 
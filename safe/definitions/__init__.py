@@ -1,32 +1,96 @@
 # coding=utf-8
 
-# pylint: disable=wildcard-import
+"""Definitions of InaSAFE.
+
+Importing a single module, like safe.definitions.versions, doesn't import
+the other definition modules. They are imported the first time a name of
+this package is used, so their strings are translated when they are needed
+and not when QGIS is loading the plugin. Names are looked up in the modules
+in this order, like the wildcard imports used before.
+
+Until then, a name which is also the name of an imported module, like
+concepts or layer_purposes, is the module. Import these definitions from
+their module.
+
+.. versionchanged:: 5.0
+"""
+
+from importlib import import_module
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
 __license__ = "GPL version 3"
 __email__ = "info@inasafe.org"
 __revision__ = '$Format:%H$'
 
-from safe.definitions.analysis_steps import *
-from safe.definitions.caveats import *
-from safe.definitions.concepts import *
-from safe.definitions.constants import *
-from safe.definitions.default_values import *
-from safe.definitions.exposure import *
-from safe.definitions.exposure_classifications import *
-from safe.definitions.extra_keywords import *
-from safe.definitions.field_groups import *
-from safe.definitions.fields import *
-from safe.definitions.hazard import *
-from safe.definitions.hazard_category import *
-from safe.definitions.hazard_classifications import *
-from safe.definitions.keyword_properties import *
-from safe.definitions.layer_geometry import *
-from safe.definitions.layer_modes import *
-from safe.definitions.layer_purposes import *
-from safe.definitions.messages import *
-from safe.definitions.minimum_needs import *
-from safe.definitions.provenance import *
-from safe.definitions.reports import *
-from safe.definitions.units import *
-from safe.definitions.versions import *
+_definition_modules = [
+    'analysis_steps',
+    'caveats',
+    'concepts',
+    'constants',
+    'default_values',
+    'exposure',
+    'exposure_classifications',
+    'extra_keywords',
+    'field_groups',
+    'fields',
+    'hazard',
+    'hazard_category',
+    'hazard_classifications',
+    'keyword_properties',
+    'layer_geometry',
+    'layer_modes',
+    'layer_purposes',
+    'messages',
+    'minimum_needs',
+    'provenance',
+    'reports',
+    'units',
+    'versions',
+]
+_loaded = False
+
+
+def _load():
+    """Import the definition modules and copy their public names here."""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    for module_name in _definition_modules:
+        module = import_module('safe.definitions.' + module_name)
+        names = getattr(module, '__all__', None)
+        if names is None:
+            names = [name for name in vars(module) if not name[0] == '_']
+        globals().update((name, getattr(module, name)) for name in names)
+
+
+def __getattr__(name):
+    """Get a definition, the definition modules are imported if needed.
+
+    :param name: The name of the definition.
+    :type name: str
+
+    :returns: The definition.
+    :rtype: object
+
+    :raises: AttributeError
+    """
+    if name.startswith('__'):
+        raise AttributeError(name)
+    _load()
+    try:
+        return globals()[name]
+    except KeyError:
+        raise AttributeError(
+            'module {module} has no attribute {name}'.format(
+                module=__name__, name=name))
+
+
+def __dir__():
+    """Names of the package, with all the definitions.
+
+    :returns: The sorted names.
+    :rtype: list
+    """
+    _load()
+    return sorted(globals())
@@ -22,6 +22,17 @@ inasafe_default_settings = {
     'developer_mode': False,
     'generate_report': True,
     'memory_profile': False,
+    # Number of processes for the intersection, union and clip.
+    'overlay_workers': 1,
+    # Sample a raster hazard instead of polygonizing it, for a point or a
+    # continuous raster exposure.
+    'raster_hazard_sampling': False,
+    # Number of processes for the exposures of a multi exposure analysis.
+    'multi_exposure_workers': 1,
+    # Cache of the prepared hazard and aggregate hazard layers.
+    'prepared_layers_cache': False,
+    # Maximum size of the cache, in megabytes.
+    'prepared_layers_cache_size': 1024,
 
     'ISO19115_ORGANIZATION': 'InaSAFE.org',
     'ISO19115_URL': 'http://inasafe.org',
@@ -36,6 +47,8 @@ inasafe_default_settings = {
 
     'keywordCachePath': join(
         QgsApplication.qgisSettingsDirPath(), 'inasafe', 'metadata.db'),
+    'prepared_layers_cache_path': join(
+        QgsApplication.qgisSettingsDirPath(), 'inasafe', 'prepared_layers'),
 
     # Make sure first to not have cyclic import
     'organisation_logo_path': supporters_logo_path(),
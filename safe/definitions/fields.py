@@ -4,7 +4,7 @@
 
 from qgis.PyQt.QtCore import QVariant
 
-from safe.definitions import concepts
+from safe.definitions.concepts import concepts
 from safe.definitions.constants import (
     qvariant_whole_numbers, qvariant_numbers, qvariant_all)
 from safe.definitions.currencies import currencies
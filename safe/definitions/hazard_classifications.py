@@ -9,7 +9,7 @@ Minimum value IS NOT included, but maximum value IS included to the range.
 Mathematical expression:
 minimum_value < x <= maximum_value
 """
-from safe.definitions import concepts
+from safe.definitions.concepts import concepts
 from safe.definitions.constants import big_number
 from safe.definitions.earthquake import (
     earthquake_fatality_rate, current_earthquake_model_name)
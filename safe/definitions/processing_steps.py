@@ -135,6 +135,12 @@ reclassify_raster_steps = {
     'output_layer_name': '%s_reclassified',
 }
 
+sample_raster_hazard_steps = {
+    'step_name': tr('Sampling the hazard raster'),
+    'output_layer_name': 'exposure_hazard_sampled',
+    'gdal_layer_name': 'aggregation'
+}
+
 zonal_stats_steps = {
     'step_name': tr('Zonal statistics'),
     'output_layer_name': 'zonal_stats',
@@ -233,6 +233,11 @@ provenance_debug_mode = {
     'name': tr('Debug Mode'),
     'provenance_key': 'debug'
 }
+provenance_prepared_layers_cache = {
+    'key': 'provenance_prepared_layers_cache',
+    'name': tr('Prepared Layers From Cache'),
+    'provenance_key': 'prepared_layers_cache'
+}
 
 # Output layer path
 provenance_layer_exposure_summary = {
@@ -265,6 +270,11 @@ provenance_layer_profiling = {
     'name': layer_purpose_profiling['name'],
     'provenance_key': layer_purpose_profiling['key']
 }
+provenance_profiling_trace = {
+    'key': 'provenance_profiling_trace',
+    'name': tr('Profiling Trace'),
+    'provenance_key': layer_purpose_profiling['key'] + '_trace'
+}
 
 # Layers ID
 provenance_layer_exposure_summary_id = {
@@ -324,6 +334,7 @@ provenance_list = [
     provenance_map_title,
     provenance_notes,
     provenance_os,
+    provenance_prepared_layers_cache,
     provenance_pyqt_version,
     provenance_qgis_version,
     provenance_qt_version,
@@ -338,6 +349,7 @@ provenance_list = [
     provenance_layer_analysis_impacted,
     provenance_layer_exposure_summary_table,
     provenance_layer_profiling,
+    provenance_profiling_trace,
     provenance_layer_exposure_summary_id,
     provenance_layer_aggregate_hazard_impacted_id,
     provenance_layer_aggregation_summary_id,
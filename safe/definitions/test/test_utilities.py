@@ -1,5 +1,7 @@
 # coding=utf-8
 """Test for utilities module."""
+import os
+import timeit
 import unittest
 from copy import deepcopy
 from tempfile import mkdtemp
@@ -85,6 +87,9 @@ from safe.definitions.utilities import (
     generate_default_profile,
     get_displacement_rate,
     is_affected,
+    HazardClassResolver,
+    DefinitionRegistry,
+    definition_registry,
 )
 
 from safe.utilities.resources import resources_path
@@ -113,6 +118,73 @@ class TestDefinitionsUtilities(unittest.TestCase):
         keyword_definition = definition(keyword)
         self.assertTrue('description' in keyword_definition)
 
+    def test_definition_registry(self):
+        """Test the registry finds the same definitions as a dir() scan."""
+        def scan(keyword, key=None):
+            for item in dir(definitions):
+                if not item.startswith("__"):
+                    var = getattr(definitions, item)
+                    if isinstance(var, dict):
+                        if (var.get('key') == keyword
+                                or var.get(key) == keyword):
+                            return var
+            return None
+
+        registry = DefinitionRegistry()
+        for var in registry.definitions:
+            for key, value in list(var.items()):
+                if isinstance(value, str):
+                    self.assertIs(registry.get(value), scan(value))
+                    self.assertIs(
+                        registry.get(value, key), scan(value, key))
+        self.assertIsNone(registry.get('Mega flux capacitor'))
+        self.assertIs(
+            definition(
+                productivity_rate_field['field_name'], 'field_name'),
+            productivity_rate_field)
+
+        self.assertIs(
+            definition_registry.classification_class(
+                generic_hazard_classes['key'], 'high'),
+            generic_hazard_classes['classes'][0])
+        self.assertIsNone(definition_registry.classification_class(
+            generic_hazard_classes['key'], 'not a class'))
+        self.assertIn(
+            generic_hazard_classes,
+            definition_registry.classifications_for_class('high'))
+        self.assertEqual(
+            definition_registry.classifications_for_class('not a class'),
+            [])
+
+    @unittest.skipIf(
+        not os.environ.get('INASAFE_BENCHMARK'),
+        'Set INASAFE_BENCHMARK to run benchmarks.')
+    def test_definition_benchmark(self):
+        """Benchmark the lookup functions."""
+        def scan(keyword):
+            for item in dir(definitions):
+                if not item.startswith("__"):
+                    var = getattr(definitions, item)
+                    if isinstance(var, dict):
+                        if var.get('key') == keyword:
+                            return var
+            return None
+
+        number = 1000
+        keyword = flood_hazard_classes['key']
+        benchmarks = [
+            ('dir() scan', lambda: scan(keyword)),
+            ('definition', lambda: definition(keyword)),
+            ('definition by field_name', lambda: definition(
+                productivity_rate_field['field_name'], 'field_name')),
+            ('get_name', lambda: get_name(keyword)),
+            ('get_class_name', lambda: get_class_name(
+                'high', generic_hazard_classes['key'])),
+        ]
+        for name, function in benchmarks:
+            duration = timeit.timeit(function, number=number)
+            print('%s: %.2f us' % (name, duration / number * 1e6))
+
     def test_get_name(self):
         """Test get_name method."""
         flood_name = get_name(hazard_flood['key'])
@@ -637,6 +709,47 @@ class TestDefinitionsUtilities(unittest.TestCase):
         # Should be 0 since it's not affected
         self.assertEqual(value, 0)
 
+    def test_hazard_class_resolver(self):
+        """Test the resolver gives the same values as the functions."""
+        qsettings = QSettings(INASAFE_TEST)
+        qsettings.clear()
+        profile = generate_default_profile()
+        class_key = flood_hazard_classes['classes'][0]['key']
+        profile[hazard_flood['key']][flood_hazard_classes['key']][class_key][
+            'displacement_rate'] = 0.5
+        set_setting('population_preference', profile, qsettings)
+
+        resolver = HazardClassResolver(qsettings)
+        for hazard, classifications in list(profile.items()):
+            for classification, classes in list(classifications.items()):
+                for hazard_class in classes:
+                    self.assertEqual(
+                        is_affected(
+                            hazard, classification, hazard_class, qsettings),
+                        resolver.is_affected(
+                            hazard, classification, hazard_class))
+                    self.assertEqual(
+                        get_displacement_rate(
+                            hazard, classification, hazard_class, qsettings),
+                        resolver.displacement_rate(
+                            hazard, classification, hazard_class))
+
+        # Random key
+        self.assertEqual(
+            not_exposed_class['key'],
+            resolver.is_affected('foo', 'bar', 'boom'))
+        self.assertEqual(0, resolver.displacement_rate('foo', 'bar', 'boom'))
+        self.assertEqual(0.0, resolver.fatality_rate('foo', 'boom'))
+
+        # Not the population, we use the classification definition.
+        self.assertEqual(
+            flood_hazard_classes['classes'][0]['affected'],
+            resolver.affected(
+                exposure_structure['key'],
+                hazard_flood['key'],
+                flood_hazard_classes['key'],
+                class_key))
+
 
 if __name__ == '__main__':
     unittest.main()
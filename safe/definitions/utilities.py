@@ -11,11 +11,8 @@ from qgis.core import QgsApplication
 
 from safe import definitions
 from safe.definitions import fields
-from safe.definitions import (
-    layer_purposes,
-    hazard_all,
-    exposure_all,
-    hazard_category_all,
+from safe.definitions.exposure import exposure_all, exposure_population
+from safe.definitions.fields import (
     aggregation_fields,
     impact_fields,
     aggregation_name_field,
@@ -23,16 +20,20 @@ from safe.definitions import (
     exposure_type_field,
     exposure_fields,
     hazard_fields,
+)
+from safe.definitions.hazard import hazard_all
+from safe.definitions.hazard_category import hazard_category_all
+from safe.definitions.hazard_classifications import (
+    hazard_classes_all, not_exposed_class)
+from safe.definitions.layer_purposes import (
+    layer_purposes,
     layer_purpose_hazard,
     layer_purpose_exposure,
     layer_purpose_aggregation,
     layer_purpose_exposure_summary,
-    exposure_population,
-    not_exposed_class,
 )
 from safe.definitions.reports.report_descriptions import (
     landscape_map_report_description, portrait_map_report_description)
-from safe.report.report_metadata import QgisComposerComponentsMetadata
 from safe.utilities.settings import setting
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
@@ -259,6 +260,164 @@ def get_non_compulsory_fields(layer_purpose, layer_subcategory=None):
     return all_fields
 
 
+class DefinitionRegistry(object):
+
+    """Index of the definition dictionaries of safe.definitions.
+
+    The module is scanned once, the first time the registry is used. Each
+    definition is then found by its key, or by another key like field_name,
+    with a dictionary lookup. As with a scan in the dir() order, the first
+    matching definition is returned.
+
+    .. versionadded:: 5.0
+    """
+
+    def __init__(self, module=None):
+        """Constructor.
+
+        :param module: The module with the definitions. If None,
+            safe.definitions is used.
+        :type module: module
+        """
+        self._module = module if module is not None else definitions
+        self._definitions = None
+        # Position of the first definition by value, for each key.
+        self._indexes = {}
+        # Classes by key, for each classification key.
+        self._classes = {}
+        # Classifications by class key.
+        self._classifications = None
+
+    def clear(self):
+        """Forget the indexes, they are built again when needed."""
+        self._definitions = None
+        self._indexes = {}
+        self._classes = {}
+        self._classifications = None
+
+    @property
+    def definitions(self):
+        """The definition dictionaries of the module, in the dir() order.
+
+        :returns: List of definitions.
+        :rtype: list
+        """
+        if self._definitions is None:
+            self._definitions = []
+            for item in dir(self._module):
+                if not item.startswith("__"):
+                    var = getattr(self._module, item)
+                    if isinstance(var, dict):
+                        self._definitions.append(var)
+        return self._definitions
+
+    def _index(self, key):
+        """Index of the definitions by the value of a key.
+
+        :param key: The key in the definitions, like 'key' or 'field_name'.
+        :type key: str
+
+        :returns: The position of the first definition for each value.
+        :rtype: dict
+        """
+        index = self._indexes.get(key)
+        if index is None:
+            index = {}
+            for position, var in enumerate(self.definitions):
+                value = var.get(key)
+                if value is None:
+                    continue
+                try:
+                    index.setdefault(value, position)
+                except TypeError:
+                    # Not hashable, it can't be a keyword.
+                    pass
+            self._indexes[key] = index
+        return index
+
+    def get(self, keyword, key=None):
+        """Get a definition by its key or by another key.
+
+        :param keyword: A keyword key.
+        :type keyword: str
+
+        :param key: A specific key for a deeper search
+        :type key: str
+
+        :returns: The first definition which has keyword for the key 'key'
+            or for key, otherwise None.
+        :rtype: dict, None
+        """
+        try:
+            hash(keyword)
+        except TypeError:
+            keyword = None
+        if keyword is None:
+            # Only a scan compares with None or an unhashable keyword.
+            for var in self.definitions:
+                if var.get('key') == keyword or var.get(key) == keyword:
+                    return var
+            return None
+
+        positions = [self._index('key').get(keyword)]
+        if key is not None:
+            positions.append(self._index(key).get(keyword))
+        positions = [
+            position for position in positions if position is not None]
+        if not positions:
+            return None
+        return self.definitions[min(positions)]
+
+    def classification_class(self, classification_key, class_key):
+        """Get a class of a classification.
+
+        :param classification_key: The key of a classification.
+        :type classification_key: str
+
+        :param class_key: The key of the class.
+        :type class_key: str
+
+        :returns: The class definition, None if it's not found.
+        :rtype: dict, None
+        """
+        classes = self._classes.get(classification_key)
+        if classes is None:
+            classes = {}
+            classification = self.get(classification_key)
+            if classification:
+                for the_class in classification.get('classes', []):
+                    classes.setdefault(the_class.get('key'), the_class)
+            self._classes[classification_key] = classes
+        return classes.get(class_key)
+
+    def classifications_for_class(self, class_key):
+        """Get the classifications which have a class.
+
+        :param class_key: The key of the class.
+        :type class_key: str
+
+        :returns: List of classification definitions.
+        :rtype: list
+        """
+        if self._classifications is None:
+            self._classifications = {}
+            for var in self.definitions:
+                classes = var.get('classes')
+                if 'key' not in var or not isinstance(classes, list):
+                    continue
+                for the_class in classes:
+                    if not isinstance(the_class, dict):
+                        continue
+                    classifications = self._classifications.setdefault(
+                        the_class.get('key'), [])
+                    if not any(c is var for c in classifications):
+                        classifications.append(var)
+        return list(self._classifications.get(class_key, []))
+
+
+definition_registry = DefinitionRegistry()
+
+
 def definition(keyword, key=None):
     """Given a keyword and a key (optional), try to get a definition
     dict for it.
@@ -284,14 +443,7 @@ def definition(keyword, key=None):
         from definitions, otherwise None if no match was found.
     :rtype: dict, None
     """
-
-    for item in dir(definitions):
-        if not item.startswith("__"):
-            var = getattr(definitions, item)
-            if isinstance(var, dict):
-                if var.get('key') == keyword or var.get(key) == keyword:
-                    return var
-    return None
+    return definition_registry.get(keyword, key)
 
 
 def get_name(key):
@@ -332,10 +484,10 @@ def get_class_name(class_key, classification_key):
     :returns: The name of the class.
     :rtype: str
     """
-    classification = definition(classification_key)
-    for the_class in classification['classes']:
-        if the_class.get('key') == class_key:
-            return the_class.get('name', class_key)
+    the_class = definition_registry.classification_class(
+        classification_key, class_key)
+    if the_class:
+        return the_class.get('name', class_key)
     return class_key
 
 
@@ -502,6 +654,9 @@ def override_component_template(component, template_path):
     :returns: New report component.
     :rtype: dict
     """
+    # The report is only imported when it's needed, not at startup.
+    from safe.report.report_metadata import QgisComposerComponentsMetadata
+
     copy_component = deepcopy(component)
     template_directory, template_filename = split(template_path)
     file_name, file_format = splitext(template_filename)
@@ -584,6 +739,9 @@ def update_template_component(
     :returns: Map report component.
     :rtype: dict
     """
+    # The report is only imported when it's needed, not at startup.
+    from safe.report.report_metadata import QgisComposerComponentsMetadata
+
     copy_component = deepcopy(component)
 
     # get the default template component from the original map report component
@@ -799,3 +957,137 @@ def is_affected(hazard, classification, hazard_class, qsettings=None):
     # noinspection PyUnresolvedReferences
     return preference_data.get(hazard, {}).get(classification, {}).get(
         hazard_class, {}).get('affected', default_affected_value)
+
+
+class HazardClassResolver(object):
+
+    """Lookup tables for hazard classes, built once per analysis.
+
+    is_affected and get_displacement_rate read the population preference
+    from QSettings and generate the default profile on each call. This class
+    reads them once and resolves affected, displacement and fatality values
+    with a dictionary lookup, so it can be used for every feature.
+    """
+
+    def __init__(self, qsettings=None):
+        """Constructor.
+
+        :param qsettings: A custom QSettings to use. If it's not defined, it
+            will use the default one.
+        :type qsettings: qgis.PyQt.QtCore.QSettings
+        """
+        default_profile = generate_default_profile()
+        preference_data = setting(
+            'population_preference',
+            default=default_profile,
+            qsettings=qsettings)
+
+        # (hazard, classification, hazard class) for the population.
+        self._population_affected = {}
+        self._displacement_rates = {}
+        for profile in [default_profile, preference_data]:
+            for hazard, classifications in list(profile.items()):
+                for classification, classes in list(classifications.items()):
+                    for hazard_class, values in list(classes.items()):
+                        key = (hazard, classification, hazard_class)
+                        if 'affected' in values:
+                            self._population_affected[key] = (
+                                values['affected'])
+                        if 'displacement_rate' in values:
+                            self._displacement_rates[key] = (
+                                values['displacement_rate'])
+
+        # (classification, hazard class) from the definitions.
+        self._affected = {}
+        self._fatality_rates = {}
+        for classification in hazard_classes_all:
+            for the_class in classification['classes']:
+                key = (classification['key'], the_class['key'])
+                self._affected[key] = the_class['affected']
+                fatality_rate = the_class.get('fatality_rate', 0.0)
+                if fatality_rate is None:
+                    fatality_rate = 0.0
+                self._fatality_rates[key] = float(fatality_rate)
+
+    def is_affected(self, hazard, classification, hazard_class):
+        """Get affected flag for the population, same as is_affected.
+
+        :param hazard: The hazard key.
+        :type hazard: basestring
+
+        :param classification: The classification key.
+        :type classification: basestring
+
+        :param hazard_class: The hazard class key.
+        :type hazard_class: basestring
+
+        :returns: True if it's affected, else False. It can be not exposed.
+        :rtype: bool, str
+        """
+        return self._population_affected.get(
+            (hazard, classification, hazard_class), not_exposed_class['key'])
+
+    def affected(self, exposure, hazard, classification, hazard_class):
+        """Get affected flag for an exposure.
+
+        The population uses the user preference, other exposures use the
+        hazard classification definition.
+
+        :param exposure: The exposure key.
+        :type exposure: basestring
+
+        :param hazard: The hazard key.
+        :type hazard: basestring
+
+        :param classification: The classification key.
+        :type classification: basestring
+
+        :param hazard_class: The hazard class key.
+        :type hazard_class: basestring
+
+        :returns: True if it's affected, else False. It can be not exposed.
+        :rtype: bool, str
+        """
+        if exposure == exposure_population['key']:
+            return self.is_affected(hazard, classification, hazard_class)
+        return self._affected.get(
+            (classification, hazard_class), not_exposed_class['key'])
+
+    def displacement_rate(self, hazard, classification, hazard_class):
+        """Get displacement rate, same as get_displacement_rate.
+
+        :param hazard: The hazard key.
+        :type hazard: basestring
+
+        :param classification: The classification key.
+        :type classification: basestring
+
+        :param hazard_class: The hazard class key.
+        :type hazard_class: basestring
+
+        :returns: The value of displacement rate. If it's not affected,
+            return 0.
+        :rtype: int
+        """
+        is_affected_value = self.is_affected(
+            hazard, classification, hazard_class)
+        if is_affected_value == not_exposed_class['key']:
+            return 0
+        elif not is_affected_value:
+            return 0
+        return self._displacement_rates.get(
+            (hazard, classification, hazard_class), 0)
+
+    def fatality_rate(self, classification, hazard_class):
+        """Get fatality rate for a hazard class.
+
+        :param classification: The classification key.
+        :type classification: basestring
+
+        :param hazard_class: The hazard class key.
+        :type hazard_class: basestring
+
+        :returns: The fatality rate, 0 if it's not defined.
+        :rtype: float
+        """
+        return self._fatality_rates.get((classification, hazard_class), 0.0)
@@ -21,12 +21,12 @@ from safe.common.utilities import (
     temp_dir,
     unique_filename
 )
-from safe.definitions import contour_id_field
 from safe.definitions.constants import NUMPY_SMOOTHING
 from safe.definitions.fields import (
     contour_colour_field,
     contour_fields,
     contour_halign_field,
+    contour_id_field,
     contour_length_field, contour_mmi_field,
     contour_roman_field, contour_valign_field,
     contour_x_field, contour_y_field
@@ -152,8 +152,8 @@ def convolve(input, weights, mask=None, slow=False):
     rows = input.shape[0]
     cols = input.shape[1]
     # Stands for half weights row.
-    hw_row = np.int(weights.shape[0] / 2)
-    hw_col = np.int(weights.shape[1] / 2)
+    hw_row = int(weights.shape[0] / 2)
+    hw_col = int(weights.shape[1] / 2)
     # Stands for full weights row.
     fw_row = weights.shape[0]
     fw_col = weights.shape[0]
@@ -229,6 +229,131 @@ def convolve(input, weights, mask=None, slow=False):
     return output
 
 
+def separate_kernel(weights):
+    """Split a 2D kernel in a column and a row kernel if it is possible.
+
+    A Gaussian kernel is the outer product of two 1D kernels, so the
+    convolution can be done with two 1D passes.
+
+    :param weights: The 2D kernel.
+    :type weights: numpy.ndarray
+
+    :returns: Tuple with the column and row kernels, or None if the kernel is
+        not separable.
+    :rtype: (numpy.ndarray, numpy.ndarray), None
+    """
+    u, s, vt = np.linalg.svd(weights)
+    if s.size > 1 and s[1] > s[0] * 1e-12:
+        return None
+    scale = np.sqrt(s[0])
+    return u[:, 0] * scale, vt[0] * scale
+
+
+def correlate_reflect(input, weights):
+    """2 dimensional correlation with reflected borders on whole arrays.
+
+    The output has the same shape as the input. Separable kernels are applied
+    with two 1D passes, other kernels with a FFT.
+
+    :param input: The 2D array.
+    :type input: numpy.ndarray
+
+    :param weights: The 2D kernel.
+    :type weights: numpy.ndarray
+
+    :returns: The correlated array.
+    :rtype: numpy.ndarray
+    """
+    rows, cols = input.shape
+    hw_row = int(weights.shape[0] / 2)
+    hw_col = int(weights.shape[1] / 2)
+    fw_row, fw_col = weights.shape
+
+    # Same reflection as tile_and_reflect, the border value is repeated.
+    padded = np.pad(
+        input.astype(np.float64),
+        ((hw_row, fw_row - hw_row - 1), (hw_col, fw_col - hw_col - 1)),
+        mode='symmetric')
+
+    kernels = separate_kernel(weights)
+    if kernels is not None:
+        column_kernel, row_kernel = kernels
+        partial = np.zeros((rows, padded.shape[1]))
+        for row in range(fw_row):
+            partial += column_kernel[row] * padded[row:row + rows, :]
+        output = np.zeros((rows, cols))
+        for column in range(fw_col):
+            output += row_kernel[column] * partial[:, column:column + cols]
+        return output
+
+    shape = padded.shape
+    spectrum = np.fft.rfft2(padded) * np.fft.rfft2(
+        weights[::-1, ::-1], s=shape)
+    full = np.fft.irfft2(spectrum, s=shape)
+    return full[fw_row - 1:fw_row - 1 + rows, fw_col - 1:fw_col - 1 + cols]
+
+
+def fast_convolve(input, weights, mask=None):
+    """2 dimensional convolution working on whole arrays.
+
+    It gives the same result as convolve, without looping over pixels.
+
+    Borders are handled with reflection.
+
+    Masking is supported in the same way as convolve:
+        * Masked points are skipped.
+        * Parts of the input which are masked have weight 0 in the kernel.
+        * The weights of the masked parts of the kernel are evenly
+          distributed over the non-masked parts.
+
+    For each pixel, the masked kernel gives:
+        sum(w * x) + (sum(weights) - sum(w)) / n * sum(x)
+    where the sums are over the non-masked neighbours. Each sum is a
+    correlation of the whole array.
+
+    :param input: The 2D array.
+    :type input: numpy.ndarray
+
+    :param weights: The 2D kernel.
+    :type weights: numpy.ndarray
+
+    :param mask: Optional boolean array, True for masked points.
+    :type mask: numpy.ndarray
+
+    :returns: The convolved array.
+    :rtype: numpy.ndarray
+    """
+    assert (len(input.shape) == 2)
+    assert (len(weights.shape) == 2)
+
+    # Only one reflection is done on each side so the weights array cannot be
+    # bigger than width/height of input +1.
+    assert (weights.shape[0] < input.shape[0] + 1)
+    assert (weights.shape[1] < input.shape[1] + 1)
+
+    if mask is None:
+        output = correlate_reflect(input, weights)
+        return output.astype(input.dtype, copy=False)
+
+    assert (input.shape == mask.shape)
+    valid = np.logical_not(mask).astype(np.float64)
+    valid_input = np.where(mask, 0.0, input)
+    # The correction is only added on non zero weights.
+    non_zero_weights = (weights != 0).astype(np.float64)
+    all_weights = np.ones(weights.shape)
+
+    weighted_sum = correlate_reflect(valid_input, weights)
+    valid_weights = correlate_reflect(valid, weights)
+    valid_sum = correlate_reflect(valid_input, non_zero_weights)
+    valid_count = correlate_reflect(valid, all_weights)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correction = (np.sum(weights) - valid_weights) / np.rint(valid_count)
+        output = weighted_sum + correction * valid_sum
+    output = np.where(mask, input, output)
+    return output.astype(input.dtype, copy=False)
+
+
 def create_smooth_contour(
         shakemap_layer,
         output_file_path='',
@@ -309,7 +434,7 @@ def smooth_shakemap(
 
     # do smoothing
     if smoothing_method == NUMPY_SMOOTHING:
-        smoothed_array = convolve(shakemap_array, gaussian_kernel(
+        smoothed_array = fast_convolve(shakemap_array, gaussian_kernel(
             smoothing_sigma))
     else:
         smoothed_array = shakemap_array
@@ -3,6 +3,7 @@
 """Reclassify a raster layer."""
 
 from os.path import isfile
+from shutil import move
 
 import numpy as np
 from osgeo import gdal
@@ -24,6 +25,15 @@ __license__ = "GPL version 3"
 __email__ = "info@inasafe.org"
 __revision__ = '$Format:%H$'
 
+# Minimum number of cells read at once, as a multiple of the GDAL block.
+minimum_window_size = 2 ** 20
+output_creation_options = [
+    'TILED=YES',
+    'BLOCKXSIZE=256',
+    'BLOCKYSIZE=256',
+    'COMPRESS=DEFLATE',
+]
+
 
 @profile
 def reclassify(layer, exposure_key=None, overwrite_input=False):
@@ -49,6 +59,10 @@ def reclassify(layer, exposure_key=None, overwrite_input=False):
         ranges[3] = [0.5, 5]
         ranges[6] = [5, None]
 
+    The raster is read and written block by block, so the memory used does
+    not depend on the size of the raster. The output is a tiled and
+    compressed GeoTIFF.
+
     :param layer: The raster layer.
     :type layer: QgsRasterLayer
 
@@ -93,45 +107,45 @@ def reclassify(layer, exposure_key=None, overwrite_input=False):
         ranges[hazard_class['value']] = thresholds[hazard_class['key']]
         value_map[hazard_class['key']] = [hazard_class['value']]
 
-    if overwrite_input:
-        output_raster = layer.source()
-    else:
-        output_raster = unique_filename(suffix='.tiff', dir=temp_dir())
+    output_raster = unique_filename(suffix='.tiff', dir=temp_dir())
 
     driver = gdal.GetDriverByName('GTiff')
 
     raster_file = gdal.Open(layer.source())
     band = raster_file.GetRasterBand(1)
     no_data = band.GetNoDataValue()
-    source = band.ReadAsArray()
-    destination = source.copy()
-
-    for value, interval in list(ranges.items()):
-        v_min = interval[0]
-        v_max = interval[1]
-
-        if v_min is None:
-            destination[np.where(source <= v_max)] = value
-        elif v_max is None:
-            destination[np.where(source > v_min)] = value
-        elif v_min < v_max:
-            destination[np.where((v_min < source) & (source <= v_max))] = value
-
-    # Tag no data cells
-    destination[np.where(source == no_data)] = no_data_value
+    edges, lookup = class_lookup(ranges)
 
     # Create the new file.
     output_file = driver.Create(
-        output_raster, raster_file.RasterXSize, raster_file.RasterYSize, 1)
-    output_file.GetRasterBand(1).WriteArray(destination)
-    output_file.GetRasterBand(1).SetNoDataValue(no_data_value)
+        output_raster,
+        raster_file.RasterXSize,
+        raster_file.RasterYSize,
+        1,
+        gdal.GDT_Byte,
+        output_creation_options)
+    output_band = output_file.GetRasterBand(1)
+    output_band.SetNoDataValue(no_data_value)
 
     # CRS
     output_file.SetProjection(raster_file.GetProjection())
     output_file.SetGeoTransform(raster_file.GetGeoTransform())
+
+    for x, y, width, height in windows(band):
+        source = band.ReadAsArray(x, y, width, height)
+        destination = reclassify_array(source, edges, lookup, no_data)
+        output_band.WriteArray(destination, x, y)
+
     output_file.FlushCache()
 
+    del output_band
     del output_file
+    del band
+    del raster_file
+
+    if overwrite_input:
+        move(output_raster, layer.source())
+        output_raster = layer.source()
 
     if not isfile(output_raster):
         raise FileNotFoundError
@@ -153,3 +167,100 @@ def reclassify(layer, exposure_key=None, overwrite_input=False):
 
     check_layer(reclassified)
     return reclassified
+
+
+def class_lookup(ranges):
+    """Lookup table to reclassify values with np.digitize.
+
+    The edges of the ranges split the values in elementary intervals. Each
+    interval is inside or outside of every range, so the class of an
+    interval is the class of the last range containing it, like when the
+    ranges are applied one after another.
+
+    :param ranges: Dictionary of class values and [min, max] intervals,
+        min excluded and max included. None is an infinite bound.
+    :type ranges: dict
+
+    :returns: Tuple with the sorted edges and the class of each interval.
+        NaN is used for values which are not in any range.
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    edges = set()
+    for v_min, v_max in list(ranges.values()):
+        edges.update(bound for bound in (v_min, v_max) if bound is not None)
+    edges = np.array(sorted(edges), dtype=np.float64)
+
+    # Interval i is ]edges[i - 1], edges[i]], open at both ends.
+    lower = np.concatenate(([-np.inf], edges))
+    upper = np.concatenate((edges, [np.inf]))
+    lookup = np.full(len(edges) + 1, np.nan)
+    for value, (v_min, v_max) in list(ranges.items()):
+        if v_min is None and v_max is None:
+            continue
+        if v_min is not None and v_max is not None and v_min >= v_max:
+            continue
+        inside = np.ones(len(lookup), dtype=bool)
+        if v_min is not None:
+            inside &= lower >= v_min
+        if v_max is not None:
+            inside &= upper <= v_max
+        lookup[inside] = value
+    return edges, lookup
+
+
+def reclassify_array(source, edges, lookup, no_data=None):
+    """Reclassify an array with a lookup table from class_lookup.
+
+    Values which are not in any range are kept.
+
+    :param source: The values.
+    :type source: numpy.ndarray
+
+    :param edges: The sorted edges of the ranges.
+    :type edges: numpy.ndarray
+
+    :param lookup: The class of each interval between the edges.
+    :type lookup: numpy.ndarray
+
+    :param no_data: The no data value of the source. Defaults to None.
+    :type no_data: float
+
+    :returns: The classes.
+    :rtype: numpy.ndarray
+    """
+    if np.issubdtype(source.dtype, np.floating):
+        # Compare with the precision of the raster, as numpy does with the
+        # python float thresholds.
+        edges = edges.astype(source.dtype)
+    classes = lookup[np.digitize(source, edges, right=True)]
+    keep = np.isnan(classes) | np.isnan(source)
+    destination = np.where(keep, source, classes)
+    if no_data is not None:
+        destination[source == no_data] = no_data_value
+    return destination
+
+
+def windows(band):
+    """Windows to read a band, aligned on its blocks.
+
+    Small blocks, like strips of one row, are grouped until the window has
+    at least minimum_window_size cells.
+
+    :param band: The raster band.
+    :type band: gdal.Band
+
+    :returns: Generator of (x offset, y offset, width, height).
+    :rtype: generator
+    """
+    block_width, block_height = band.GetBlockSize()
+    columns = band.XSize
+    rows = band.YSize
+    if block_width >= columns:
+        block_width = columns
+        block_height *= max(
+            1, minimum_window_size // (block_width * block_height))
+    for y in range(0, rows, block_height):
+        height = min(block_height, rows - y)
+        for x in range(0, columns, block_width):
+            width = min(block_width, columns - x)
+            yield x, y, width, height
@@ -0,0 +1,699 @@
+# coding=utf-8
+
+"""Sample a classified raster hazard without polygonizing it."""
+
+import numpy as np
+from osgeo import gdal, ogr, osr
+from qgis.core import (
+    QgsCoordinateTransform,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsGeometry,
+    QgsPointXY,
+    QgsProject,
+    QgsSpatialIndex,
+    QgsWkbTypes,
+)
+
+from safe.common.exceptions import InvalidKeywordsForProcessingAlgorithm
+from safe.definitions.fields import hazard_class_field, hazard_id_field
+from safe.definitions.hazard_classifications import not_exposed_class
+from safe.definitions.layer_purposes import layer_purpose_exposure_summary
+from safe.definitions.processing_steps import (
+    sample_raster_hazard_steps, union_steps)
+from safe.definitions.utilities import definition
+from safe.gis.sanity_check import check_layer
+from safe.gis.vector.tools import (
+    create_field_from_definition, create_memory_layer)
+from safe.utilities.gis import is_raster_layer, is_vector_layer
+from safe.utilities.metadata import (
+    active_classification, active_thresholds_value_maps)
+from safe.utilities.profiling import profile
+
+__copyright__ = "Copyright 2018, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+def can_sample_raster_hazard(hazard, exposure):
+    """Check if the raster sampling engine can be used for these layers.
+
+    The hazard must be a raster and the exposure a point vector layer or a
+    continuous raster. The other exposures still use the polygonize, union
+    and intersection path.
+
+    :param hazard: The hazard layer.
+    :type hazard: QgsMapLayer
+
+    :param exposure: The exposure layer.
+    :type exposure: QgsMapLayer
+
+    :returns: True if the layers can be processed by sample_raster_hazard.
+    :rtype: bool
+    """
+    if not is_raster_layer(hazard):
+        return False
+    if is_raster_layer(exposure):
+        return exposure.keywords.get('layer_mode') == 'continuous'
+    if not is_vector_layer(exposure):
+        return False
+    return exposure.geometryType() == QgsWkbTypes.PointGeometry
+
+
+class HazardGrid(object):
+
+    """A classified hazard raster, read as arrays of class ids.
+
+    The class id of a cell is the position of its hazard class in the
+    classification, starting from 1. 0 is used for cells which are not
+    exposed: no data or values which are not in the value map.
+    """
+
+    def __init__(self, hazard, exposure_key, raster=None, crs=None):
+        """Constructor.
+
+        :param hazard: The classified hazard raster.
+        :type hazard: QgsRasterLayer
+
+        :param exposure_key: The exposure key.
+        :type exposure_key: str
+
+        :param raster: The GDAL dataset to read instead of the hazard source,
+            such as the hazard warped to another grid. Defaults to None.
+        :type raster: gdal.Dataset
+
+        :param crs: The CRS of the raster dataset. Defaults to the hazard CRS.
+        :type crs: QgsCoordinateReferenceSystem
+        """
+        keywords = hazard.keywords
+        self.classification = active_classification(keywords, exposure_key)
+        value_map = active_thresholds_value_maps(keywords, exposure_key)
+        if not self.classification or not value_map:
+            raise InvalidKeywordsForProcessingAlgorithm
+
+        classes = definition(self.classification)['classes']
+        self.class_keys = [not_exposed_class['key']]
+        self.class_keys.extend(the_class['key'] for the_class in classes)
+
+        self._class_ids = {}
+        for class_id, key in enumerate(self.class_keys):
+            for value in value_map.get(key, []):
+                self._class_ids[value] = class_id
+
+        if raster is None:
+            raster = gdal.Open(hazard.source(), gdal.GA_ReadOnly)
+        self.crs = crs or hazard.crs()
+        self._raster = raster
+        self._band = raster.GetRasterBand(keywords.get('active_band', 1))
+        self._no_data = self._band.GetNoDataValue()
+
+        self.geo_transform = raster.GetGeoTransform()
+        self.projection = raster.GetProjection()
+        self.rows = raster.RasterYSize
+        self.columns = raster.RasterXSize
+
+    def read(self, row=0, rows=None):
+        """Read class ids for a block of rows.
+
+        :param row: The first row to read.
+        :type row: int
+
+        :param rows: The number of rows to read. Defaults to all the rows
+            after the first one.
+        :type rows: int
+
+        :returns: The class ids.
+        :rtype: numpy.ndarray
+        """
+        if rows is None:
+            rows = self.rows - row
+        values = self._band.ReadAsArray(0, row, self.columns, rows)
+
+        # Like polygonize, values are used as integers.
+        unique_values, inverse = np.unique(
+            values.astype(np.int64), return_inverse=True)
+        lookup = np.array(
+            [self._class_ids.get(value, 0)
+             for value in unique_values.tolist()],
+            dtype=np.int32)
+        class_ids = lookup[inverse].reshape(values.shape)
+        if self._no_data is not None:
+            class_ids[values == self._no_data] = 0
+        return class_ids
+
+    def cells(self, x, y):
+        """Row and column of coordinates in the hazard CRS.
+
+        :param x: The x coordinates.
+        :type x: numpy.ndarray
+
+        :param y: The y coordinates.
+        :type y: numpy.ndarray
+
+        :returns: Tuple of rows, columns and a boolean array, True if the
+            coordinate is inside the raster.
+        :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        origin_x, size_x, _, origin_y, _, size_y = self.geo_transform
+        columns = np.floor((x - origin_x) / size_x).astype(np.int64)
+        rows = np.floor((y - origin_y) / size_y).astype(np.int64)
+        inside = (
+            (rows >= 0) & (rows < self.rows)
+            & (columns >= 0) & (columns < self.columns))
+        return np.where(inside, rows, 0), np.where(inside, columns, 0), inside
+
+    def vector_source(self, geometries, boundary=False):
+        """Create an OGR memory layer to rasterize on the hazard grid.
+
+        :param geometries: List of geometries in the hazard CRS. The burned
+            value is the position in the list, starting from 1.
+        :type geometries: list
+
+        :param boundary: Use the boundaries instead of the polygons.
+        :type boundary: bool
+
+        :returns: The OGR data source, with one layer.
+        :rtype: ogr.DataSource
+        """
+        spatial_reference = osr.SpatialReference()
+        spatial_reference.ImportFromWkt(self.projection)
+        source = ogr.GetDriverByName('Memory').CreateDataSource('')
+        layer = source.CreateLayer(
+            sample_raster_hazard_steps['gdal_layer_name'], spatial_reference)
+        layer.CreateField(ogr.FieldDefn('burn', ogr.OFTInteger))
+        for burn_value, geometry in enumerate(geometries, 1):
+            if boundary:
+                geometry = QgsGeometry(geometry.constGet().boundary())
+            feature = ogr.Feature(layer.GetLayerDefn())
+            feature.SetField('burn', burn_value)
+            feature.SetGeometry(
+                ogr.CreateGeometryFromWkb(bytes(geometry.asWkb())))
+            layer.CreateFeature(feature)
+        return source
+
+    def rasterize(self, source, row=0, rows=None, all_touched=False):
+        """Rasterize a vector source on a block of rows of the hazard grid.
+
+        :param source: The data source from vector_source.
+        :type source: ogr.DataSource
+
+        :param row: The first row of the block.
+        :type row: int
+
+        :param rows: The number of rows of the block. Defaults to all the
+            rows after the first one.
+        :type rows: int
+
+        :param all_touched: Burn all cells touched by the geometries.
+        :type all_touched: bool
+
+        :returns: The rasterized array, 0 where there is no geometry.
+        :rtype: numpy.ndarray
+        """
+        if rows is None:
+            rows = self.rows - row
+        origin_x, size_x, skew_x, origin_y, skew_y, size_y = (
+            self.geo_transform)
+        target = gdal.GetDriverByName('MEM').Create(
+            '', self.columns, rows, 1, gdal.GDT_Int32)
+        target.SetGeoTransform((
+            origin_x + row * skew_x,
+            size_x,
+            skew_x,
+            origin_y + row * size_y,
+            skew_y,
+            size_y))
+        target.SetProjection(self.projection)
+        options = ['ATTRIBUTE=burn']
+        if all_touched:
+            options.append('ALL_TOUCHED=TRUE')
+        gdal.RasterizeLayer(
+            target, [1], source.GetLayer(0), options=options)
+        return target.GetRasterBand(1).ReadAsArray()
+
+    def class_parts(self, crs, class_ids=None):
+        """Polygonize the hazard classes of the grid.
+
+        :param crs: The CRS of the polygons.
+        :type crs: QgsCoordinateReferenceSystem
+
+        :param class_ids: The class ids of the whole grid, from read.
+            Defaults to None, the grid is read.
+        :type class_ids: numpy.ndarray
+
+        :returns: List of (class id, polygon), one for each group of
+            connected cells in the same class. Cells which are not exposed
+            are not included.
+        :rtype: list
+        """
+        if class_ids is None:
+            class_ids = self.read()
+        raster = gdal.GetDriverByName('MEM').Create(
+            '', self.columns, self.rows, 1, gdal.GDT_Int32)
+        raster.SetGeoTransform(self.geo_transform)
+        raster.SetProjection(self.projection)
+        band = raster.GetRasterBand(1)
+        band.WriteArray(class_ids)
+        # Cells which are not exposed are masked.
+        band.SetNoDataValue(0)
+
+        spatial_reference = osr.SpatialReference()
+        spatial_reference.ImportFromWkt(self.projection)
+        source = ogr.GetDriverByName('Memory').CreateDataSource('')
+        layer = source.CreateLayer(
+            sample_raster_hazard_steps['gdal_layer_name'], spatial_reference)
+        layer.CreateField(ogr.FieldDefn('class_id', ogr.OFTInteger))
+        gdal.Polygonize(band, band.GetMaskBand(), layer, 0, [])
+
+        transform = None
+        if crs.authid() != self.crs.authid():
+            transform = QgsCoordinateTransform(
+                self.crs, crs, QgsProject.instance())
+        parts = []
+        for feature in layer:
+            geometry = QgsGeometry()
+            geometry.fromWkb(bytes(feature.GetGeometryRef().ExportToWkb()))
+            if transform:
+                geometry.transform(transform)
+            parts.append((feature.GetField(0), geometry))
+        return parts
+
+    def transformed_geometries(self, layer):
+        """Features of a vector layer, with geometries in the hazard CRS.
+
+        :param layer: The vector layer.
+        :type layer: QgsVectorLayer
+
+        :returns: Tuple with the list of features and the list of
+            geometries in the hazard CRS.
+        :rtype: (list, list)
+        """
+        transform = None
+        if layer.crs().authid() != self.crs.authid():
+            transform = QgsCoordinateTransform(
+                layer.crs(), self.crs, QgsProject.instance())
+        features = list(layer.getFeatures())
+        geometries = []
+        for feature in features:
+            geometry = QgsGeometry(feature.geometry())
+            if transform:
+                geometry.transform(transform)
+            geometries.append(geometry)
+        return features, geometries
+
+
+@profile
+def sample_raster_hazard(exposure, hazard, aggregation):
+    """Assign the hazard class of a raster to point exposure features.
+
+    This is an alternative to polygonize, union and assign_highest_value for
+    a raster hazard and a point exposure. The hazard raster is classified in
+    memory and sampled at each exposure point. The aggregation layer is
+    rasterized on the hazard grid to find the aggregation area of each point
+    and the hazard classes present in each area. Points on the boundary of
+    an aggregation area are tested with their geometry.
+
+    The outputs have the same schema as the vector path:
+    * the exposure summary has the exposure fields, then the hazard and the
+      aggregation fields. Points outside of the aggregation are removed.
+    * the aggregate hazard has one feature for each aggregation area and
+      hazard class, with the part of the aggregation area in this class.
+
+    :param exposure: The point exposure layer, in the aggregation CRS.
+    :type exposure: QgsVectorLayer
+
+    :param hazard: The classified or continuous hazard raster, clipped to
+        the analysis extent. Continuous rasters must be reclassified before.
+    :type hazard: QgsRasterLayer
+
+    :param aggregation: The prepared aggregation layer.
+    :type aggregation: QgsVectorLayer
+
+    :return: Tuple with the exposure summary and the aggregate hazard layers.
+    :rtype: (QgsVectorLayer, QgsVectorLayer)
+
+    .. versionadded:: 5.0
+    """
+    exposure_key = exposure.keywords['exposure']
+    grid = HazardGrid(hazard, exposure_key)
+
+    # Aggregation areas, the burned value is the position in this list.
+    aggregation_features, aggregation_geometries = (
+        grid.transformed_geometries(aggregation))
+    aggregation_ids = grid.rasterize(
+        grid.vector_source(aggregation_geometries))
+    boundaries = grid.rasterize(
+        grid.vector_source(aggregation_geometries, boundary=True),
+        all_touched=True)
+    class_ids = grid.read()
+
+    # Hazard classes in each aggregation area.
+    pairs = set()
+    inside = aggregation_ids > 0
+    codes = np.unique(
+        aggregation_ids[inside].astype(np.int64) * len(grid.class_keys)
+        + class_ids[inside])
+    for code in codes.tolist():
+        pairs.add(divmod(code, len(grid.class_keys)))
+
+    to_hazard = None
+    if exposure.crs().authid() != grid.crs.authid():
+        to_hazard = QgsCoordinateTransform(
+            exposure.crs(), grid.crs, QgsProject.instance())
+
+    # Sample the points.
+    request = QgsFeatureRequest().setNoAttributes()
+    feature_ids = []
+    x = []
+    y = []
+    for feature in exposure.getFeatures(request):
+        point = feature.geometry().centroid().asPoint()
+        if to_hazard:
+            point = to_hazard.transform(point)
+        feature_ids.append(feature.id())
+        x.append(point.x())
+        y.append(point.y())
+    x = np.array(x, dtype=np.float64)
+    y = np.array(y, dtype=np.float64)
+    rows, columns, in_raster = grid.cells(x, y)
+
+    point_classes = np.where(in_raster, class_ids[rows, columns], 0)
+    point_areas = np.where(in_raster, aggregation_ids[rows, columns], 0)
+    on_boundary = np.where(in_raster, boundaries[rows, columns] > 0, True)
+
+    # Points close to a boundary are checked with the geometries.
+    if on_boundary.any():
+        index = QgsSpatialIndex()
+        engines = []
+        for position, geometry in enumerate(aggregation_geometries):
+            feature = QgsFeature(position)
+            feature.setGeometry(geometry)
+            index.addFeature(feature)
+            engine = QgsGeometry.createGeometryEngine(geometry.constGet())
+            engine.prepareGeometry()
+            engines.append(engine)
+        for row in np.flatnonzero(on_boundary).tolist():
+            point = QgsGeometry.fromPointXY(QgsPointXY(x[row], y[row]))
+            point_areas[row] = 0
+            for position in sorted(index.intersects(point.boundingBox())):
+                if engines[position].intersects(point.constGet()):
+                    point_areas[row] = position + 1
+                    break
+
+    for area, class_id in zip(point_areas.tolist(), point_classes.tolist()):
+        if area:
+            pairs.add((area, class_id))
+
+    exposure_summary = _exposure_summary(
+        exposure,
+        hazard,
+        aggregation,
+        grid,
+        aggregation_features,
+        feature_ids,
+        point_areas,
+        point_classes)
+    aggregate_hazard = aggregate_hazard_layer(
+        hazard,
+        aggregation,
+        grid,
+        aggregation_features,
+        sorted(pairs),
+        class_ids=class_ids)
+    exposure_summary.keywords['aggregation_keywords'] = (
+        aggregate_hazard.keywords['aggregation_keywords'].copy())
+    exposure_summary.keywords['hazard_keywords'] = (
+        aggregate_hazard.keywords['hazard_keywords'].copy())
+
+    check_layer(exposure_summary)
+    check_layer(aggregate_hazard)
+    return exposure_summary, aggregate_hazard
+
+
+def _hazard_keywords(hazard, grid):
+    """Keywords of the hazard, as after the vector hazard preparation.
+
+    :param hazard: The hazard raster.
+    :type hazard: QgsRasterLayer
+
+    :param grid: The hazard grid.
+    :type grid: HazardGrid
+
+    :returns: The hazard keywords.
+    :rtype: dict
+    """
+    keywords = dict(hazard.keywords)
+    keywords['classification'] = grid.classification
+    keywords.pop('value_maps', None)
+    keywords.pop('value_map', None)
+    keywords['inasafe_fields'] = {
+        hazard_id_field['key']: hazard_id_field['field_name'],
+        hazard_class_field['key']: hazard_class_field['field_name'],
+    }
+    return keywords
+
+
+def _hazard_values(grid, class_id):
+    """Hazard ID and class values for a class ID.
+
+    The hazard ID is the class ID, so it is the same in the exposure summary
+    and in the aggregate hazard. Not exposed areas have no hazard ID, as
+    after the union.
+
+    :param grid: The hazard grid.
+    :type grid: HazardGrid
+
+    :param class_id: The class ID.
+    :type class_id: int
+
+    :returns: The hazard ID and the hazard class.
+    :rtype: list
+    """
+    if class_id == 0:
+        return [None, not_exposed_class['key']]
+    return [class_id, grid.class_keys[class_id]]
+
+
+def _exposure_summary(
+        exposure,
+        hazard,
+        aggregation,
+        grid,
+        aggregation_features,
+        feature_ids,
+        point_areas,
+        point_classes):
+    """Write hazard and aggregation attributes to the exposure.
+
+    Features outside of the aggregation are removed, like after the
+    intersection with the aggregate hazard.
+
+    :returns: The exposure summary layer.
+    :rtype: QgsVectorLayer
+    """
+    fields = [
+        create_field_from_definition(hazard_id_field),
+        create_field_from_definition(hazard_class_field),
+    ]
+    fields.extend(aggregation.fields().toList())
+
+    exposure.startEditing()
+    indices = []
+    for field in fields:
+        exposure.addAttribute(field)
+        indices.append(exposure.fields().lookupField(field.name()))
+    exposure.commitChanges()
+
+    update_map = {}
+    outside = []
+    for feature_id, area, class_id in zip(
+            feature_ids, point_areas.tolist(), point_classes.tolist()):
+        if not area:
+            outside.append(feature_id)
+            continue
+        values = _hazard_values(grid, class_id)
+        values.extend(aggregation_features[area - 1].attributes())
+        update_map[feature_id] = dict(zip(indices, values))
+    exposure.dataProvider().changeAttributeValues(update_map)
+    exposure.dataProvider().deleteFeatures(outside)
+    exposure.updateExtents()
+    exposure.updateFields()
+
+    exposure.keywords['inasafe_fields'].update(
+        _hazard_keywords(hazard, grid)['inasafe_fields'])
+    exposure.keywords['inasafe_fields'].update(
+        aggregation.keywords['inasafe_fields'])
+    exposure.keywords['layer_purpose'] = layer_purpose_exposure_summary['key']
+    exposure.keywords['exposure_keywords'] = exposure.keywords.copy()
+    exposure.keywords['title'] = sample_raster_hazard_steps[
+        'output_layer_name']
+    return exposure
+
+
+def aggregate_hazard_layer(
+        hazard,
+        aggregation,
+        grid,
+        aggregation_features,
+        pairs,
+        fields=None,
+        values=None,
+        class_ids=None):
+    """Create an aggregate hazard layer from aggregation and class pairs.
+
+    Like after the union of the polygonized hazard and the aggregation, the
+    geometry of a feature is the part of the aggregation area in the hazard
+    class. The not exposed part is the rest of the aggregation area. A
+    feature has no geometry if its part is smaller than a cell.
+
+    :param hazard: The hazard raster.
+    :type hazard: QgsRasterLayer
+
+    :param aggregation: The aggregation layer.
+    :type aggregation: QgsVectorLayer
+
+    :param grid: The hazard grid.
+    :type grid: HazardGrid
+
+    :param aggregation_features: The aggregation features. An aggregation
+        area in a pair is a position in this list, starting from 1.
+    :type aggregation_features: list
+
+    :param pairs: List of (aggregation area, class id).
+    :type pairs: list
+
+    :param fields: Extra fields to add after the aggregation fields.
+    :type fields: list
+
+    :param values: List of extra values for each pair.
+    :type values: list
+
+    :param class_ids: The class ids of the whole grid, from grid.read.
+        Defaults to None, the grid is read.
+    :type class_ids: numpy.ndarray
+
+    :returns: The aggregate hazard layer.
+    :rtype: QgsVectorLayer
+    """
+    hazard_keywords = _hazard_keywords(hazard, grid)
+    output_layer_name = union_steps['output_layer_name'] % (
+        hazard_keywords['layer_purpose'],
+        aggregation.keywords['layer_purpose'])
+
+    layer_fields = [
+        create_field_from_definition(hazard_id_field),
+        create_field_from_definition(hazard_class_field),
+    ]
+    layer_fields.extend(aggregation.fields().toList())
+    layer_fields.extend(fields or [])
+    layer = create_memory_layer(
+        output_layer_name,
+        QgsWkbTypes.PolygonGeometry,
+        aggregation.crs(),
+        layer_fields)
+
+    geometries = _pair_geometries(
+        grid, aggregation, aggregation_features, pairs, class_ids)
+
+    features = []
+    for position, (area, class_id) in enumerate(pairs):
+        aggregation_feature = aggregation_features[area - 1]
+        feature = QgsFeature(layer.fields())
+        if geometries[position] is not None:
+            feature.setGeometry(geometries[position])
+        attributes = _hazard_values(grid, class_id)
+        attributes.extend(aggregation_feature.attributes())
+        if values:
+            attributes.extend(values[position])
+        feature.setAttributes(attributes)
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    layer.updateExtents()
+
+    inasafe_fields = dict(hazard_keywords['inasafe_fields'])
+    inasafe_fields.update(aggregation.keywords['inasafe_fields'])
+    layer.keywords = dict(hazard_keywords)
+    layer.keywords['inasafe_fields'] = inasafe_fields
+    layer.keywords['title'] = output_layer_name
+    layer.keywords['layer_purpose'] = 'aggregate_hazard'
+    layer.keywords['hazard_keywords'] = hazard_keywords.copy()
+    layer.keywords['aggregation_keywords'] = aggregation.keywords.copy()
+    return layer
+
+
+def _pair_geometries(
+        grid, aggregation, aggregation_features, pairs, class_ids=None):
+    """Geometry of each pair of aggregation area and hazard class.
+
+    :param grid: The hazard grid.
+    :type grid: HazardGrid
+
+    :param aggregation: The aggregation layer.
+    :type aggregation: QgsVectorLayer
+
+    :param aggregation_features: The aggregation features.
+    :type aggregation_features: list
+
+    :param pairs: List of (aggregation area, class id), sorted by area.
+    :type pairs: list
+
+    :param class_ids: The class ids of the whole grid. Defaults to None.
+    :type class_ids: numpy.ndarray
+
+    :returns: The multipolygon of each pair, None if nothing is left.
+    :rtype: list
+    """
+    parts = grid.class_parts(aggregation.crs(), class_ids)
+    index = QgsSpatialIndex()
+    for position, (_, geometry) in enumerate(parts):
+        feature = QgsFeature(position)
+        feature.setGeometry(geometry)
+        index.addFeature(feature)
+
+    geometries = []
+    current_area = None
+    candidates = []
+    for area, class_id in pairs:
+        area_geometry = aggregation_features[area - 1].geometry()
+        if area != current_area:
+            current_area = area
+            candidates = [
+                parts[position] for position in sorted(
+                    index.intersects(area_geometry.boundingBox()))]
+
+        # All the exposed parts are removed for the not exposed class.
+        class_parts = [
+            geometry for part_class, geometry in candidates
+            if class_id == 0 or part_class == class_id]
+        if not class_parts:
+            geometry = area_geometry if class_id == 0 else None
+        elif class_id == 0:
+            geometry = area_geometry.difference(
+                QgsGeometry.unaryUnion(class_parts))
+        else:
+            geometry = area_geometry.intersection(
+                QgsGeometry.unaryUnion(class_parts))
+        geometries.append(_polygon_parts(geometry))
+    return geometries
+
+
+def _polygon_parts(geometry):
+    """Keep the polygons of a geometry, like the vector overlay.
+
+    :param geometry: The geometry.
+    :type geometry: QgsGeometry
+
+    :returns: The multipolygon, None if there isn't any polygon.
+    :rtype: QgsGeometry
+    """
+    if geometry is None or geometry.isNull() or geometry.isEmpty():
+        return None
+    polygons = [
+        part for part in geometry.asGeometryCollection()
+        if part.type() == QgsWkbTypes.PolygonGeometry and not part.isEmpty()]
+    if not polygons:
+        return None
+    geometry = QgsGeometry.collectGeometry(polygons)
+    geometry.convertToMultiType()
+    return geometry
@@ -4,12 +4,19 @@
 
 import os
 
+import numpy as np
+
 from safe.definitions.constants import INASAFE_TEST
 from safe.test.utilities import (
     load_test_raster_layer, standard_data_path)
 import unittest
 from safe.gis.raster.contour import (
-    create_smooth_contour, smooth_shakemap, shakemap_contour)
+    create_smooth_contour,
+    smooth_shakemap,
+    shakemap_contour,
+    gaussian_kernel,
+    convolve,
+    fast_convolve)
 from safe.common.utilities import unique_filename
 
 from safe.test.utilities import get_qgis_app
@@ -81,6 +88,29 @@ class TestContour(unittest.TestCase):
         contour_path = shakemap_contour(shakemap_layer_path)
         self.assertTrue(os.path.exists(contour_path))
 
+    def test_fast_convolve(self):
+        """Test the fast convolution against the pixel by pixel one."""
+        random_state = np.random.RandomState(1)
+        input_array = random_state.uniform(1, 10, (40, 55))
+        mask = random_state.uniform(size=(40, 55)) < 0.2
+
+        for sigma in [0.9, 2.0]:
+            weights = gaussian_kernel(sigma)
+            expected = convolve(input_array, weights)
+            result = fast_convolve(input_array, weights)
+            self.assertTrue(np.allclose(expected, result, atol=1e-10))
+
+            expected = convolve(input_array, weights, mask=mask)
+            result = fast_convolve(input_array, weights, mask=mask)
+            self.assertTrue(np.allclose(expected, result, atol=1e-10))
+
+        # A kernel which is not separable uses the FFT.
+        weights = random_state.uniform(size=(5, 5))
+        weights /= np.sum(weights)
+        expected = convolve(input_array, weights)
+        result = fast_convolve(input_array, weights)
+        self.assertTrue(np.allclose(expected, result, atol=1e-10))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -9,10 +9,14 @@ from safe.test.utilities import (
     load_test_raster_layer)
 QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app(qsetting=INASAFE_TEST)
 
+import numpy as np
+from osgeo import gdal
 from qgis.core import QgsRasterBandStats
 
+from safe.definitions.constants import no_data_value
 from safe.definitions.processing_steps import reclassify_raster_steps
-from safe.gis.raster.reclassify import reclassify
+from safe.gis.raster.reclassify import (
+    class_lookup, reclassify, reclassify_array)
 from safe.definitions.exposure import exposure_structure
 from safe.definitions.hazard_classifications import generic_hazard_classes
 
@@ -76,3 +80,32 @@ class TestReclassifyRaster(unittest.TestCase):
             1, QgsRasterBandStats.Min | QgsRasterBandStats.Max)
         self.assertEqual(stats.minimumValue, 1.0)
         self.assertEqual(stats.maximumValue, 3.0)
+
+        # The output is a tiled and compressed GeoTIFF.
+        raster = gdal.Open(reclassified.source())
+        self.assertEqual(
+            raster.GetMetadata('IMAGE_STRUCTURE')['COMPRESSION'], 'DEFLATE')
+
+    def test_reclassify_array(self):
+        """Test we can reclassify an array with a lookup table."""
+        ranges = {
+            1: [None, 0.2],
+            2: [0.2, 1],
+            3: [1, None],
+            # Overlapping range, the last one is used.
+            4: [2, 3],
+        }
+        source = np.array(
+            [[-1, 0.2, 0.5], [1, 2.5, 5], [-9999, np.nan, 3]],
+            dtype=np.float32)
+        edges, lookup = class_lookup(ranges)
+        result = reclassify_array(source, edges, lookup, -9999)
+        expected = np.array(
+            [[1, 1, 2], [2, 4, 3], [no_data_value, np.nan, 4]])
+        np.testing.assert_array_equal(result, expected)
+
+        # Values outside of the ranges are kept.
+        edges, lookup = class_lookup({1: [0, 1]})
+        result = reclassify_array(source, edges, lookup)
+        self.assertEqual(result[0, 0], -1)
+        self.assertEqual(result[0, 2], 1)
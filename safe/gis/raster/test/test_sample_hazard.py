@@ -0,0 +1,163 @@
+# coding=utf-8
+import unittest
+
+from safe.definitions.constants import INASAFE_TEST
+from safe.test.utilities import (
+    get_qgis_app,
+    load_test_raster_layer,
+)
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app(qsetting=INASAFE_TEST)
+
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsFeature,
+    QgsGeometry,
+    QgsPointXY,
+    QgsRectangle,
+    QgsWkbTypes,
+)
+
+from safe.definitions.fields import (
+    aggregation_id_field,
+    hazard_class_field,
+    hazard_id_field,
+)
+from safe.definitions.hazard_classifications import not_exposed_class
+from safe.gis.raster.sample_hazard import (
+    can_sample_raster_hazard, sample_raster_hazard)
+from safe.gis.vector.tools import (
+    create_field_from_definition, create_memory_layer)
+from safe.impact_function.impact_function import ImpactFunction
+from safe.utilities.settings import set_setting, setting
+
+__copyright__ = "Copyright 2018, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+class TestSampleRasterHazard(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_raster_hazard_sampling_setting(self):
+        """Test the impact function uses the sampling setting."""
+        impact_function = ImpactFunction()
+        initial_value = setting('raster_hazard_sampling', expected_type=bool)
+        try:
+            set_setting('raster_hazard_sampling', True)
+            self.assertTrue(impact_function._use_raster_hazard_sampling())
+            set_setting('raster_hazard_sampling', False)
+            self.assertFalse(impact_function._use_raster_hazard_sampling())
+
+            # The attribute is used before the setting.
+            impact_function.use_raster_hazard_sampling = True
+            self.assertTrue(impact_function._use_raster_hazard_sampling())
+        finally:
+            set_setting('raster_hazard_sampling', initial_value)
+
+    def test_sample_raster_hazard(self):
+        """Test we can sample a classified raster with points."""
+        hazard = load_test_raster_layer('hazard', 'classified_flood_20_20.asc')
+        crs = QgsCoordinateReferenceSystem('EPSG:4326')
+
+        # Two aggregation areas, left and right of the raster.
+        aggregation = create_memory_layer(
+            'aggregation',
+            QgsWkbTypes.PolygonGeometry,
+            crs,
+            [create_field_from_definition(aggregation_id_field)])
+        features = []
+        for aggregation_id, rectangle in enumerate([
+                QgsRectangle(106.8055, -6.1975, 106.8255, -6.1575),
+                QgsRectangle(106.8255, -6.1975, 106.8455, -6.1575)], 1):
+            feature = QgsFeature(aggregation.fields())
+            feature.setGeometry(QgsGeometry.fromRect(rectangle))
+            feature.setAttributes([aggregation_id])
+            features.append(feature)
+        aggregation.dataProvider().addFeatures(features)
+        aggregation.keywords = {
+            'layer_purpose': 'aggregation',
+            'inasafe_fields': {
+                aggregation_id_field['key']:
+                    aggregation_id_field['field_name']
+            }
+        }
+
+        # Cells of the top row are 1, 2, 3, 1, 2, 3...
+        # Values are low, medium and high.
+        exposure = create_memory_layer(
+            'exposure', QgsWkbTypes.PointGeometry, crs)
+        points = [
+            (106.8065, -6.1585),  # low, on the aggregation boundary
+            (106.8085, -6.1585),  # medium
+            (106.8105, -6.1585),  # high
+            (106.8345, -6.1585),  # second aggregation area
+            (106.8125, -6.1785),  # inside the first area
+            (106.9000, -6.1785),  # outside of everything
+        ]
+        features = []
+        for x, y in points:
+            feature = QgsFeature(exposure.fields())
+            feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+            features.append(feature)
+        exposure.dataProvider().addFeatures(features)
+        exposure.keywords = {
+            'layer_purpose': 'exposure',
+            'exposure': 'structure',
+            'inasafe_fields': {},
+        }
+
+        self.assertTrue(can_sample_raster_hazard(hazard, exposure))
+        self.assertFalse(can_sample_raster_hazard(aggregation, exposure))
+        self.assertFalse(can_sample_raster_hazard(hazard, aggregation))
+
+        exposure_summary, aggregate_hazard = sample_raster_hazard(
+            exposure, hazard, aggregation)
+
+        inasafe_fields = exposure_summary.keywords['inasafe_fields']
+        self.assertIn(hazard_class_field['key'], inasafe_fields)
+        self.assertIn(hazard_id_field['key'], inasafe_fields)
+        self.assertIn(aggregation_id_field['key'], inasafe_fields)
+        self.assertEqual(
+            exposure_summary.keywords['layer_purpose'], 'exposure_summary')
+
+        hazard_class = inasafe_fields[hazard_class_field['key']]
+        aggregation_id = inasafe_fields[aggregation_id_field['key']]
+        results = [
+            (feature[hazard_class], feature[aggregation_id])
+            for feature in exposure_summary.getFeatures()]
+        self.assertEqual(results[0], ('low', 1))
+        self.assertEqual(results[1], ('medium', 1))
+        self.assertEqual(results[2], ('high', 1))
+        self.assertEqual(results[3][1], 2)
+        self.assertEqual(results[4][1], 1)
+        # The point outside of the aggregation is removed.
+        self.assertEqual(len(results), 5)
+
+        # Each aggregation area has the three hazard classes.
+        self.assertEqual(
+            aggregate_hazard.keywords['layer_purpose'], 'aggregate_hazard')
+        pairs = set(
+            (feature[aggregation_id], feature[hazard_class])
+            for feature in aggregate_hazard.getFeatures())
+        for area in [1, 2]:
+            for value in ['low', 'medium', 'high']:
+                self.assertIn((area, value), pairs)
+        self.assertNotIn((1, not_exposed_class['key']), pairs)
+
+        # The classes are splitting the aggregation areas.
+        for aggregation_feature in aggregation.getFeatures():
+            area = aggregation_feature.geometry().area()
+            parts = [
+                feature.geometry()
+                for feature in aggregate_hazard.getFeatures()
+                if feature[aggregation_id] == aggregation_feature[0]]
+            self.assertAlmostEqual(
+                sum(part.area() for part in parts) / area, 1, places=6)
+            self.assertAlmostEqual(
+                QgsGeometry.unaryUnion(parts).area() / area, 1, places=6)
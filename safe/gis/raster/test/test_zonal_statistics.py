@@ -9,9 +9,23 @@ from safe.test.utilities import (
 )
 QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app(qsetting=INASAFE_TEST)
 
-from qgis.core import QgsWkbTypes, QgsCoordinateReferenceSystem
+from osgeo import gdal
+from qgis.core import (
+    QgsWkbTypes,
+    QgsCoordinateReferenceSystem,
+    QgsFeature,
+    QgsGeometry,
+    QgsRectangle,
+)
+from safe.definitions.fields import (
+    aggregation_id_field,
+    exposure_count_field,
+    hazard_class_field,
+)
 from safe.gis.vector.reproject import reproject
-from safe.gis.raster.zonal_statistics import zonal_stats
+from safe.gis.vector.tools import (
+    create_field_from_definition, create_memory_layer)
+from safe.gis.raster.zonal_statistics import zonal_histogram, zonal_stats
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
 __license__ = "GPL version 3"
@@ -66,3 +80,62 @@ class TestReclassifyRaster(unittest.TestCase):
         for feature_a, feature_b in zip(
                 vector.getFeatures(), vector_b.getFeatures()):
             self.assertEqual(feature_a.attributes(), feature_b.attributes())
+
+    def test_zonal_histogram(self):
+        """Test we can sum a raster exposure by hazard class."""
+        raster = load_test_raster_layer(
+            'exposure', 'pop_binary_raster_20_20.asc')
+        raster.keywords['inasafe_default_values'] = {}
+        hazard = load_test_raster_layer('hazard', 'classified_flood_20_20.asc')
+
+        aggregation = create_memory_layer(
+            'aggregation',
+            QgsWkbTypes.PolygonGeometry,
+            QgsCoordinateReferenceSystem('EPSG:4326'),
+            [create_field_from_definition(aggregation_id_field)])
+        feature = QgsFeature(aggregation.fields())
+        feature.setGeometry(QgsGeometry.fromRect(
+            QgsRectangle(106.8055, -6.1975, 106.8455, -6.1575)))
+        feature.setAttributes([1])
+        aggregation.dataProvider().addFeatures([feature])
+        aggregation.keywords = {
+            'layer_purpose': 'aggregation',
+            'inasafe_fields': {
+                aggregation_id_field['key']:
+                    aggregation_id_field['field_name']
+            }
+        }
+
+        layer = zonal_histogram(raster, hazard, aggregation)
+
+        self.assertEqual(layer.geometryType(), QgsWkbTypes.PolygonGeometry)
+        self.assertEqual(
+            layer.keywords['layer_purpose'], 'hazard_aggregation_summary')
+
+        # Both rasters are on the same grid.
+        population = gdal.Open(raster.source()).ReadAsArray()
+        classes = gdal.Open(hazard.source()).ReadAsArray()
+        population[population < 0] = 0
+        expected = {
+            'low': population[classes == 1].sum(),
+            'medium': population[classes == 2].sum(),
+            'high': population[classes == 3].sum(),
+        }
+
+        inasafe_fields = layer.keywords['inasafe_fields']
+        hazard_class = inasafe_fields[hazard_class_field['key']]
+        count = inasafe_fields[exposure_count_field['key'] % 'population']
+        result = {
+            feature[hazard_class]: feature[count]
+            for feature in layer.getFeatures()}
+        self.assertEqual(len(result), 3)
+        for key, value in list(expected.items()):
+            self.assertAlmostEqual(result[key], value)
+
+        # Each class has its part of the aggregation area.
+        area = next(aggregation.getFeatures()).geometry().area()
+        parts = [feature.geometry() for feature in layer.getFeatures()]
+        self.assertAlmostEqual(
+            sum(part.area() for part in parts) / area, 1, places=6)
+        self.assertAlmostEqual(
+            QgsGeometry.unaryUnion(parts).area() / area, 1, places=6)
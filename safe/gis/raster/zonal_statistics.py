@@ -5,13 +5,17 @@
 
 import logging
 
+import numpy as np
+from osgeo import gdal
 from qgis.analysis import QgsZonalStatistics
 from qgis.core import QgsFeatureRequest
 
+from safe.definitions.constants import no_data_value
 from safe.definitions.fields import exposure_count_field, total_field
 from safe.definitions.layer_purposes import (
     layer_purpose_aggregate_hazard_impacted)
 from safe.definitions.processing_steps import zonal_stats_steps
+from safe.gis.raster.sample_hazard import HazardGrid, aggregate_hazard_layer
 from safe.gis.sanity_check import check_layer
 from safe.gis.vector.reproject import reproject
 from safe.gis.vector.tools import (
@@ -152,3 +156,132 @@ def zonal_stats(raster, vector):
 
     check_layer(layer)
     return layer
+
+
+@profile
+def zonal_histogram(raster, hazard, aggregation):
+    """Sum a continuous raster exposure by aggregation area and hazard class.
+
+    This is an alternative to polygonize, union and zonal_stats for a raster
+    hazard and a continuous raster exposure. The exposure grid is not
+    resampled: the hazard is warped on the fly to the exposure grid with the
+    nearest neighbour and the aggregation areas are rasterized on it. The
+    sums are computed with one bincount for each block of rows.
+
+    The output has the same fields and keywords as zonal_stats. It has one
+    feature for each aggregation area and hazard class, with the part of
+    the aggregation area in this class. These geometries come from the
+    hazard grid, not from the warped one.
+
+    :param raster: The continuous raster exposure.
+    :type raster: QgsRasterLayer
+
+    :param hazard: The classified hazard raster, clipped to the analysis
+        extent. Continuous rasters must be reclassified before.
+    :type hazard: QgsRasterLayer
+
+    :param aggregation: The prepared aggregation layer.
+    :type aggregation: QgsVectorLayer
+
+    :return: The aggregate hazard with the exposure count.
+    :rtype: QgsVectorLayer
+
+    .. versionadded:: 5.0
+    """
+    exposure = raster.keywords['exposure']
+
+    dataset = gdal.Open(raster.source(), gdal.GA_ReadOnly)
+    band = dataset.GetRasterBand(raster.keywords.get('active_band', 1))
+    no_data = band.GetNoDataValue()
+    columns = dataset.RasterXSize
+    rows = dataset.RasterYSize
+    origin_x, size_x, _, origin_y, _, size_y = dataset.GetGeoTransform()
+
+    hazard_dataset = gdal.Open(hazard.source(), gdal.GA_ReadOnly)
+    hazard_band = hazard_dataset.GetRasterBand(
+        hazard.keywords.get('active_band', 1))
+    hazard_no_data = hazard_band.GetNoDataValue()
+    if hazard_no_data is None:
+        hazard_no_data = no_data_value
+    # A VRT is warping only the blocks we read.
+    warped = gdal.Warp(
+        '',
+        hazard_dataset,
+        format='VRT',
+        dstSRS=dataset.GetProjection(),
+        outputBounds=(
+            origin_x,
+            origin_y + rows * size_y,
+            origin_x + columns * size_x,
+            origin_y),
+        width=columns,
+        height=rows,
+        resampleAlg=gdal.GRA_NearestNeighbour,
+        srcNodata=hazard_band.GetNoDataValue(),
+        dstNodata=hazard_no_data)
+    grid = HazardGrid(
+        hazard, exposure, raster=warped, crs=raster.crs())
+
+    aggregation_features, aggregation_geometries = (
+        grid.transformed_geometries(aggregation))
+    areas = grid.vector_source(aggregation_geometries)
+
+    class_count = len(grid.class_keys)
+    size = (len(aggregation_features) + 1) * class_count
+    sums = np.zeros(size, dtype=np.float64)
+    cells = np.zeros(size, dtype=np.int64)
+
+    block_rows = max(band.GetBlockSize()[1], 256)
+    for row in range(0, rows, block_rows):
+        block = min(block_rows, rows - row)
+        values = band.ReadAsArray(0, row, columns, block).astype(np.float64)
+        codes = (
+            grid.rasterize(areas, row, block).astype(np.int64) * class_count
+            + grid.read(row, block)).ravel()
+        cells += np.bincount(codes, minlength=size)
+
+        valid = np.isfinite(values)
+        if no_data is not None:
+            valid &= values != no_data
+        valid = valid.ravel()
+        sums += np.bincount(
+            codes[valid], weights=values.ravel()[valid], minlength=size)
+
+    # Codes lower than class_count are outside of the aggregation.
+    codes = [
+        code for code in np.flatnonzero(cells).tolist()
+        if code >= class_count]
+    pairs = [divmod(code, class_count) for code in codes]
+    counts = [[value] for value in sums[codes].tolist()]
+
+    layer = aggregate_hazard_layer(
+        hazard,
+        aggregation,
+        HazardGrid(hazard, exposure),
+        aggregation_features,
+        pairs,
+        fields=[create_field_from_definition(exposure_count_field, exposure)],
+        values=counts)
+
+    inasafe_fields = layer.keywords['inasafe_fields'].copy()
+    hazard_keywords = layer.keywords['hazard_keywords'].copy()
+    layer.keywords = raster.keywords.copy()
+    layer.keywords['inasafe_fields'] = inasafe_fields
+    layer.keywords['inasafe_default_values'] = (
+        raster.keywords['inasafe_default_values'].copy())
+
+    # Special case here, one field is the exposure count and the total.
+    output_field = exposure_count_field['field_name'] % exposure
+    key = exposure_count_field['key'] % exposure
+    layer.keywords['inasafe_fields'][key] = output_field
+    layer.keywords['inasafe_fields'][total_field['key']] = output_field
+
+    layer.keywords['exposure_keywords'] = raster.keywords.copy()
+    layer.keywords['hazard_keywords'] = hazard_keywords
+    layer.keywords['aggregation_keywords'] = aggregation.keywords.copy()
+    layer.keywords['layer_purpose'] = (
+        layer_purpose_aggregate_hazard_impacted['key'])
+    layer.keywords['title'] = zonal_stats_steps['output_layer_name']
+
+    check_layer(layer)
+    return layer
@@ -5,6 +5,7 @@
 
 import logging
 
+import numpy as np
 from qgis.core import (
     QgsFeatureRequest,
     QgsGeometry,
@@ -21,6 +22,12 @@ from safe.gis.sanity_check import check_layer
 from safe.gis.vector.tools import create_spatial_index
 from safe.utilities.profiling import profile
 
+try:
+    from shapely import STRtree, from_wkb
+    HAS_SHAPELY = True
+except ImportError:
+    HAS_SHAPELY = False
+
 __copyright__ = "Copyright 2016, The InaSAFE Project"
 __license__ = "GPL version 3"
 __email__ = "info@inasafe.org"
@@ -77,16 +84,6 @@ def assign_highest_value(exposure, hazard):
     exposure.commitChanges()
     provider = exposure.dataProvider()
 
-    spatial_index = create_spatial_index(exposure)
-
-    # cache features from exposure layer for faster retrieval
-    exposure_features = {}
-    for f in exposure.getFeatures():
-        exposure_features[f.id()] = f
-
-    # Todo callback
-    # total = 100.0 / len(selectionA)
-
     hazard_field = hazard_inasafe_fields[hazard_class_field['key']]
 
     layer_classification = None
@@ -114,43 +111,79 @@ def assign_highest_value(exposure, hazard):
                 feature[aggr_id_field])
         return feature[haz_id_field] or feature.id()
 
-    # Let's loop over the hazard layer, from high to low hazard zone.
-    for hazard_value in levels:
-        expression = '"%s" = \'%s\'' % (hazard_field, hazard_value)
-        hazard_request = QgsFeatureRequest().setFilterExpression(expression)
+    if HAS_SHAPELY:
+        # Read the hazard layer once. The areas are ordered from high to low
+        # hazard zone, as in the loop below.
+        hazard_areas = {level: [] for level in levels}
+        for area in hazard.getFeatures():
+            if area[hazard_field] in hazard_areas:
+                hazard_areas[area[hazard_field]].append(area)
+        areas = []
+        for hazard_value in levels:
+            areas.extend(
+                sorted(hazard_areas[hazard_value], key=_hazard_sort_key))
+
+        request = QgsFeatureRequest().setSubsetOfAttributes([])
+        buildings = list(exposure.getFeatures(request))
+        highest = highest_hazard_index(
+            _shapely_geometries(buildings), _shapely_geometries(areas))
+
         update_map = {}
-        areas = sorted(
-            hazard.getFeatures(hazard_request), key=_hazard_sort_key)
-        for area in areas:
-            geometry = area.geometry().constGet()
-            intersects = spatial_index.intersects(geometry.boundingBox())
-
-            # to force consistencies between subsequent runs, sort the index.
-            # ideally each exposure feature needs to have prioritization
-            # value/score to determine which hazard/aggregation it belongs to,
-            # in case one feature were intersected with one or more high
-            # hazard geometry. sorting the ids works by ignoring this
-            # tendencies but still maintains consistencies for subsequent run.
-            intersects.sort()
-
-            # use prepared geometry: makes multiple intersection tests faster
-            geometry_prepared = QgsGeometry.createGeometryEngine(
-                geometry)
-            geometry_prepared.prepareGeometry()
-
-            # We need to loop over each intersections exposure / hazard.
-            for i in intersects:
-                building = exposure_features[i]
-                building_geometry = building.geometry()
-
-                if geometry_prepared.intersects(building_geometry.constGet()):
-                    update_map[building.id()] = {}
-                    for index, value in zip(indices, area.attributes()):
-                        update_map[building.id()][index] = value
-
-                    # We don't want this building again, let's remove it from
-                    # the index.
-                    spatial_index.deleteFeature(building)
+        for building, area_index in zip(buildings, highest.tolist()):
+            if area_index >= 0:
+                update_map[building.id()] = dict(
+                    list(zip(indices, areas[area_index].attributes())))
+        provider.changeAttributeValues(update_map)
+
+    else:
+        spatial_index = create_spatial_index(exposure)
+
+        # cache features from exposure layer for faster retrieval
+        exposure_features = {}
+        for f in exposure.getFeatures():
+            exposure_features[f.id()] = f
+
+        # Let's loop over the hazard layer, from high to low hazard zone.
+        update_map = {}
+        for hazard_value in levels:
+            expression = '"%s" = \'%s\'' % (hazard_field, hazard_value)
+            hazard_request = QgsFeatureRequest().setFilterExpression(
+                expression)
+            areas = sorted(
+                hazard.getFeatures(hazard_request), key=_hazard_sort_key)
+            for area in areas:
+                geometry = area.geometry().constGet()
+                intersects = spatial_index.intersects(geometry.boundingBox())
+
+                # to force consistencies between subsequent runs, sort the
+                # index. ideally each exposure feature needs to have
+                # prioritization value/score to determine which
+                # hazard/aggregation it belongs to, in case one feature were
+                # intersected with one or more high hazard geometry. sorting
+                # the ids works by ignoring this tendencies but still
+                # maintains consistencies for subsequent run.
+                intersects.sort()
+
+                # use prepared geometry: makes multiple intersection tests
+                # faster
+                geometry_prepared = QgsGeometry.createGeometryEngine(
+                    geometry)
+                geometry_prepared.prepareGeometry()
+
+                # We need to loop over each intersections exposure / hazard.
+                for i in intersects:
+                    building = exposure_features[i]
+                    building_geometry = building.geometry()
+
+                    if geometry_prepared.intersects(
+                            building_geometry.constGet()):
+                        update_map[building.id()] = {}
+                        for index, value in zip(indices, area.attributes()):
+                            update_map[building.id()][index] = value
+
+                        # We don't want this building again, let's remove it
+                        # from the index.
+                        spatial_index.deleteFeature(building)
 
         provider.changeAttributeValues(update_map)
 
@@ -171,3 +204,46 @@ def assign_highest_value(exposure, hazard):
 
     check_layer(exposure)
     return exposure
+
+
+def highest_hazard_index(exposure_geometries, hazard_geometries):
+    """Find the first hazard geometry intersecting each exposure geometry.
+
+    The hazard geometries must be ordered from the highest hazard to the
+    lowest. If many hazard geometries intersect an exposure geometry, the
+    first one wins, like in the loop over the hazard levels.
+
+    :param exposure_geometries: The exposure geometries, None if empty.
+    :type exposure_geometries: numpy.ndarray
+
+    :param hazard_geometries: The ordered hazard geometries.
+    :type hazard_geometries: numpy.ndarray
+
+    :return: The index of the hazard geometry for each exposure geometry,
+        -1 if the exposure doesn't intersect any hazard.
+    :rtype: numpy.ndarray
+    """
+    no_hazard = len(hazard_geometries)
+    highest = np.full(len(exposure_geometries), no_hazard, dtype=np.int64)
+    if no_hazard and len(exposure_geometries):
+        tree = STRtree(exposure_geometries)
+        hazard_indexes, exposure_indexes = tree.query(
+            hazard_geometries, predicate='intersects')
+        np.minimum.at(highest, exposure_indexes, hazard_indexes)
+    highest[highest == no_hazard] = -1
+    return highest
+
+
+def _shapely_geometries(features):
+    """Convert the geometries of some features to Shapely geometries.
+
+    :param features: The features.
+    :type features: list
+
+    :return: The geometries, None if a feature has no geometry.
+    :rtype: numpy.ndarray
+    """
+    return from_wkb([
+        None if feature.geometry().isNull()
+        else bytes(feature.geometry().asWkb())
+        for feature in features])
@@ -0,0 +1,295 @@
+# coding=utf-8
+
+"""Apply many attribute transformations with one read and one write."""
+
+import logging
+
+from qgis.core import QgsFeatureRequest
+
+from safe.common.exceptions import InvalidKeywordsForProcessingAlgorithm
+from safe.definitions.field_groups import count_ratio_mapping
+from safe.definitions.fields import (
+    exposure_class_field,
+    exposure_type_field,
+    population_count_field,
+)
+from safe.definitions.layer_purposes import layer_purpose_exposure
+from safe.definitions.processing_steps import (
+    assign_default_values_steps,
+    assign_inasafe_values_steps,
+    recompute_counts_steps,
+)
+from safe.definitions.utilities import definition, get_non_compulsory_fields
+from safe.gis.sanity_check import check_layer
+from safe.gis.vector.tools import create_field_from_definition
+from safe.impact_function.postprocessors import is_null
+from safe.utilities.profiling import profile
+
+__copyright__ = "Copyright 2018, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+
+class AttributePlan(object):
+
+    """The attribute table of a vector layer, loaded as columns.
+
+    The attributes are read once without geometries. Columns can then be
+    added, replaced or removed in memory. The changes are written with one
+    provider call for each kind of change when the plan is committed, instead
+    of one edit buffer change per feature and per step.
+    """
+
+    def __init__(self, layer):
+        """Constructor.
+
+        :param layer: The vector layer. The provider must support adding,
+            deleting and changing attributes, like a memory layer.
+        :type layer: QgsVectorLayer
+        """
+        self.layer = layer
+        names = layer.fields().names()
+
+        request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry)
+        self.feature_ids = []
+        rows = []
+        for feature in layer.getFeatures(request):
+            self.feature_ids.append(feature.id())
+            rows.append(feature.attributes())
+
+        if rows:
+            columns = [list(column) for column in zip(*rows)]
+        else:
+            columns = [[] for _ in names]
+        self.columns = dict(list(zip(names, columns)))
+
+        self._new_fields = []
+        self._changed = []
+        self._removed = []
+
+    def __len__(self):
+        """Number of features in the plan."""
+        return len(self.feature_ids)
+
+    def add_column(self, field, values):
+        """Add a new column.
+
+        :param field: The new field.
+        :type field: QgsField
+
+        :param values: The values, in the order of the features.
+        :type values: list
+        """
+        self._new_fields.append(field)
+        self.set_column(field.name(), values)
+
+    def set_column(self, name, values):
+        """Replace the values of a column.
+
+        :param name: The field name.
+        :type name: str
+
+        :param values: The values, in the order of the features.
+        :type values: list
+        """
+        self.columns[name] = values
+        if name not in self._changed:
+            self._changed.append(name)
+
+    def remove_column(self, name):
+        """Remove a column.
+
+        :param name: The field name.
+        :type name: str
+        """
+        self.columns.pop(name, None)
+        if name in self._changed:
+            self._changed.remove(name)
+        self._new_fields = [
+            field for field in self._new_fields if field.name() != name]
+        if self.layer.fields().lookupField(name) != -1:
+            self._removed.append(name)
+
+    def commit(self):
+        """Write the changes to the layer."""
+        provider = self.layer.dataProvider()
+        if self._new_fields:
+            provider.addAttributes(self._new_fields)
+            self.layer.updateFields()
+
+        fields = self.layer.fields()
+        if self._changed and self.feature_ids:
+            indexes = [fields.lookupField(name) for name in self._changed]
+            columns = [self.columns[name] for name in self._changed]
+            update_map = {}
+            for feature_id, values in zip(self.feature_ids, zip(*columns)):
+                update_map[feature_id] = dict(list(zip(indexes, values)))
+            provider.changeAttributeValues(update_map)
+
+        if self._removed:
+            provider.deleteAttributes(
+                [fields.lookupField(name) for name in self._removed])
+            self.layer.updateFields()
+
+        self._new_fields = []
+        self._changed = []
+        self._removed = []
+
+
+def _ratio(count, total_count):
+    """Ratio between a count and the total count, as from_counts_to_ratios.
+
+    :param count: The subset count.
+    :type count: float
+
+    :param total_count: The total count.
+    :type total_count: float
+
+    :returns: The ratio, '' if a count is missing.
+    :rtype: float, str
+    """
+    try:
+        # For #4669, fix always get 0
+        return count / float(total_count)
+    except TypeError:
+        return ''
+    except ZeroDivisionError:
+        return 0
+
+
+def plan_counts_to_ratios(plan):
+    """Add ratio columns from the count columns.
+
+    This is the same as from_counts_to_ratios.
+
+    :param plan: The attribute plan of the exposure.
+    :type plan: AttributePlan
+    """
+    keywords = plan.layer.keywords
+    inasafe_fields = keywords['inasafe_fields']
+    keywords['title'] = recompute_counts_steps['output_layer_name']
+
+    if population_count_field['key'] not in inasafe_fields:
+        LOGGER.info(
+            'Population count field {population_count_field} is not detected '
+            'in the exposure. We will not compute a ratio from this '
+            'field.'.format(
+                population_count_field=population_count_field['key']))
+        return
+
+    total_counts = plan.columns[inasafe_fields[population_count_field['key']]]
+    exposure = definition(keywords['exposure'])
+    non_compulsory_fields = get_non_compulsory_fields(
+        layer_purpose_exposure['key'], exposure['key'])
+    for count_field in non_compulsory_fields:
+        exists = count_field['key'] in inasafe_fields
+        if count_field['key'] in list(count_ratio_mapping.keys()) and exists:
+            ratio_field = definition(count_ratio_mapping[count_field['key']])
+            counts = plan.columns[count_field['field_name']]
+            plan.add_column(
+                create_field_from_definition(ratio_field),
+                [_ratio(count, total_count)
+                 for count, total_count in zip(counts, total_counts)])
+            inasafe_fields[ratio_field['key']] = ratio_field['field_name']
+
+
+def plan_default_values(plan):
+    """Add or fill columns with default values.
+
+    This is the same as add_default_values.
+
+    :param plan: The attribute plan.
+    :type plan: AttributePlan
+    """
+    keywords = plan.layer.keywords
+    fields = keywords.get('inasafe_fields')
+    if not isinstance(fields, dict):
+        msg = 'inasafe_fields is missing in keywords from %s' % (
+            plan.layer.name())
+        raise InvalidKeywordsForProcessingAlgorithm(msg)
+
+    defaults = keywords.get('inasafe_default_values')
+    if not defaults:
+        return
+
+    for default, value in list(defaults.items()):
+        field = fields.get(default)
+        target_field = definition(default)
+        if not field:
+            plan.add_column(
+                create_field_from_definition(target_field),
+                [value] * len(plan))
+            fields[target_field['key']] = target_field['field_name']
+        else:
+            plan.set_column(field, [
+                value if is_null(attribute) or attribute == '' else attribute
+                for attribute in plan.columns[field]])
+        keywords['title'] = (
+            assign_default_values_steps['output_layer_name']
+            % keywords['layer_purpose'])
+
+
+def plan_exposure_value_map(plan):
+    """Replace the exposure type column by the exposure class column.
+
+    This is the same as update_value_map for an exposure layer.
+
+    :param plan: The attribute plan of the exposure.
+    :type plan: AttributePlan
+    """
+    keywords = plan.layer.keywords
+    inasafe_fields = keywords['inasafe_fields']
+    if not inasafe_fields.get(exposure_type_field['key']):
+        raise InvalidKeywordsForProcessingAlgorithm
+    value_map = keywords.get('value_map')
+    if not value_map:
+        raise InvalidKeywordsForProcessingAlgorithm
+
+    reversed_value_map = {}
+    for inasafe_class, values in list(value_map.items()):
+        for value in values:
+            reversed_value_map[value] = inasafe_class
+
+    unclassified_column = inasafe_fields[exposure_type_field['key']]
+    plan.add_column(
+        create_field_from_definition(exposure_class_field),
+        [reversed_value_map.get(value) or ''
+         for value in plan.columns[unclassified_column]])
+    plan.remove_column(unclassified_column)
+
+    inasafe_fields[exposure_class_field['key']] = (
+        exposure_class_field['field_name'])
+    inasafe_fields.pop(exposure_type_field['key'])
+    keywords.pop('value_map')
+    keywords['title'] = (
+        assign_inasafe_values_steps['output_layer_name']
+        % keywords['layer_purpose'])
+
+
+@profile
+def prepare_exposure_attributes(layer):
+    """Compute ratios, default values and classes of a vector exposure.
+
+    This is doing from_counts_to_ratios, add_default_values and
+    update_value_map with one read of the attribute table and one write.
+
+    :param layer: The prepared vector exposure.
+    :type layer: QgsVectorLayer
+
+    :return: The updated vector layer.
+    :rtype: QgsVectorLayer
+
+    .. versionadded:: 5.0
+    """
+    plan = AttributePlan(layer)
+    plan_counts_to_ratios(plan)
+    plan_default_values(plan)
+    if exposure_class_field['key'] not in layer.keywords['inasafe_fields']:
+        plan_exposure_value_map(plan)
+    plan.commit()
+
+    check_layer(layer)
+    return layer
@@ -7,6 +7,8 @@ import processing
 from safe.common.exceptions import ProcessingInstallationError
 from safe.definitions.processing_steps import clip_steps
 from safe.gis.sanity_check import check_layer
+from safe.gis.vector.overlay import (
+    can_run_in_parallel, overlay_workers, parallel_overlay)
 from safe.utilities.profiling import profile
 from safe.gis.processing_tools import (
     create_processing_context,
@@ -20,7 +22,7 @@ __revision__ = '$Format:%H$'
 
 
 @profile
-def clip(layer_to_clip, mask_layer):
+def clip(layer_to_clip, mask_layer, workers=None):
     """Clip a vector layer with another.
 
     Issue https://github.com/inasafe/inasafe/issues/3186
@@ -31,6 +33,11 @@ def clip(layer_to_clip, mask_layer):
     :param mask_layer: The vector layer to use for clipping.
     :type mask_layer: QgsVectorLayer
 
+    :param workers: The number of processes. If there are many and Shapely
+        2 is installed, the overlay is computed tile by tile in parallel.
+        Default to the overlay_workers setting.
+    :type workers: int
+
     :return: The clip vector layer.
     :rtype: QgsVectorLayer
 
@@ -44,17 +51,20 @@ def clip(layer_to_clip, mask_layer):
                   'OVERLAY': mask_layer,
                   'OUTPUT': 'memory:'}
 
-    # TODO implement callback through QgsProcessingFeedback object
-
-    initialize_processing()
+    workers = overlay_workers(workers)
+    if can_run_in_parallel(workers):
+        clipped = parallel_overlay('clip', layer_to_clip, mask_layer, workers)
+    else:
+        # TODO implement callback through QgsProcessingFeedback object
 
-    feedback = create_processing_feedback()
-    context = create_processing_context(feedback=feedback)
-    result = processing.run('native:clip', parameters, context=context)
-    if result is None:
-        raise ProcessingInstallationError
+        initialize_processing()
 
-    clipped = result['OUTPUT']
+        feedback = create_processing_feedback()
+        context = create_processing_context(feedback=feedback)
+        result = processing.run('native:clip', parameters, context=context)
+        if result is None:
+            raise ProcessingInstallationError
+        clipped = result['OUTPUT']
     clipped.setName(output_layer_name)
 
     clipped.keywords = layer_to_clip.keywords.copy()
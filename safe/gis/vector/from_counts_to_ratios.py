@@ -4,7 +4,7 @@
 
 import logging
 
-from safe.definitions import count_ratio_mapping
+from safe.definitions.field_groups import count_ratio_mapping
 from safe.definitions.fields import population_count_field
 from safe.definitions.layer_purposes import layer_purpose_exposure
 from safe.definitions.processing_steps import (
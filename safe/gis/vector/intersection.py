@@ -10,6 +10,8 @@ from safe.common.exceptions import ProcessingInstallationError
 from safe.definitions.layer_purposes import layer_purpose_exposure_summary
 from safe.definitions.processing_steps import intersection_steps
 from safe.gis.sanity_check import check_layer
+from safe.gis.vector.overlay import (
+    can_run_in_parallel, overlay_workers, parallel_overlay)
 from safe.utilities.profiling import profile
 from safe.gis.processing_tools import (
     create_processing_context,
@@ -25,7 +27,7 @@ LOGGER = logging.getLogger('InaSAFE')
 
 
 @profile
-def intersection(source, mask):
+def intersection(source, mask, workers=None):
     """Intersect two layers.
 
     Issue https://github.com/inasafe/inasafe/issues/3186
@@ -36,6 +38,11 @@ def intersection(source, mask):
     :param mask: The vector layer to use for clipping.
     :type mask: QgsVectorLayer
 
+    :param workers: The number of processes. If there are many and Shapely
+        2 is installed, the overlay is computed tile by tile in parallel.
+        Default to the overlay_workers setting.
+    :type workers: int
+
     :return: The clip vector layer.
     :rtype: QgsVectorLayer
 
@@ -49,17 +56,21 @@ def intersection(source, mask):
                   'OVERLAY': mask,
                   'OUTPUT': 'memory:'}
 
-    # TODO implement callback through QgsProcessingFeedback object
-
-    initialize_processing()
-
-    feedback = create_processing_feedback()
-    context = create_processing_context(feedback=feedback)
-    result = processing.run('native:intersection', parameters, context=context)
-    if result is None:
-        raise ProcessingInstallationError
-
-    intersect = result['OUTPUT']
+    workers = overlay_workers(workers)
+    if can_run_in_parallel(workers):
+        intersect = parallel_overlay('intersection', source, mask, workers)
+    else:
+        # TODO implement callback through QgsProcessingFeedback object
+
+        initialize_processing()
+
+        feedback = create_processing_feedback()
+        context = create_processing_context(feedback=feedback)
+        result = processing.run(
+            'native:intersection', parameters, context=context)
+        if result is None:
+            raise ProcessingInstallationError
+        intersect = result['OUTPUT']
     intersect.setName(output_layer_name)
     intersect.keywords = dict(source.keywords)
     intersect.keywords['title'] = output_layer_name
@@ -0,0 +1,320 @@
+# coding=utf-8
+
+"""Run vector overlays on many processes, tile by tile.
+
+The analysis extent is split into tiles. Each source feature is owned by the
+tile containing the centre of its bounding box, so it is computed by one
+worker only and the merged result has no duplicate. A worker receives the
+geometries of the features it owns as WKB, with the overlay geometries
+touching them. Workers only return geometries with the index of their
+source and overlay features: the attributes are joined back in this process.
+"""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil, sqrt
+from multiprocessing import get_context
+
+import numpy as np
+from qgis.core import (
+    QgsFeature,
+    QgsGeometry,
+    QgsProcessingUtils,
+)
+
+from safe.gis.vector.overlay_worker import HAS_SHAPELY, overlay_chunk
+from safe.gis.vector.tools import create_memory_layer
+from safe.utilities.profiling import profile
+from safe.utilities.settings import setting
+
+if HAS_SHAPELY:
+    import shapely
+    from shapely import STRtree, from_wkb
+
+__copyright__ = "Copyright 2018, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+overlay_operations = ['intersection', 'union', 'clip']
+
+# Number of tiles for each worker, smaller tiles balance the load better.
+tiles_per_worker = 4
+
+
+def overlay_workers(workers=None):
+    """Number of processes to use for an overlay.
+
+    :param workers: The number of processes. If None, the overlay_workers
+        setting is used.
+    :type workers: int
+
+    :return: The number of processes, at least 1.
+    :rtype: int
+    """
+    if workers is None:
+        workers = setting('overlay_workers', expected_type=int)
+    try:
+        return max(int(workers), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def can_run_in_parallel(workers):
+    """Check if an overlay can run on many processes.
+
+    :param workers: The number of processes.
+    :type workers: int
+
+    :return: True if there are many workers and Shapely 2 is installed.
+    :rtype: bool
+    """
+    return HAS_SHAPELY and workers > 1
+
+
+@profile
+def parallel_overlay(operation, source, overlay, workers):
+    """Run an overlay of two vector layers on many processes.
+
+    The output has the same fields and geometry type as the native
+    processing algorithm with the same name.
+
+    :param operation: The overlay, one of 'intersection', 'union' and
+        'clip'.
+    :type operation: str
+
+    :param source: The input vector layer.
+    :type source: QgsVectorLayer
+
+    :param overlay: The overlay vector layer.
+    :type overlay: QgsVectorLayer
+
+    :param workers: The number of processes.
+    :type workers: int
+
+    :return: The new memory layer, without keywords. None for a union if a
+        layer has overlapping features: the native algorithm splits them,
+        it can't be done tile by tile.
+    :rtype: QgsVectorLayer
+    """
+    if operation not in overlay_operations:
+        raise ValueError('Unknown overlay %s' % operation)
+
+    source_features = list(source.getFeatures())
+    overlay_features = list(overlay.getFeatures())
+    source_geometries = [_wkb(feature) for feature in source_features]
+    overlay_geometries = [_wkb(feature) for feature in overlay_features]
+
+    if operation == 'union' and (
+            has_self_overlaps(source_geometries)
+            or has_self_overlaps(overlay_geometries)):
+        LOGGER.debug(
+            'A layer has overlapping features, the union is not computed '
+            'in parallel.')
+        return None
+
+    chunks = _partition(
+        operation,
+        source_geometries,
+        overlay_geometries,
+        workers * tiles_per_worker,
+        int(source.geometryType()))
+
+    LOGGER.debug(
+        'Running the %s on %s tiles with %s processes.' % (
+            operation, len(chunks), workers))
+    # Processes are spawned, not forked, as the QGIS application running
+    # the analysis can't be shared with a child process.
+    with ProcessPoolExecutor(
+            max_workers=workers, mp_context=get_context('spawn')) as executor:
+        results = list(executor.map(overlay_chunk, chunks))
+
+    if operation == 'clip':
+        fields = source.fields()
+    else:
+        fields = QgsProcessingUtils.combineFields(
+            source.fields(), overlay.fields())
+    layer = create_memory_layer(
+        '%s_%s' % (operation, source.name()),
+        source.geometryType(),
+        source.crs(),
+        fields)
+
+    source_nulls = [None] * source.fields().count()
+    overlay_nulls = [None] * overlay.fields().count()
+
+    # Sort the pieces like the serial algorithm, by source feature.
+    pieces = [piece for result in results for piece in result]
+    pieces.sort(key=lambda piece: (
+        piece[0] < 0, piece[0], piece[1] < 0, piece[1]))
+
+    output_features = []
+    for source_index, overlay_index, wkb in pieces:
+        if source_index >= 0:
+            attributes = source_features[source_index].attributes()
+        else:
+            attributes = list(source_nulls)
+        if operation != 'clip':
+            if overlay_index >= 0:
+                attributes = attributes + (
+                    overlay_features[overlay_index].attributes())
+            else:
+                attributes = attributes + overlay_nulls
+
+        geometry = QgsGeometry()
+        geometry.fromWkb(wkb)
+        geometry.convertToMultiType()
+        feature = QgsFeature(fields)
+        feature.setGeometry(geometry)
+        feature.setAttributes(attributes)
+        output_features.append(feature)
+
+    layer.dataProvider().addFeatures(output_features)
+    layer.updateExtents()
+    return layer
+
+
+def _wkb(feature):
+    """WKB of the geometry of a feature.
+
+    :param feature: The feature.
+    :type feature: QgsFeature
+
+    :return: The WKB, None if the feature has no geometry.
+    :rtype: bytes
+    """
+    if not feature.hasGeometry():
+        return None
+    return bytes(feature.geometry().asWkb())
+
+
+def has_self_overlaps(geometries):
+    """Check if some geometries of a layer overlap each other.
+
+    Touching geometries are not overlapping.
+
+    :param geometries: WKB of the geometries.
+    :type geometries: list
+
+    :return: True if the interiors of two geometries intersect.
+    :rtype: bool
+    """
+    geometries = from_wkb(geometries)
+    if len(geometries) < 2:
+        return False
+    first, second = STRtree(geometries).query(
+        geometries, predicate='intersects')
+    pairs = first < second
+    if not pairs.any():
+        return False
+    return bool(shapely.relate_pattern(
+        geometries[first[pairs]],
+        geometries[second[pairs]],
+        'T********').any())
+
+
+def _partition(
+        operation, source_geometries, overlay_geometries, count, dimension):
+    """Split the overlay in chunks, one for each tile.
+
+    :param operation: The overlay.
+    :type operation: str
+
+    :param source_geometries: WKB of the source geometries.
+    :type source_geometries: list
+
+    :param overlay_geometries: WKB of the overlay geometries.
+    :type overlay_geometries: list
+
+    :param count: The maximum number of tiles.
+    :type count: int
+
+    :param dimension: The dimension of the source geometries, 0 for points,
+        1 for lines and 2 for polygons.
+    :type dimension: int
+
+    :return: The chunks to give to overlay_chunk. Empty tiles are skipped.
+    :rtype: list
+    """
+    sources = from_wkb(source_geometries)
+    overlays = from_wkb(overlay_geometries)
+    source_tiles = _owner_tiles(sources, overlays, count)
+    overlay_tiles = _owner_tiles(overlays, sources, count)
+
+    source_tree = STRtree(sources)
+    overlay_tree = STRtree(overlays)
+
+    chunks = []
+    for tile in np.union1d(source_tiles, overlay_tiles).tolist():
+        if tile < 0:
+            continue
+        owned = np.flatnonzero(source_tiles == tile)
+        context = overlay_tree.query(sources[owned])[1]
+        if operation == 'union':
+            owned_overlays = np.flatnonzero(overlay_tiles == tile)
+            context = np.union1d(context, owned_overlays)
+            other_sources = source_tree.query(overlays[owned_overlays])[1]
+            other_sources = np.setdiff1d(other_sources, owned)
+        else:
+            owned_overlays = np.array([], dtype=np.int64)
+            other_sources = np.array([], dtype=np.int64)
+        if not len(owned) and not len(owned_overlays):
+            continue
+
+        context = np.unique(context)
+        chunks.append((
+            operation,
+            dimension,
+            [(index, source_geometries[index]) for index in owned.tolist()],
+            [(index, source_geometries[index])
+             for index in other_sources.tolist()],
+            [(index, overlay_geometries[index]) for index in context.tolist()],
+            owned_overlays.tolist(),
+        ))
+    return chunks
+
+
+def _owner_tiles(geometries, others, count):
+    """Find the tile owning each geometry.
+
+    The tiles are a regular grid over the extent of both layers. A geometry
+    belongs to the tile containing the centre of its bounding box.
+
+    :param geometries: The geometries.
+    :type geometries: numpy.ndarray
+
+    :param others: The geometries of the other layer, for the extent.
+    :type others: numpy.ndarray
+
+    :param count: The maximum number of tiles.
+    :type count: int
+
+    :return: The tile of each geometry, -1 if the geometry is empty.
+    :rtype: numpy.ndarray
+    """
+    tiles = np.full(len(geometries), -1, dtype=np.int64)
+    if not len(geometries):
+        return tiles
+
+    bounds = shapely.bounds(geometries)
+    valid = ~np.isnan(bounds).any(axis=1)
+    extent = shapely.total_bounds(np.concatenate([geometries, others]))
+    if not valid.any() or np.isnan(extent).any():
+        return tiles
+
+    columns = max(int(ceil(sqrt(count))), 1)
+    rows = max(int(ceil(count / float(columns))), 1)
+    width = max(extent[2] - extent[0], 1e-12)
+    height = max(extent[3] - extent[1], 1e-12)
+    centre_x = (bounds[valid, 0] + bounds[valid, 2]) / 2.0
+    centre_y = (bounds[valid, 1] + bounds[valid, 3]) / 2.0
+    column = np.clip(
+        ((centre_x - extent[0]) / width * columns).astype(np.int64),
+        0, columns - 1)
+    row = np.clip(
+        ((centre_y - extent[1]) / height * rows).astype(np.int64),
+        0, rows - 1)
+    tiles[valid] = row * columns + column
+    return tiles
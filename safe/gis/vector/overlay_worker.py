@@ -0,0 +1,154 @@
+# coding=utf-8
+
+"""Overlay of one tile, computed in a worker process.
+
+The workers are spawned, so this module only imports numpy and Shapely. It
+doesn't use QGIS or the InaSAFE settings.
+"""
+
+import numpy as np
+
+try:
+    import shapely
+    from shapely import STRtree, from_wkb, to_wkb
+    HAS_SHAPELY = True
+    multi_geometries = {
+        0: shapely.multipoints,
+        1: shapely.multilinestrings,
+        2: shapely.multipolygons,
+    }
+except ImportError:
+    HAS_SHAPELY = False
+
+__copyright__ = "Copyright 2018, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+def overlay_chunk(chunk):
+    """Compute the overlay of one tile. This runs in a worker process.
+
+    :param chunk: The chunk made by _partition: the operation, the
+        dimension, the owned source geometries, the other source geometries
+        needed for a union, the overlay geometries and the indexes of the
+        owned overlay geometries for a union. Geometries are (index, WKB).
+    :type chunk: tuple
+
+    :return: List of pieces (source index, overlay index, WKB). An index is
+        -1 if the piece is not coming from this layer.
+    :rtype: list
+    """
+    operation, dimension, owned, others, overlays, owned_overlays = chunk
+    pieces = []
+
+    overlay_indexes = np.array(
+        [index for index, _ in overlays], dtype=np.int64)
+    overlay_geometries = from_wkb([wkb for _, wkb in overlays])
+    overlay_tree = STRtree(overlay_geometries)
+
+    for source_index, wkb in owned:
+        geometry = from_wkb(wkb)
+        if geometry is None or geometry.is_empty:
+            continue
+        candidates = overlay_tree.query(geometry, predicate='intersects')
+        candidates = np.sort(candidates)
+
+        if operation == 'clip':
+            if not len(candidates):
+                continue
+            mask = shapely.union_all(overlay_geometries[candidates])
+            if shapely.within(geometry, mask):
+                clipped = geometry
+            else:
+                clipped = same_dimension(
+                    shapely.intersection(geometry, mask), dimension)
+            if clipped is not None:
+                pieces.append((source_index, -1, to_2d_wkb(clipped)))
+            continue
+
+        for candidate in candidates.tolist():
+            part = same_dimension(
+                shapely.intersection(
+                    geometry, overlay_geometries[candidate]),
+                dimension)
+            if part is not None:
+                pieces.append(
+                    (source_index, int(overlay_indexes[candidate]),
+                     to_2d_wkb(part)))
+
+        if operation == 'union':
+            if len(candidates):
+                rest = shapely.difference(
+                    geometry,
+                    shapely.union_all(overlay_geometries[candidates]))
+                rest = same_dimension(rest, dimension)
+            else:
+                rest = geometry
+            if rest is not None:
+                pieces.append((source_index, -1, to_2d_wkb(rest)))
+
+    if operation == 'union' and owned_overlays:
+        sources = owned + others
+        source_geometries = from_wkb([wkb for _, wkb in sources])
+        source_tree = STRtree(source_geometries)
+        positions = dict(
+            (index, position) for position, index in enumerate(
+                overlay_indexes.tolist()))
+        for overlay_index in owned_overlays:
+            geometry = overlay_geometries[positions[overlay_index]]
+            if geometry is None or geometry.is_empty:
+                continue
+            candidates = source_tree.query(geometry, predicate='intersects')
+            if len(candidates):
+                rest = shapely.difference(
+                    geometry,
+                    shapely.union_all(source_geometries[candidates]))
+                rest = same_dimension(rest, dimension)
+            else:
+                rest = geometry
+            if rest is not None:
+                pieces.append((-1, overlay_index, to_2d_wkb(rest)))
+
+    return pieces
+
+
+def same_dimension(geometry, dimension):
+    """Keep the parts of a geometry having the given dimension.
+
+    Like the native algorithms, touching polygons do not give a line or a
+    point in the output.
+
+    :param geometry: The geometry.
+    :type geometry: shapely.Geometry
+
+    :param dimension: The dimension to keep.
+    :type dimension: int
+
+    :return: The geometry, None if nothing is left.
+    :rtype: shapely.Geometry
+    """
+    if geometry is None or geometry.is_empty:
+        return None
+    parts = shapely.get_parts(geometry)
+    # Geometry collections can contain multi geometries.
+    parts = shapely.get_parts(parts)
+    parts = parts[shapely.get_dimensions(parts) == dimension]
+    parts = parts[~shapely.is_empty(parts)]
+    if not len(parts):
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    return multi_geometries[dimension](parts)
+
+
+def to_2d_wkb(geometry):
+    """WKB of a Shapely geometry, in 2D.
+
+    :param geometry: The geometry.
+    :type geometry: shapely.Geometry
+
+    :return: The WKB.
+    :rtype: bytes
+    """
+    return to_wkb(geometry, output_dimension=2)
@@ -38,6 +38,7 @@ from safe.definitions.utilities import (
     get_compulsory_fields,
 )
 from safe.gis.sanity_check import check_layer
+from safe.gis.vector.attribute_plan import AttributePlan
 from safe.gis.vector.tools import (
     create_memory_layer,
     remove_fields,
@@ -394,8 +395,6 @@ def _add_id_column(layer):
         LOGGER.info(
             'We add an ID column in {purpose}'.format(purpose=layer_purpose))
 
-        layer.startEditing()
-
         id_field = QgsField()
         id_field.setName(safe_id['field_name'])
         if isinstance(safe_id['type'], list):
@@ -406,15 +405,9 @@ def _add_id_column(layer):
         id_field.setPrecision(safe_id['precision'])
         id_field.setLength(safe_id['length'])
 
-        layer.addAttribute(id_field)
-
-        new_index = layer.fields().lookupField(id_field.name())
-
-        for feature in layer.getFeatures():
-            layer.changeAttributeValue(
-                feature.id(), new_index, feature.id())
-
-        layer.commitChanges()
+        plan = AttributePlan(layer)
+        plan.add_column(id_field, list(plan.feature_ids))
+        plan.commit()
 
         layer.keywords['inasafe_fields'][safe_id['key']] = (
             safe_id['field_name'])
@@ -427,23 +420,13 @@ def _add_default_exposure_class(layer):
     :param layer: The vector layer.
     :type layer: QgsVectorLayer
     """
-    layer.startEditing()
-
     field = create_field_from_definition(exposure_class_field)
     layer.keywords['inasafe_fields'][exposure_class_field['key']] = (
         exposure_class_field['field_name'])
-    layer.addAttribute(field)
-
-    index = layer.fields().lookupField(exposure_class_field['field_name'])
-
-    exposure = layer.keywords['exposure']
-
-    request = QgsFeatureRequest()
-    request.setFlags(QgsFeatureRequest.NoGeometry)
-    for feature in layer.getFeatures(request):
-        layer.changeAttributeValue(feature.id(), index, exposure)
 
-    layer.commitChanges()
+    plan = AttributePlan(layer)
+    plan.add_column(field, [layer.keywords['exposure']] * len(plan))
+    plan.commit()
     return
 
 
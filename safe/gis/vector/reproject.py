@@ -2,9 +2,13 @@
 
 """Reproject a vector layer to a specific CRS."""
 
+import logging
+
+import numpy as np
+from osgeo import osr
 from qgis.core import (
     QgsCoordinateTransform,
-    QgsFeature,
+    QgsGeometry,
     QgsProject,
 )
 
@@ -18,6 +22,17 @@ __license__ = "GPL version 3"
 __email__ = "info@inasafe.org"
 __revision__ = '$Format:%H$'
 
+try:
+    import shapely
+    HAS_SHAPELY = True
+except ImportError:
+    HAS_SHAPELY = False
+
+LOGGER = logging.getLogger('InaSAFE')
+
+# Number of features reprojected and inserted at once.
+reprojection_chunk_size = 10000
+
 
 @profile
 def reproject(layer, output_crs, callback=None):
@@ -51,24 +66,32 @@ def reproject(layer, output_crs, callback=None):
 
     reprojected = create_memory_layer(
         output_layer_name, layer.geometryType(), output_crs, input_fields)
-    reprojected.startEditing()
+    provider = reprojected.dataProvider()
 
     crs_transform = QgsCoordinateTransform(
         input_crs, output_crs, QgsProject.instance())
+    coordinates_transform = None
+    if HAS_SHAPELY:
+        coordinates_transform = osr_coordinates_transform(crs_transform)
 
-    out_feature = QgsFeature()
-
+    features = []
     for i, feature in enumerate(layer.getFeatures()):
-        geom = feature.geometry()
-        geom.transform(crs_transform)
-        out_feature.setGeometry(geom)
-        out_feature.setAttributes(feature.attributes())
-        reprojected.addFeature(out_feature)
+        features.append(feature)
+        if len(features) < reprojection_chunk_size:
+            continue
+
+        _reproject_features(features, crs_transform, coordinates_transform)
+        provider.addFeatures(features)
+        features = []
 
         if callback:
             callback(current=i, maximum=feature_count, step=processing_step)
 
-    reprojected.commitChanges()
+    if features:
+        _reproject_features(features, crs_transform, coordinates_transform)
+        provider.addFeatures(features)
+
+    reprojected.updateExtents()
 
     # We transfer keywords to the output.
     # We don't need to update keywords as the CRS is dynamic.
@@ -76,3 +99,116 @@ def reproject(layer, output_crs, callback=None):
     reprojected.keywords['title'] = output_layer_name
     check_layer(reprojected)
     return reprojected
+
+
+def osr_coordinates_transform(crs_transform):
+    """Make a function transforming arrays of coordinates with PROJ.
+
+    The same coordinate operation as QGIS is used if QGIS and GDAL are able
+    to tell it.
+
+    :param crs_transform: The QGIS coordinate transform.
+    :type crs_transform: QgsCoordinateTransform
+
+    :return: A function taking and returning a (n, 2) array of coordinates,
+        or None if GDAL can't make this transformation.
+    :rtype: function
+    """
+    source = _spatial_reference(crs_transform.sourceCrs())
+    target = _spatial_reference(crs_transform.destinationCrs())
+    if source is None or target is None:
+        return None
+
+    operation = None
+    if hasattr(crs_transform, 'coordinateOperation'):
+        operation = crs_transform.coordinateOperation()
+    try:
+        if operation and hasattr(osr, 'CoordinateTransformationOptions'):
+            options = osr.CoordinateTransformationOptions()
+            options.SetOperation(operation)
+            transform = osr.CoordinateTransformation(source, target, options)
+        else:
+            transform = osr.CoordinateTransformation(source, target)
+    except (RuntimeError, TypeError):
+        transform = None
+    if transform is None:
+        return None
+
+    def transform_coordinates(coordinates):
+        """Transform coordinates with one PROJ call.
+
+        :param coordinates: The coordinates.
+        :type coordinates: numpy.ndarray
+
+        :return: The transformed coordinates.
+        :rtype: numpy.ndarray
+        """
+        if not len(coordinates):
+            return coordinates
+        points = np.array(
+            transform.TransformPoints(coordinates.tolist()),
+            dtype=np.float64)
+        return points[:, :2]
+
+    return transform_coordinates
+
+
+def _spatial_reference(crs):
+    """OSR spatial reference from a QGIS CRS, in the x, y axis order.
+
+    :param crs: The CRS.
+    :type crs: QgsCoordinateReferenceSystem
+
+    :return: The spatial reference, None if OSR can't read the CRS.
+    :rtype: osr.SpatialReference
+    """
+    spatial_reference = osr.SpatialReference()
+    if spatial_reference.ImportFromWkt(crs.toWkt()) != 0:
+        return None
+    if hasattr(spatial_reference, 'SetAxisMappingStrategy'):
+        spatial_reference.SetAxisMappingStrategy(
+            osr.OAMS_TRADITIONAL_GIS_ORDER)
+    return spatial_reference
+
+
+def _reproject_features(features, crs_transform, coordinates_transform):
+    """Reproject the geometries of a chunk of features in place.
+
+    :param features: The features.
+    :type features: list
+
+    :param crs_transform: The QGIS coordinate transform.
+    :type crs_transform: QgsCoordinateTransform
+
+    :param coordinates_transform: The function made by
+        osr_coordinates_transform, None to use QGIS for each feature.
+    :type coordinates_transform: function
+    """
+    if coordinates_transform is not None:
+        with_geometry = [
+            feature for feature in features if feature.hasGeometry()]
+        try:
+            # GEOS doesn't read curves.
+            geometries = shapely.from_wkb([
+                bytes(feature.geometry().asWkb())
+                for feature in with_geometry])
+        except (shapely.errors.GEOSException, ValueError):
+            geometries = None
+        if geometries is not None:
+            geometries = shapely.transform(geometries, coordinates_transform)
+            # Coordinates PROJ can't transform are infinite. QGIS will raise
+            # an exception for them.
+            coordinates = shapely.get_coordinates(geometries)
+        if geometries is not None and np.isfinite(coordinates).all():
+            for feature, wkb in zip(
+                    with_geometry, shapely.to_wkb(geometries).tolist()):
+                geometry = QgsGeometry()
+                geometry.fromWkb(wkb)
+                feature.setGeometry(geometry)
+            return
+        LOGGER.debug('Reprojecting this chunk with QGIS.')
+
+    for feature in features:
+        geometry = feature.geometry()
+        geometry.transform(crs_transform)
+        feature.setGeometry(geometry)
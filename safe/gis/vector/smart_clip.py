@@ -9,6 +9,7 @@ from qgis.core import (
     QgsGeometry,
     QgsFeatureRequest,
     QgsFeature,
+    QgsSpatialIndex,
 )
 
 from safe.definitions.processing_steps import smart_clip_steps
@@ -50,30 +51,60 @@ def smart_clip(layer_to_clip, mask_layer):
         layer_to_clip.crs(),
         layer_to_clip.fields()
     )
-    writer.startEditing()
 
-    # first build up a list of clip geometries
+    # first build up a list of clip geometries, one for each part of each
+    # mask feature.
     request = QgsFeatureRequest().setSubsetOfAttributes([])
-    iterator = mask_layer.getFeatures(request)
-    feature = next(iterator)
-    geometries = QgsGeometry(feature.geometry())
+    parts = []
+    for feature in mask_layer.getFeatures(request):
+        if not feature.hasGeometry():
+            continue
+        geometry = feature.geometry()
+        if geometry.isMultipart():
+            parts.extend(geometry.asGeometryCollection())
+        else:
+            parts.append(QgsGeometry(geometry))
 
     # use prepared geometries for faster intersection tests
-    # noinspection PyArgumentList
-    engine = QgsGeometry.createGeometryEngine(geometries.constGet())
-    engine.prepareGeometry()
-
-    extent = mask_layer.extent()
-
-    for feature in layer_to_clip.getFeatures(QgsFeatureRequest(extent)):
-
-        if engine.intersects(feature.geometry().constGet()):
+    index = QgsSpatialIndex()
+    engines = []
+    for position, geometry in enumerate(parts):
+        part = QgsFeature(position)
+        part.setGeometry(geometry)
+        index.addFeature(part)
+        # noinspection PyArgumentList
+        engine = QgsGeometry.createGeometryEngine(geometry.constGet())
+        engine.prepareGeometry()
+        engines.append(engine)
+
+    # Only features in the extent of a part are read, each one is tested once.
+    tested = set()
+    selected = []
+    for geometry in parts:
+        request = QgsFeatureRequest(geometry.boundingBox())
+        request.setSubsetOfAttributes([])
+        for feature in layer_to_clip.getFeatures(request):
+            if feature.id() in tested:
+                continue
+            tested.add(feature.id())
+            candidate = feature.geometry()
+            if candidate.isNull():
+                continue
+            for position in index.intersects(candidate.boundingBox()):
+                if engines[position].intersects(candidate.constGet()):
+                    selected.append(feature.id())
+                    break
+
+    features = []
+    if selected:
+        request = QgsFeatureRequest().setFilterFids(sorted(selected))
+        for feature in layer_to_clip.getFeatures(request):
             out_feat = QgsFeature()
             out_feat.setGeometry(feature.geometry())
             out_feat.setAttributes(feature.attributes())
-            writer.addFeature(out_feat)
-
-    writer.commitChanges()
+            features.append(out_feat)
+    writer.dataProvider().addFeatures(features)
+    writer.updateExtents()
 
     writer.keywords = layer_to_clip.keywords.copy()
     writer.keywords['title'] = output_layer_name
@@ -5,7 +5,7 @@
 
 import logging
 
-from qgis.core import QgsWkbTypes, QgsFeatureRequest
+from qgis.core import QgsWkbTypes
 
 from safe.definitions.exposure import exposure_structure
 from safe.definitions.fields import (
@@ -26,7 +26,14 @@ from safe.definitions.layer_purposes import (
 from safe.definitions.utilities import definition
 from safe.gis.sanity_check import check_layer
 from safe.gis.vector.summary_tools import (
-    check_inputs, create_absolute_values_structure, add_fields)
+    check_inputs,
+    create_absolute_values_structure,
+    add_fields,
+    fill_null,
+    read_columns,
+    sum_absolute_values,
+    write_values,
+)
 from safe.processors import post_processor_affected_function
 from safe.utilities.gis import qgis_version
 from safe.utilities.i18n import tr
@@ -42,7 +49,7 @@ LOGGER = logging.getLogger('InaSAFE')
 
 
 @profile
-def aggregate_hazard_summary(impact, aggregate_hazard):
+def aggregate_hazard_summary(impact, aggregate_hazard, resolver=None):
     """Compute the summary from the source layer to the aggregate_hazard layer.
 
     Source layer :
@@ -62,6 +69,9 @@ def aggregate_hazard_summary(impact, aggregate_hazard):
         statistics.
     :type aggregate_hazard: QgsVectorLayer
 
+    :param resolver: Optional hazard class lookup tables of the analysis.
+    :type resolver: safe.definitions.utilities.HazardClassResolver
+
     :return: The new aggregate_hazard layer with summary.
     :rtype: QgsVectorLayer
 
@@ -104,9 +114,42 @@ def aggregate_hazard_summary(impact, aggregate_hazard):
     # the size, or the number of features or population.
     field_index = report_on_field(impact)
 
-    aggregate_hazard.startEditing()
+    # Read the impact table once, column by column.
+    source_columns = [aggregation_id, hazard_id, exposure_class]
+    source_columns.extend(list(absolute_values.keys()))
+    # Field_index can be equal to 0.
+    if field_index is not None:
+        source_columns.append(field_index)
+    LOGGER.debug('Computing the aggregate hazard summary.')
+    _, columns = read_columns(impact, source_columns)
+
+    if field_index is not None:
+        values = columns[field_index]
+    else:
+        values = [1] * len(columns[aggregation_id])
+    aggregation_values = columns[aggregation_id]
+    hazard_values = fill_null(columns[hazard_id], not_exposed_class['key'])
+    exposure_values = fill_null(columns[exposure_class], 'NULL')
+
+    flat_table = FlatTable('aggregation_id', 'hazard_id', 'exposure_class')
+    flat_table.add_values(
+        values,
+        aggregation_id=aggregation_values,
+        hazard_id=hazard_values,
+        exposure_class=exposure_values
+    )
+
+    # We summarize every absolute values.
+    sum_absolute_values(
+        absolute_values,
+        columns,
+        aggregation_id=aggregation_values,
+        hazard_id=hazard_values
+    )
 
     shift = aggregate_hazard.fields().count()
+
+    aggregate_hazard.startEditing()
     dynamic_structure = [
         [exposure_count_field, unique_exposure],
     ]
@@ -117,53 +160,6 @@ def aggregate_hazard_summary(impact, aggregate_hazard):
         dynamic_structure,
     )
 
-    flat_table = FlatTable('aggregation_id', 'hazard_id', 'exposure_class')
-
-    request = QgsFeatureRequest()
-    request.setFlags(QgsFeatureRequest.NoGeometry)
-    LOGGER.debug('Computing the aggregate hazard summary.')
-    for feature in impact.getFeatures(request):
-        # Field_index can be equal to 0.
-        if field_index is not None:
-            value = feature[field_index]
-        else:
-            value = 1
-
-        aggregation_value = feature[aggregation_id]
-        hazard_value = feature[hazard_id]
-        if (hazard_value is None
-                or hazard_value == ''
-                or (hasattr(hazard_value, 'isNull')
-                    and hazard_value.isNull())):
-            hazard_value = not_exposed_class['key']
-        exposure_value = feature[exposure_class]
-        if (exposure_value is None
-                or exposure_value == ''
-                or (hasattr(exposure_value, 'isNull')
-                    and exposure_value.isNull())):
-            exposure_value = 'NULL'
-
-        flat_table.add_value(
-            value,
-            aggregation_id=aggregation_value,
-            hazard_id=hazard_value,
-            exposure_class=exposure_value
-        )
-
-        # We summarize every absolute values.
-        for field, field_definition in list(absolute_values.items()):
-            value = feature[field]
-            if (value == ''
-                    or value is None
-                    or (hasattr(value, 'isNull')
-                        and value.isNull())):
-                value = 0
-            field_definition[0].add_value(
-                value,
-                aggregation_id=aggregation_value,
-                hazard_id=hazard_value
-            )
-
     hazard_keywords = aggregate_hazard.keywords['hazard_keywords']
     hazard = hazard_keywords['hazard']
     classification = hazard_keywords['classification']
@@ -171,15 +167,18 @@ def aggregate_hazard_summary(impact, aggregate_hazard):
     exposure_keywords = impact.keywords['exposure_keywords']
     exposure = exposure_keywords['exposure']
 
-    for area in aggregate_hazard.getFeatures(request):
-        aggregation_value = area[aggregation_id]
-        feature_hazard_id = area[hazard_id]
-        if (feature_hazard_id == ''
-                or feature_hazard_id is None
-                or (hasattr(feature_hazard_id, 'isNull')
-                    and feature_hazard_id.isNull())):
-            feature_hazard_id = not_exposed_class['key']
-        feature_hazard_value = area[hazard_class]
+    feature_ids, columns = read_columns(
+        aggregate_hazard, [aggregation_id, hazard_id, hazard_class])
+    target_hazard_ids = fill_null(columns[hazard_id], not_exposed_class['key'])
+
+    new_values = {}
+    for feature_id, aggregation_value, feature_hazard_id, \
+            feature_hazard_value in zip(
+                feature_ids,
+                columns[aggregation_id],
+                target_hazard_ids,
+                columns[hazard_class]):
+        attributes = {}
         total = 0
         for i, val in enumerate(unique_exposure):
             sum = flat_table.get_value(
@@ -188,29 +187,29 @@ def aggregate_hazard_summary(impact, aggregate_hazard):
                 exposure_class=val
             )
             total += sum
-            aggregate_hazard.changeAttributeValue(area.id(), shift + i, sum)
+            attributes[shift + i] = sum
 
         affected = post_processor_affected_function(
             exposure=exposure,
             hazard=hazard,
             classification=classification,
-            hazard_class=feature_hazard_value)
+            hazard_class=feature_hazard_value,
+            resolver=resolver)
         affected = tr(str(affected))
-        aggregate_hazard.changeAttributeValue(
-            area.id(), shift + len(unique_exposure), affected)
+        attributes[shift + len(unique_exposure)] = affected
 
-        aggregate_hazard.changeAttributeValue(
-            area.id(), shift + len(unique_exposure) + 1, total)
+        attributes[shift + len(unique_exposure) + 1] = total
 
         for i, field in enumerate(absolute_values.values()):
             value = field[0].get_value(
                 aggregation_id=aggregation_value,
                 hazard_id=feature_hazard_id
             )
-            aggregate_hazard.changeAttributeValue(
-                area.id(), shift + len(unique_exposure) + 2 + i, value)
+            attributes[shift + len(unique_exposure) + 2 + i] = value
+
+        new_values[feature_id] = attributes
 
-    aggregate_hazard.commitChanges()
+    write_values(aggregate_hazard, new_values)
 
     aggregate_hazard.keywords['title'] = (
         layer_purpose_aggregate_hazard_impacted['name'])
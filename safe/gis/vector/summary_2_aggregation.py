@@ -18,7 +18,14 @@ from safe.definitions.layer_purposes import (
     layer_purpose_aggregation_summary)
 from safe.gis.sanity_check import check_layer
 from safe.gis.vector.summary_tools import (
-    check_inputs, create_absolute_values_structure, add_fields)
+    check_inputs,
+    create_absolute_values_structure,
+    add_fields,
+    fill_null,
+    read_columns,
+    sum_absolute_values,
+    write_values,
+)
 from safe.gis.vector.tools import read_dynamic_inasafe_field
 from safe.utilities.gis import qgis_version
 from safe.utilities.i18n import tr
@@ -82,40 +89,38 @@ def aggregation_summary(aggregate_hazard, aggregation):
     absolute_values = create_absolute_values_structure(
         aggregate_hazard, ['aggregation_id'])
 
-    flat_table = FlatTable('aggregation_id', 'exposure_class')
-
     aggregation_index = source_fields[aggregation_id_field['key']]
 
-    # We want to loop over affected features only.
+    exposure_columns = {}
+    for key, name_field in list(source_fields.items()):
+        if key.endswith(pattern):
+            exposure_columns[key.replace(pattern, '')] = name_field
+
+    # We want to read affected features only.
     request = QgsFeatureRequest()
-    request.setFlags(QgsFeatureRequest.NoGeometry)
     expression = '\"%s\" = \'%s\'' % (
         affected_field['field_name'], tr('True'))
     request.setFilterExpression(expression)
-    for area in aggregate_hazard.getFeatures(request):
-
-        for key, name_field in list(source_fields.items()):
-            if key.endswith(pattern):
-                aggregation_id = area[aggregation_index]
-                exposure_class = key.replace(pattern, '')
-                value = area[name_field]
-                flat_table.add_value(
-                    value,
-                    aggregation_id=aggregation_id,
-                    exposure_class=exposure_class
-                )
-
-        # We summarize every absolute values.
-        for field, field_definition in list(absolute_values.items()):
-            value = area[field]
-            if (value is None or value == ''
-                    or (hasattr(value, 'isNull')
-                        and value.isNull())):
-                value = 0
-            field_definition[0].add_value(
-                value,
-                aggregation_id=area[aggregation_index],
-            )
+    source_columns = [aggregation_index]
+    source_columns.extend(list(exposure_columns.values()))
+    source_columns.extend(list(absolute_values.keys()))
+    _, columns = read_columns(aggregate_hazard, source_columns, request)
+    aggregation_values = columns[aggregation_index]
+
+    flat_table = FlatTable('aggregation_id', 'exposure_class')
+    for exposure_class, name_field in list(exposure_columns.items()):
+        flat_table.add_values(
+            fill_null(columns[name_field], 0),
+            aggregation_id=aggregation_values,
+            exposure_class=exposure_class
+        )
+
+    # We summarize every absolute values.
+    sum_absolute_values(
+        absolute_values,
+        columns,
+        aggregation_id=aggregation_values,
+    )
 
     shift = aggregation.fields().count()
 
@@ -131,10 +136,12 @@ def aggregation_summary(aggregate_hazard, aggregation):
 
     aggregation_index = target_fields[aggregation_id_field['key']]
 
-    request = QgsFeatureRequest()
-    request.setFlags(QgsFeatureRequest.NoGeometry)
-    for area in aggregation.getFeatures(request):
-        aggregation_value = area[aggregation_index]
+    feature_ids, columns = read_columns(aggregation, [aggregation_index])
+
+    new_values = {}
+    for feature_id, aggregation_value in zip(
+            feature_ids, columns[aggregation_index]):
+        attributes = {}
         total = 0
         for i, val in enumerate(unique_exposure):
             sum = flat_table.get_value(
@@ -142,20 +149,20 @@ def aggregation_summary(aggregate_hazard, aggregation):
                 exposure_class=val
             )
             total += sum
-            aggregation.changeAttributeValue(area.id(), shift + i, sum)
+            attributes[shift + i] = sum
 
-        aggregation.changeAttributeValue(
-            area.id(), shift + len(unique_exposure), total)
+        attributes[shift + len(unique_exposure)] = total
 
         for i, field in enumerate(absolute_values.values()):
             value = field[0].get_value(
                 aggregation_id=aggregation_value,
             )
             target_index = shift + len(unique_exposure) + 1 + i
-            aggregation.changeAttributeValue(
-                area.id(), target_index, value)
+            attributes[target_index] = value
+
+        new_values[feature_id] = attributes
 
-    aggregation.commitChanges()
+    write_values(aggregation, new_values)
 
     aggregation.keywords['title'] = layer_purpose_aggregation_summary['name']
     if qgis_version() >= 21800:
@@ -4,8 +4,6 @@
 
 from math import isnan
 
-from qgis.core import QgsFeatureRequest
-
 from safe.definitions.fields import (
     analysis_name_field,
     aggregation_id_field,
@@ -24,7 +22,14 @@ from safe.definitions.hazard_classifications import not_exposed_class
 from safe.definitions.layer_purposes import layer_purpose_analysis_impacted
 from safe.gis.sanity_check import check_layer
 from safe.gis.vector.summary_tools import (
-    check_inputs, create_absolute_values_structure, add_fields)
+    check_inputs,
+    create_absolute_values_structure,
+    add_fields,
+    fill_null,
+    read_columns,
+    sum_absolute_values,
+    write_values,
+)
 from safe.gis.vector.tools import create_field_from_definition
 from safe.processors import post_processor_affected_function
 from safe.utilities.gis import qgis_version
@@ -38,7 +43,7 @@ __revision__ = '$Format:%H$'
 
 
 @profile
-def analysis_summary(aggregate_hazard, analysis):
+def analysis_summary(aggregate_hazard, analysis, resolver=None):
     """Compute the summary from the aggregate hazard to analysis.
 
     Source layer :
@@ -56,6 +61,9 @@ def analysis_summary(aggregate_hazard, analysis):
     :param analysis: The target vector layer where to write statistics.
     :type analysis: QgsVectorLayer
 
+    :param resolver: Optional hazard class lookup tables of the analysis.
+    :type resolver: safe.definitions.utilities.HazardClassResolver
+
     :return: The new target layer with summary.
     :rtype: QgsVectorLayer
 
@@ -94,50 +102,55 @@ def analysis_summary(aggregate_hazard, analysis):
 
     total = source_fields[total_field['key']]
 
+    # Fields used by the summary rules.
+    summary_fields = {}
+    for key, summary_rule in list(summary_rules.items()):
+        input_field = summary_rule['input_field']
+        case_field = summary_rule['case_field']
+        if aggregate_hazard.fields().lookupField(input_field['field_name']) \
+                == -1:
+            continue
+        if aggregate_hazard.fields().lookupField(case_field['field_name']) \
+                == -1:
+            continue
+        summary_fields[key] = (
+            input_field['field_name'], case_field['field_name'])
+
+    # Read the aggregate_hazard layer once.
+    source_columns = [hazard_class, total]
+    source_columns.extend(list(absolute_values.keys()))
+    for input_name, case_name in list(summary_fields.values()):
+        source_columns.extend([input_name, case_name])
+    _, columns = read_columns(aggregate_hazard, source_columns)
+
+    # For isnan, see ticket #3812
+    values = [
+        0 if isinstance(value, float) and isnan(value) else value
+        for value in fill_null(columns[total], 0)]
     flat_table = FlatTable('hazard_class')
+    flat_table.add_values(
+        values,
+        hazard_class=fill_null(columns[hazard_class], 'NULL')
+    )
 
-    # First loop over the aggregate_hazard layer
-    request = QgsFeatureRequest()
-    request.setSubsetOfAttributes(
-        [hazard_class, total], aggregate_hazard.fields())
-    request.setFlags(QgsFeatureRequest.NoGeometry)
-    for area in aggregate_hazard.getFeatures():
-        hazard_value = area[hazard_class_index]
-        value = area[total]
-        if (value == ''
-                or value is None
-                or isnan(value)
-                or (hasattr(value, 'isNull')
-                    and value.isNull())):
-            # For isnan, see ticket #3812
-            value = 0
-        if (hazard_value == ''
-                or hazard_value is None
-                or (hasattr(hazard_value, 'isNull')
-                    and hazard_value.isNull())):
-            hazard_value = 'NULL'
-        flat_table.add_value(
-            value,
-            hazard_class=hazard_value
-        )
+    # We summarize every absolute values.
+    sum_absolute_values(absolute_values, columns, all='all')
 
-        # We summarize every absolute values.
-        for field, field_definition in list(absolute_values.items()):
-            value = area[field]
-            if (value == ''
-                    or value is None
-                    or (hasattr(value, 'isNull')
-                        and value.isNull())):
-                value = 0
-            field_definition[0].add_value(
-                value,
-                all='all'
-            )
-
-    analysis.startEditing()
+    # Summarization
+    summary_values = {}
+    for key, (input_name, case_name) in list(summary_fields.items()):
+        case_values = summary_rules[key]['case_values']
+        summary_value = 0
+        for case_value, value in zip(
+                columns[case_name], columns[input_name]):
+            if case_value in case_values:
+                summary_value += value
+        summary_values[key] = summary_value
 
     shift = analysis.fields().count()
 
+    analysis.startEditing()
+
     counts = [
         total_affected_field,
         total_not_affected_field,
@@ -154,94 +167,75 @@ def analysis_summary(aggregate_hazard, analysis):
         counts,
         dynamic_structure)
 
+    # Summarizer of custom attributes
+    summary_indexes = {}
+    for key in list(summary_values.keys()):
+        summary_field = summary_rules[key]['summary_field']
+        field = create_field_from_definition(summary_field)
+        analysis.addAttribute(field)
+        summary_indexes[key] = analysis.fields().lookupField(field.name())
+        # noinspection PyTypeChecker
+        analysis.keywords['inasafe_fields'][summary_field['key']] = (
+            summary_field['field_name'])
+
     affected_sum = 0
     not_affected_sum = 0
     not_exposed_sum = 0
 
-    # Summarization
-    summary_values = {}
-    for key, summary_rule in list(summary_rules.items()):
-        input_field = summary_rule['input_field']
-        case_field = summary_rule['case_field']
-        if aggregate_hazard.fields().lookupField(input_field['field_name']) \
-                == -1:
-            continue
-        if aggregate_hazard.fields().lookupField(case_field['field_name']) \
-                == -1:
-            continue
-
-        summary_value = 0
-        for area in aggregate_hazard.getFeatures():
-            case_value = area[case_field['field_name']]
-            if case_value in summary_rule['case_values']:
-                summary_value += area[input_field['field_name']]
+    attributes = {}
+    total = 0
+    for i, val in enumerate(unique_hazard):
+        if (val == ''
+                or val is None
+                or (hasattr(val, 'isNull')
+                    and val.isNull())):
+            val = 'NULL'
+        sum = flat_table.get_value(hazard_class=val)
+        total += sum
+        attributes[shift + i] = sum
+
+        affected = post_processor_affected_function(
+            exposure=exposure,
+            hazard=hazard,
+            classification=classification,
+            hazard_class=val,
+            resolver=resolver)
+        if affected == not_exposed_class['key']:
+            not_exposed_sum += sum
+        elif affected:
+            affected_sum += sum
+        else:
+            not_affected_sum += sum
+
+    # Total Affected field
+    attributes[shift + len(unique_hazard)] = affected_sum
+
+    # Total Not affected field
+    attributes[shift + len(unique_hazard) + 1] = not_affected_sum
+
+    # Total Exposed field
+    attributes[shift + len(unique_hazard) + 2] = total - not_exposed_sum
+
+    # Total Not exposed field
+    attributes[shift + len(unique_hazard) + 3] = not_exposed_sum
+
+    # Total field
+    attributes[shift + len(unique_hazard) + 4] = total
+
+    # Any absolute postprocessors
+    for i, field in enumerate(absolute_values.values()):
+        value = field[0].get_value(
+            all='all'
+        )
+        attributes[shift + len(unique_hazard) + 5 + i] = value
 
-        summary_values[key] = summary_value
+    for key, summary_value in list(summary_values.items()):
+        attributes[summary_indexes[key]] = summary_value
 
-    for area in analysis.getFeatures(request):
-        total = 0
-        for i, val in enumerate(unique_hazard):
-            if (val == ''
-                    or val is None
-                    or (hasattr(val, 'isNull')
-                        and val.isNull())):
-                val = 'NULL'
-            sum = flat_table.get_value(hazard_class=val)
-            total += sum
-            analysis.changeAttributeValue(area.id(), shift + i, sum)
-
-            affected = post_processor_affected_function(
-                exposure=exposure,
-                hazard=hazard,
-                classification=classification,
-                hazard_class=val)
-            if affected == not_exposed_class['key']:
-                not_exposed_sum += sum
-            elif affected:
-                affected_sum += sum
-            else:
-                not_affected_sum += sum
-
-        # Total Affected field
-        analysis.changeAttributeValue(
-            area.id(), shift + len(unique_hazard), affected_sum)
-
-        # Total Not affected field
-        analysis.changeAttributeValue(
-            area.id(), shift + len(unique_hazard) + 1, not_affected_sum)
-
-        # Total Exposed field
-        analysis.changeAttributeValue(
-            area.id(), shift + len(unique_hazard) + 2, total - not_exposed_sum)
-
-        # Total Not exposed field
-        analysis.changeAttributeValue(
-            area.id(), shift + len(unique_hazard) + 3, not_exposed_sum)
-
-        # Total field
-        analysis.changeAttributeValue(
-            area.id(), shift + len(unique_hazard) + 4, total)
-
-        # Any absolute postprocessors
-        for i, field in enumerate(absolute_values.values()):
-            value = field[0].get_value(
-                all='all'
-            )
-            analysis.changeAttributeValue(
-                area.id(), shift + len(unique_hazard) + 5 + i, value)
-
-        # Summarizer of custom attributes
-        for key, summary_value in list(summary_values.items()):
-            summary_field = summary_rules[key]['summary_field']
-            field = create_field_from_definition(summary_field)
-            analysis.addAttribute(field)
-            field_index = analysis.fields().lookupField(field.name())
-            # noinspection PyTypeChecker
-            analysis.keywords['inasafe_fields'][summary_field['key']] = (
-                summary_field['field_name'])
-
-            analysis.changeAttributeValue(
-                area.id(), field_index, summary_value)
+    feature_ids, _ = read_columns(analysis, [])
+    write_values(
+        analysis,
+        {feature_id: attributes for feature_id in feature_ids})
 
     # Sanity check ± 1 to the result. Disabled for now as it seems ± 1 is not
     # enough. ET 13/02/17
@@ -250,8 +244,6 @@ def analysis_summary(aggregate_hazard, analysis):
     # if not -1 < (total_computed - total) < 1:
     #     raise ComputationError
 
-    analysis.commitChanges()
-
     analysis.keywords['title'] = layer_purpose_analysis_impacted['name']
     if qgis_version() >= 21600:
         analysis.setName(analysis.keywords['title'])
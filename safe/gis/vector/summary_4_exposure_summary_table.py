@@ -4,7 +4,7 @@
 
 from numbers import Number
 
-from qgis.core import QgsWkbTypes, QgsFeatureRequest, QgsFeature
+from qgis.core import QgsWkbTypes, QgsFeature
 
 from safe.definitions.fields import (
     aggregation_id_field,
@@ -30,7 +30,12 @@ from safe.definitions.processing_steps import (
 from safe.definitions.utilities import definition
 from safe.gis.sanity_check import check_layer
 from safe.gis.vector.summary_tools import (
-    check_inputs, create_absolute_values_structure)
+    check_inputs,
+    create_absolute_values_structure,
+    fill_null,
+    read_columns,
+    sum_absolute_values,
+)
 from safe.gis.vector.tools import (
     create_field_from_definition,
     read_dynamic_inasafe_field,
@@ -48,7 +53,8 @@ __revision__ = '$Format:%H$'
 
 @profile
 def exposure_summary_table(
-        aggregate_hazard, exposure_summary=None, callback=None):
+        aggregate_hazard, exposure_summary=None, callback=None,
+        resolver=None):
     """Compute the summary from the aggregate hazard to analysis.
 
     Source layer :
@@ -68,6 +74,9 @@ def exposure_summary_table(
         Defaults to None.
     :type callback: function
 
+    :param resolver: Optional hazard class lookup tables of the analysis.
+    :type resolver: safe.definitions.utilities.HazardClassResolver
+
     :return: The new tabular table, without geometry.
     :rtype: QgsVectorLayer
 
@@ -98,34 +107,28 @@ def exposure_summary_table(
     unique_exposure = read_dynamic_inasafe_field(
         source_fields, exposure_count_field)
 
-    flat_table = FlatTable('hazard_class', 'exposure_class')
+    hazard_values = fill_null(unique_hazard, 'NULL')
 
-    request = QgsFeatureRequest()
-    request.setFlags(QgsFeatureRequest.NoGeometry)
-    for area in aggregate_hazard.getFeatures():
-        hazard_value = area[hazard_class_index]
-        for exposure in unique_exposure:
-            key_name = exposure_count_field['key'] % exposure
-            field_name = source_fields[key_name]
-            exposure_count = area[field_name]
-            if not exposure_count:
-                exposure_count = 0
-
-            flat_table.add_value(
-                exposure_count,
-                hazard_class=hazard_value,
-                exposure_class=exposure
-            )
+    exposure_columns = []
+    for exposure in unique_exposure:
+        key_name = exposure_count_field['key'] % exposure
+        exposure_columns.append(source_fields[key_name])
 
-        # We summarize every absolute values.
-        for field, field_definition in list(absolute_values.items()):
-            value = area[field]
-            if not value:
-                value = 0
-            field_definition[0].add_value(
-                value,
-                all='all'
-            )
+    source_columns = [hazard_class_index] + exposure_columns
+    source_columns.extend(list(absolute_values.keys()))
+    _, columns = read_columns(aggregate_hazard, source_columns)
+    hazard_column = fill_null(columns[hazard_class_index], 'NULL')
+
+    flat_table = FlatTable('hazard_class', 'exposure_class')
+    for exposure, field_name in zip(unique_exposure, exposure_columns):
+        flat_table.add_values(
+            fill_null(columns[field_name], 0),
+            hazard_class=hazard_column,
+            exposure_class=exposure
+        )
+
+    # We summarize every absolute values.
+    sum_absolute_values(absolute_values, columns, all='all')
 
     tabular = create_memory_layer(output_layer_name, QgsWkbTypes.NullGeometry)
     tabular.startEditing()
@@ -143,11 +146,7 @@ def exposure_summary_table(
     exposure = exposure_keywords['exposure']
 
     hazard_affected = {}
-    for hazard_class in unique_hazard:
-        if (hazard_class == '' or hazard_class is None
-                or (hasattr(hazard_class, 'isNull')
-                    and hazard_class.isNull())):
-            hazard_class = 'NULL'
+    for hazard_class in hazard_values:
         field = create_field_from_definition(hazard_count_field, hazard_class)
         tabular.addAttribute(field)
         key = hazard_count_field['key'] % hazard_class
@@ -158,7 +157,8 @@ def exposure_summary_table(
             exposure=exposure,
             hazard=hazard,
             classification=classification,
-            hazard_class=hazard_class
+            hazard_class=hazard_class,
+            resolver=resolver
         )
 
     field = create_field_from_definition(total_affected_field)
@@ -210,6 +210,7 @@ def exposure_summary_table(
             value = field_definition['field_name']
             tabular.keywords['inasafe_fields'][key] = value
 
+    features = []
     for exposure_type in unique_exposure:
         feature = QgsFeature()
         attributes = [exposure_type]
@@ -217,9 +218,7 @@ def exposure_summary_table(
         total_not_affected = 0
         total_not_exposed = 0
         total = 0
-        for hazard_class in unique_hazard:
-            if hazard_class == '' or hazard_class is None:
-                hazard_class = 'NULL'
+        for hazard_class in hazard_values:
             value = flat_table.get_value(
                 hazard_class=hazard_class,
                 exposure_class=exposure_type
@@ -252,7 +251,7 @@ def exposure_summary_table(
                 attributes.append(value)
 
         feature.setAttributes(attributes)
-        tabular.addFeature(feature)
+        features.append(feature)
 
         # Sanity check ± 1 to the result. Disabled for now as it seems ± 1 is
         # not enough. ET 13/02/17
@@ -262,6 +261,7 @@ def exposure_summary_table(
         #     raise ComputationError
 
     tabular.commitChanges()
+    tabular.dataProvider().addFeatures(features)
 
     tabular.keywords['title'] = layer_purpose_exposure_summary_table['name']
     if qgis_version() >= 21800:
@@ -300,22 +300,33 @@ def summarize_result(exposure_summary):
             summarizer_flags[key] = True
             summarization_dicts[key] = {}
 
-    for feature in exposure_summary.getFeatures():
-        exposure_class_name = feature[exposure_class_field['field_name']]
-        # for summarizer_field in summarizer_fields:
-        for key, summary_rule in list(summary_rules.items()):
-            input_field = summary_rule['input_field']
-            case_field = summary_rule['case_field']
-            case_value = feature[case_field['field_name']]
-
-            flag = summarizer_flags[key]
-            if not flag:
-                continue
+    exposure_class_name = exposure_class_field['field_name']
+    source_columns = [exposure_class_name]
+    for key, flag in list(summarizer_flags.items()):
+        if flag:
+            summary_rule = summary_rules[key]
+            source_columns.append(summary_rule['input_field']['field_name'])
+            source_columns.append(summary_rule['case_field']['field_name'])
+    _, columns = read_columns(exposure_summary, source_columns)
+
+    for key in list(summarization_dicts.keys()):
+        summary_rule = summary_rules[key]
+        input_values = columns[summary_rule['input_field']['field_name']]
+        case_values = columns[summary_rule['case_field']['field_name']]
+        exposure_classes = []
+        values = []
+        for exposure_class, case_value, value in zip(
+                columns[exposure_class_name], case_values, input_values):
             if case_value in summary_rule['case_values']:
-                if exposure_class_name not in summarization_dicts[key]:
-                    summarization_dicts[key][exposure_class_name] = 0
-                value = feature[input_field['field_name']]
+                exposure_classes.append(exposure_class)
                 if isinstance(value, Number):
-                    summarization_dicts[key][exposure_class_name] += value
+                    values.append(value)
+                else:
+                    values.append(0)
+
+        flat_table = FlatTable('exposure_class')
+        flat_table.add_values(values, exposure_class=exposure_classes)
+        for (exposure_class, ), value in list(flat_table.data.items()):
+            summarization_dicts[key][exposure_class] = value
 
     return summarization_dicts
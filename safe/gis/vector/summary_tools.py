@@ -2,10 +2,13 @@
 
 """Some helpers about the summary calculation."""
 
+from qgis.core import QgsFeatureRequest
+
 from safe.common.exceptions import InvalidKeywordsForProcessingAlgorithm
 from safe.definitions.fields import count_fields
 from safe.definitions.utilities import definition
 from safe.gis.vector.tools import create_field_from_definition
+from safe.impact_function.postprocessors import is_null
 from safe.utilities.pivot_table import FlatTable
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
@@ -112,3 +115,99 @@ def add_fields(
         key = field_definition['key']
         value = field_definition['field_name']
         layer.keywords['inasafe_fields'][key] = value
+
+
+def read_columns(layer, fields, request=None):
+    """Read some attribute columns of a layer with a single request.
+
+    Geometries are not fetched.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+
+    :param fields: List of field names or field indexes to read.
+    :type fields: list
+
+    :param request: Optional request, to filter features for instance.
+    :type request: QgsFeatureRequest
+
+    :return: Tuple with the list of feature ids and a dictionary with the
+        list of values for each field name or index given in fields.
+    :rtype: (list, dict)
+    """
+    layer_fields = layer.fields()
+    indexes = [
+        field if isinstance(field, int) else layer_fields.lookupField(field)
+        for field in fields]
+
+    if request is None:
+        request = QgsFeatureRequest()
+    request.setFlags(QgsFeatureRequest.NoGeometry)
+    request.setSubsetOfAttributes(indexes)
+
+    feature_ids = []
+    rows = []
+    for feature in layer.getFeatures(request):
+        feature_ids.append(feature.id())
+        attributes = feature.attributes()
+        rows.append([attributes[index] for index in indexes])
+
+    if rows:
+        columns = [list(column) for column in zip(*rows)]
+    else:
+        columns = [[] for _ in fields]
+    return feature_ids, dict(list(zip(fields, columns)))
+
+
+def fill_null(values, replacement):
+    """Replace NULL and empty values in a column.
+
+    :param values: The column.
+    :type values: list
+
+    :param replacement: The value to use instead of NULL and ''.
+    :type replacement: object
+
+    :return: The new column.
+    :rtype: list
+    """
+    return [
+        replacement if is_null(value) or value == '' else value
+        for value in values]
+
+
+def sum_absolute_values(absolute_values, columns, **groups):
+    """Sum every absolute value column in its flat table.
+
+    :param absolute_values: The absolute value structure.
+    :type absolute_values: dict
+
+    :param columns: The columns read with read_columns, with the field
+        indexes of the absolute values.
+    :type columns: dict
+
+    :param groups: The value of each group, for each feature.
+    :type groups: list
+    """
+    for field, field_definition in list(absolute_values.items()):
+        field_definition[0].add_values(
+            fill_null(columns[field], 0), **groups)
+
+
+def write_values(layer, values):
+    """Write attribute values with one call to the data provider.
+
+    Pending changes in the edit buffer, such as new fields, are committed
+    first.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+
+    :param values: Dictionary of the new attribute values, for each feature
+        id, like {feature_id: {field_index: value}}.
+    :type values: dict
+    """
+    if layer.isEditable():
+        layer.commitChanges()
+    if values:
+        layer.dataProvider().changeAttributeValues(values)
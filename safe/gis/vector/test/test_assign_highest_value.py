@@ -11,6 +11,7 @@ QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app(qsetting=INASAFE_TEST)
 from qgis.core import QgsFeatureRequest
 
 from safe.definitions.fields import hazard_class_field
+from safe.gis.vector import assign_highest_value as assign_module
 from safe.gis.vector.assign_highest_value import assign_highest_value
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
@@ -67,3 +68,29 @@ class TestAssignHighestValueVector(unittest.TestCase):
             request = QgsFeatureRequest().setFilterExpression(expression)
             self.assertEqual(
                 sum(1 for _ in layer.getFeatures(request)), count)
+
+    @unittest.skipIf(
+        not assign_module.HAS_SHAPELY, 'Shapely 2 is not installed.')
+    def test_assign_highest_value_engines(self):
+        """Test the Shapely engine gives the same result as QGIS."""
+        results = []
+        for has_shapely in [True, False]:
+            exposure = load_test_vector_layer(
+                'gisv4', 'exposure', 'buildings.geojson',
+                clone_to_memory=True)
+            aggregate_hazard = load_test_vector_layer(
+                'gisv4', 'intermediate', 'aggregate_classified_hazard.geojson')
+            aggregate_hazard.keywords['classification'] = (
+                'generic_hazard_classes')
+            aggregate_hazard.keywords['aggregation_keywords'] = {}
+            aggregate_hazard.keywords['hazard_keywords'] = {}
+
+            assign_module.HAS_SHAPELY = has_shapely
+            try:
+                layer = assign_highest_value(exposure, aggregate_hazard)
+            finally:
+                assign_module.HAS_SHAPELY = True
+            results.append(
+                [feature.attributes() for feature in layer.getFeatures()])
+
+        self.assertListEqual(results[0], results[1])
@@ -0,0 +1,86 @@
+# coding=utf-8
+
+"""Test file for the attribute plan."""
+
+import unittest
+
+from safe.test.utilities import qgis_iface, load_test_vector_layer
+from safe.definitions.fields import (
+    exposure_class_field, exposure_type_field, female_ratio_field)
+
+from safe.gis.vector.attribute_plan import (
+    AttributePlan, prepare_exposure_attributes)
+from safe.gis.vector.default_values import add_default_values
+from safe.gis.vector.from_counts_to_ratios import from_counts_to_ratios
+from safe.gis.vector.prepare_vector_layer import prepare_vector_layer
+from safe.gis.vector.tools import create_field_from_definition
+from safe.gis.vector.update_value_map import update_value_map
+
+__copyright__ = "Copyright 2018, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+iface = qgis_iface()
+
+
+class TestAttributePlan(unittest.TestCase):
+
+    """Test class."""
+
+    def test_attribute_plan(self):
+        """Test we can change columns and write them once."""
+        layer = load_test_vector_layer(
+            'gisv4', 'exposure', 'buildings.geojson', clone_to_memory=True)
+        layer = prepare_vector_layer(layer)
+        count = layer.fields().count()
+        type_field = layer.keywords['inasafe_fields'][
+            exposure_type_field['key']]
+
+        plan = AttributePlan(layer)
+        self.assertEqual(len(plan), layer.featureCount())
+        plan.add_column(
+            create_field_from_definition(exposure_class_field),
+            [str(value) for value in plan.columns[type_field]])
+        plan.remove_column(type_field)
+        plan.commit()
+
+        self.assertEqual(layer.fields().count(), count)
+        self.assertEqual(layer.fields().lookupField(type_field), -1)
+        for feature_id, value in zip(
+                plan.feature_ids,
+                plan.columns[exposure_class_field['field_name']]):
+            feature = layer.getFeature(feature_id)
+            self.assertEqual(
+                feature[exposure_class_field['field_name']], value)
+
+    def test_prepare_exposure_attributes(self):
+        """Test the single pass is the same as the sequential steps."""
+        for name in ['population.geojson', 'buildings.geojson']:
+            expected = load_test_vector_layer(
+                'gisv4', 'exposure', name, clone=True)
+            expected = prepare_vector_layer(expected)
+            expected = from_counts_to_ratios(expected)
+            expected = add_default_values(expected)
+            fields = expected.keywords['inasafe_fields']
+            if exposure_class_field['key'] not in fields:
+                expected = update_value_map(expected)
+
+            layer = load_test_vector_layer(
+                'gisv4', 'exposure', name, clone=True)
+            layer = prepare_vector_layer(layer)
+            layer = prepare_exposure_attributes(layer)
+
+            self.assertDictEqual(layer.keywords, expected.keywords)
+            if name == 'population.geojson':
+                self.assertIn(
+                    female_ratio_field['key'],
+                    layer.keywords['inasafe_fields'])
+            self.assertEqual(
+                sorted(layer.fields().names()),
+                sorted(expected.fields().names()))
+            for feature, expected_feature in zip(
+                    layer.getFeatures(), expected.getFeatures()):
+                for field in expected.fields().names():
+                    self.assertEqual(
+                        feature[field], expected_feature[field], field)
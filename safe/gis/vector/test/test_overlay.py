@@ -0,0 +1,134 @@
+# coding=utf-8
+
+import unittest
+
+from qgis.core import QgsFeature, QgsGeometry, QgsWkbTypes
+
+from safe.definitions.constants import INASAFE_TEST
+from safe.test.utilities import (
+    get_qgis_app,
+    load_test_vector_layer)
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app(qsetting=INASAFE_TEST)
+
+from safe.definitions.fields import hazard_class_field, hazard_value_field
+from safe.gis.vector.clip import clip
+from safe.gis.vector.intersection import intersection
+from safe.gis.vector.overlay import (
+    HAS_SHAPELY, has_self_overlaps, overlay_workers, parallel_overlay)
+from safe.gis.vector.tools import create_memory_layer
+from safe.gis.vector.union import union
+
+__copyright__ = "Copyright 2018, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+def _total_length(layer):
+    """Total length of the geometries of a layer."""
+    return sum(feature.geometry().length() for feature in layer.getFeatures())
+
+
+def _area_by_attributes(layer):
+    """Total area of the features of a layer by attribute values."""
+    areas = {}
+    for feature in layer.getFeatures():
+        key = str(feature.attributes())
+        areas[key] = areas.get(key, 0) + feature.geometry().area()
+    return areas
+
+
+def _union_layers():
+    """The hazard and the aggregation for a union, with their keywords."""
+    hazard = load_test_vector_layer(
+        'gisv4', 'hazard', 'classified_vector.geojson')
+    hazard.keywords['inasafe_fields'][hazard_class_field['key']] = (
+        hazard.keywords['inasafe_fields'][hazard_value_field['key']])
+    aggregation = load_test_vector_layer(
+        'gisv4', 'aggregation', 'small_grid.geojson')
+    return hazard, aggregation
+
+
+class TestOverlay(unittest.TestCase):
+
+    def test_overlay_workers(self):
+        """Test the number of workers is always valid."""
+        self.assertEqual(overlay_workers(4), 4)
+        self.assertEqual(overlay_workers(0), 1)
+        self.assertEqual(overlay_workers('foo'), 1)
+
+    @unittest.skipIf(not HAS_SHAPELY, 'Shapely 2 is not installed.')
+    def test_parallel_overlay(self):
+        """Test the parallel overlay is the same as the serial one."""
+        exposure = load_test_vector_layer(
+            'gisv4', 'exposure', 'roads.geojson')
+        hazard = load_test_vector_layer(
+            'gisv4', 'hazard', 'classified_vector.geojson')
+        hazard.keywords = {
+            'aggregation_keywords': {},
+            'hazard_keywords': {},
+            'inasafe_fields': {}
+        }
+
+        serial = intersection(exposure, hazard, workers=1)
+        parallel = intersection(exposure, hazard, workers=3)
+        self.assertEqual(parallel.featureCount(), serial.featureCount())
+        self.assertEqual(parallel.fields().names(), serial.fields().names())
+        self.assertEqual(parallel.wkbType(), serial.wkbType())
+        self.assertAlmostEqual(
+            _total_length(parallel), _total_length(serial), places=6)
+        self.assertDictEqual(parallel.keywords, serial.keywords)
+
+        serial = clip(exposure, hazard, workers=1)
+        parallel = clip(exposure, hazard, workers=3)
+        self.assertEqual(parallel.featureCount(), serial.featureCount())
+        self.assertEqual(parallel.fields().names(), serial.fields().names())
+        self.assertAlmostEqual(
+            _total_length(parallel), _total_length(serial), places=6)
+
+    @unittest.skipIf(not HAS_SHAPELY, 'Shapely 2 is not installed.')
+    def test_parallel_union(self):
+        """Test the parallel union is the same as the serial one."""
+        serial = union(*_union_layers(), workers=1)
+        parallel = union(*_union_layers(), workers=3)
+        self.assertEqual(parallel.featureCount(), serial.featureCount())
+        self.assertEqual(parallel.fields().names(), serial.fields().names())
+        self.assertEqual(parallel.wkbType(), serial.wkbType())
+
+        serial_areas = _area_by_attributes(serial)
+        parallel_areas = _area_by_attributes(parallel)
+        self.assertEqual(sorted(parallel_areas), sorted(serial_areas))
+        for key, area in serial_areas.items():
+            self.assertAlmostEqual(parallel_areas[key], area, places=6)
+
+    @unittest.skipIf(not HAS_SHAPELY, 'Shapely 2 is not installed.')
+    def test_self_overlaps(self):
+        """Test a union with overlapping features is not run in parallel."""
+        touching = [
+            QgsGeometry.fromWkt('POLYGON((0 0, 1 0, 1 1, 0 1, 0 0))'),
+            QgsGeometry.fromWkt('POLYGON((1 0, 2 0, 2 1, 1 1, 1 0))'),
+        ]
+        overlapping = touching + [
+            QgsGeometry.fromWkt('POLYGON((0.5 0, 3 0, 3 1, 0.5 1, 0.5 0))'),
+        ]
+        self.assertFalse(has_self_overlaps(
+            [bytes(geometry.asWkb()) for geometry in touching]))
+        self.assertTrue(has_self_overlaps(
+            [bytes(geometry.asWkb()) for geometry in overlapping]))
+
+        hazard, aggregation = _union_layers()
+        layer = create_memory_layer(
+            'overlapping',
+            QgsWkbTypes.PolygonGeometry,
+            aggregation.crs(),
+            aggregation.fields())
+        features = []
+        for geometry in overlapping:
+            feature = QgsFeature(aggregation.fields())
+            feature.setGeometry(geometry)
+            features.append(feature)
+        layer.dataProvider().addFeatures(features)
+        self.assertIsNone(
+            parallel_overlay('union', layer, aggregation, workers=3))
+        self.assertIsNotNone(
+            parallel_overlay('union', hazard, aggregation, workers=3))
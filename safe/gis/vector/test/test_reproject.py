@@ -10,6 +10,7 @@ QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app(qsetting=INASAFE_TEST)
 
 from qgis.core import QgsCoordinateReferenceSystem
 
+from safe.gis.vector import reproject as reproject_module
 from safe.gis.vector.reproject import reproject
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
@@ -39,3 +40,28 @@ class TestReprojectVector(unittest.TestCase):
         self.assertEqual(
             reprojected.featureCount(), layer.featureCount())
         self.assertDictEqual(layer.keywords, reprojected.keywords)
+
+    @unittest.skipIf(
+        not reproject_module.HAS_SHAPELY, 'Shapely 2 is not installed.')
+    def test_reproject_vector_in_bulk(self):
+        """Test the bulk reprojection is the same as QGIS."""
+        output_crs = QgsCoordinateReferenceSystem(3857)
+        results = []
+        for has_shapely in [True, False]:
+            layer = load_test_vector_layer('exposure', 'buildings.shp')
+            reproject_module.HAS_SHAPELY = has_shapely
+            try:
+                results.append(reproject(layer=layer, output_crs=output_crs))
+            finally:
+                reproject_module.HAS_SHAPELY = True
+
+        bulk, expected = results
+        self.assertEqual(bulk.featureCount(), expected.featureCount())
+        for feature, expected_feature in zip(
+                bulk.getFeatures(), expected.getFeatures()):
+            self.assertEqual(
+                feature.attributes(), expected_feature.attributes())
+            self.assertTrue(feature.geometry().equals(
+                expected_feature.geometry()) or (
+                feature.geometry().hausdorffDistance(
+                    expected_feature.geometry()) < 0.01))
@@ -8,7 +8,10 @@ from safe.test.utilities import (
     load_test_vector_layer)
 QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app(qsetting=INASAFE_TEST)
 
+from qgis.core import QgsFeature, QgsGeometry, QgsRectangle, QgsWkbTypes
+
 from safe.gis.vector.smart_clip import smart_clip
+from safe.gis.vector.tools import create_memory_layer
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
 __license__ = "GPL version 3"
@@ -38,3 +41,24 @@ class TestClipVector(unittest.TestCase):
 
         # Add test about keywords
         # todo
+
+    def test_clip_vector_many_mask_features(self):
+        """Test we use every feature of the mask, not only the first one."""
+        analysis = load_test_vector_layer(
+            'gisv4', 'analysis', 'analysis.geojson')
+        exposure = load_test_vector_layer(
+            'gisv4', 'exposure', 'buildings.geojson')
+
+        # A first mask feature far from the buildings, then the analysis.
+        mask = create_memory_layer(
+            'mask', QgsWkbTypes.PolygonGeometry, analysis.crs())
+        far_away = QgsFeature()
+        far_away.setGeometry(QgsGeometry.fromRect(
+            QgsRectangle(0, 0, 0.001, 0.001)))
+        features = [far_away]
+        for feature in analysis.getFeatures():
+            features.append(feature)
+        mask.dataProvider().addFeatures(features)
+
+        layer = smart_clip(exposure, mask)
+        self.assertEqual(layer.featureCount(), 9)
@@ -23,6 +23,7 @@ from safe.gis.vector.summary_2_aggregation import aggregation_summary
 from safe.gis.vector.summary_3_analysis import analysis_summary
 from safe.gis.vector.summary_4_exposure_summary_table import (
     exposure_summary_table, summarize_result)
+from safe.gis.vector.summary_tools import fill_null, read_columns
 from safe.gis.vector.summary_5_multi_exposure import (
     multi_exposure_aggregation_summary, multi_exposure_analysis_summary)
 from safe.gis.sanity_check import check_inasafe_fields
@@ -40,6 +41,33 @@ class TestSummary(unittest.TestCase):
 
     """Summary calculation tests."""
 
+    def test_read_columns(self):
+        """Test we can read some columns of a layer at once."""
+        impact = load_test_vector_layer(
+            'gisv4',
+            'impacts',
+            'building-points-classified-vector.geojson')
+        fields = impact.keywords['inasafe_fields']
+        exposure_class = fields[exposure_class_field['key']]
+        hazard_class = fields[hazard_class_field['key']]
+        hazard_index = impact.fields().lookupField(hazard_class)
+
+        feature_ids, columns = read_columns(
+            impact, [exposure_class, hazard_index])
+        self.assertEqual(len(feature_ids), impact.featureCount())
+        self.assertListEqual(
+            sorted(columns.keys(), key=str), sorted(
+                [exposure_class, hazard_index], key=str))
+        for feature_id, exposure_value, hazard_value in zip(
+                feature_ids, columns[exposure_class], columns[hazard_index]):
+            feature = impact.getFeature(feature_id)
+            self.assertEqual(feature[exposure_class], exposure_value)
+            self.assertEqual(feature[hazard_class], hazard_value)
+
+        self.assertListEqual(
+            fill_null([None, '', 'high', 0], 'NULL'),
+            ['NULL', 'NULL', 'high', 0])
+
     def test_impact_summary(self):
         """Test we can aggregate the impact to the aggregate hazard."""
         impact = load_test_vector_layer(
@@ -15,6 +15,8 @@ from safe.definitions.fields import hazard_class_field
 from safe.definitions.hazard_classifications import not_exposed_class
 from safe.definitions.processing_steps import union_steps
 from safe.gis.sanity_check import check_layer
+from safe.gis.vector.overlay import (
+    can_run_in_parallel, overlay_workers, parallel_overlay)
 from safe.utilities.profiling import profile
 from safe.gis.processing_tools import (
     create_processing_context,
@@ -30,7 +32,7 @@ LOGGER = logging.getLogger('InaSAFE')
 
 
 @profile
-def union(union_a, union_b):
+def union(union_a, union_b, workers=None):
     """Union of two vector layers.
 
     Issue https://github.com/inasafe/inasafe/issues/3186
@@ -41,6 +43,12 @@ def union(union_a, union_b):
     :param union_b: The vector layer for the union.
     :type union_b: QgsVectorLayer
 
+    :param workers: The number of processes. If there are many and Shapely
+        2 is installed, the overlay is computed tile by tile in parallel,
+        unless a layer has overlapping features. Default to the
+        overlay_workers setting.
+    :type workers: int
+
     :return: The clip vector layer.
     :rtype: QgsVectorLayer
 
@@ -63,17 +71,22 @@ def union(union_a, union_b):
                   'OVERLAY': union_b,
                   'OUTPUT': 'memory:'}
 
-    # TODO implement callback through QgsProcessingFeedback object
-
-    initialize_processing()
-
-    feedback = create_processing_feedback()
-    context = create_processing_context(feedback=feedback)
-    result = processing.run('native:union', parameters, context=context)
-    if result is None:
-        raise ProcessingInstallationError
-
-    union_layer = result['OUTPUT']
+    workers = overlay_workers(workers)
+    union_layer = None
+    if can_run_in_parallel(workers):
+        # None if a layer has overlapping features.
+        union_layer = parallel_overlay('union', union_a, union_b, workers)
+    if union_layer is None:
+        # TODO implement callback through QgsProcessingFeedback object
+
+        initialize_processing()
+
+        feedback = create_processing_feedback()
+        context = create_processing_context(feedback=feedback)
+        result = processing.run('native:union', parameters, context=context)
+        if result is None:
+            raise ProcessingInstallationError
+        union_layer = result['OUTPUT']
     union_layer.setName(output_layer_name)
 
     # use to avoid modifying original source
@@ -14,10 +14,9 @@ Contact : ole.moller.nielsen@gmail.com
 import logging
 import os
 import sys
-from configparser import ConfigParser, MissingSectionHeaderError, Error
+from configparser import Error
 from datetime import datetime
 from importlib import reload
-from io import StringIO
 
 from future import standard_library
 from qgis.core import (
@@ -61,6 +60,8 @@ from safe.definitions.reports.components import (
 )
 from safe.definitions.utilities import update_template_component
 from safe.gui.tools.help.batch_help import batch_help
+from safe.impact_function.batch import (
+    read_scenarios, validate_scenario)
 from safe.impact_function.impact_function import ImpactFunction
 from safe.messaging import styles
 from safe.report.impact_report import ImpactReport
@@ -846,102 +847,6 @@ class BatchDialog(QDialog, FORM_CLASS):
         self.help_web_view.setHtml(string)
 
 
-def read_scenarios(filename):
-    """Read keywords dictionary from file.
-
-    :param filename: Name of file holding scenarios .
-
-    :return Dictionary of with structure like this
-        {{ 'foo' : { 'a': 'b', 'c': 'd'},
-            { 'bar' : { 'd': 'e', 'f': 'g'}}
-
-    A scenarios file may look like this:
-
-        [jakarta_flood]
-        hazard: /path/to/hazard.tif
-        exposure: /path/to/exposure.tif
-        function: function_id
-        aggregation: /path/to/aggregation_layer.tif
-        extent: minx, miny, maxx, maxy
-
-    Notes:
-        path for hazard, exposure, and aggregation are relative to scenario
-        file path
-    """
-    # Input checks
-    filename = os.path.abspath(filename)
-
-    blocks = {}
-    parser = ConfigParser()
-
-    # Parse the file content.
-    # if the content don't have section header
-    # we use the filename.
-    try:
-        parser.read(filename)
-    except MissingSectionHeaderError:
-        base_name = os.path.basename(filename)
-        name = os.path.splitext(base_name)[0]
-        section = '[%s]\n' % name
-        content = section + open(filename).read()
-        parser.readfp(StringIO(content))
-
-    # convert to dictionary
-    for section in parser.sections():
-        items = parser.items(section)
-        # add section as scenario name
-        items.append(('scenario_name', section))
-        # add full path to the blocks
-        items.append(('full_path', filename))
-        blocks[section] = {}
-        for key, value in items:
-            blocks[section][key] = value
-
-    # Ok we have generated a structure that looks like this:
-    # blocks = {{ 'foo' : { 'a': 'b', 'c': 'd'},
-    #           { 'bar' : { 'd': 'e', 'f': 'g'}}
-    # where foo and bar are scenarios and their dicts are the options for
-    # that scenario (e.g. hazard, exposure etc)
-    return blocks
-
-
-def validate_scenario(blocks, scenario_directory):
-    """Function to validate input layer stored in scenario file.
-
-    Check whether the files that are used in scenario file need to be
-    updated or not.
-
-    :param blocks: dictionary from read_scenarios
-    :type blocks: dictionary
-
-    :param scenario_directory: directory where scenario text file is saved
-    :type scenario_directory: file directory
-
-    :return: pass message to dialog and log detailed status
-    """
-    # dictionary to temporary contain status message
-    blocks_update = {}
-    for section, section_item in list(blocks.items()):
-        ready = True
-        for item in section_item:
-            if item in ['hazard', 'exposure', 'aggregation']:
-                # get relative path
-                rel_path = section_item[item]
-                full_path = os.path.join(scenario_directory, rel_path)
-                filepath = os.path.normpath(full_path)
-                if not os.path.exists(filepath):
-                    blocks_update[section] = {
-                        'status': 'Please update scenario'}
-                    LOGGER.info(section + ' needs to be updated')
-                    LOGGER.info('Unable to find ' + filepath)
-                    ready = False
-        if ready:
-            blocks_update[section] = {'status': 'Scenario ready'}
-            # LOGGER.info(section + " scenario is ready")
-    for section, section_item in list(blocks_update.items()):
-        blocks[section]['status'] = blocks_update[section]['status']
-
-
 def append_row(table, label, data):
     """Append new row to table widget.
 
@@ -13,10 +13,13 @@ import safe.definitions as definitions
 import safe.processors
 from safe import messaging as m
 from safe.common.version import get_version
+from safe.definitions.analysis_steps import analysis_steps
+from safe.definitions.concepts import concepts
 from safe.definitions.earthquake import current_earthquake_model_name
 from safe.definitions.exposure import exposure_all
 from safe.definitions.field_groups import (
     population_field_groups, aggregation_field_groups)
+from safe.definitions.hazard_category import hazard_category
 from safe.definitions.hazard_classifications import hazard_classification_type
 from safe.definitions.hazard_exposure_specifications import (
     specific_notes, specific_actions)
@@ -171,7 +174,7 @@ def content():
 
     last_group = None
     table = None
-    for key, value in list(definitions.concepts.items()):
+    for key, value in list(concepts.items()):
         current_group = value['group']
         if current_group != last_group:
             if last_group is not None:
@@ -365,7 +368,7 @@ def content():
         'analysis-internal-process',
         tr('Analysis internal process'),
         heading_level=2)
-    analysis = definitions.concepts['analysis']
+    analysis = concepts['analysis']
     message.add(analysis['description'])
     url = _definition_screenshot_url(analysis)
     if url:
@@ -377,7 +380,7 @@ def content():
         'analysis-progress-reporting',
         tr('Progress reporting steps'),
         heading_level=2)
-    steps = list(definitions.analysis_steps.values())
+    steps = list(analysis_steps.values())
     for step in steps:
         definition_to_message(
             step, message, table_of_contents, heading_level=3)
@@ -393,7 +396,6 @@ def content():
         tr('Hazard Concepts'),
         heading_level=1)
 
-    hazard_category = definitions.hazard_category
     definition_to_message(
         hazard_category,
         message,
@@ -9,14 +9,14 @@ import shutil
 import sys
 from datetime import datetime
 from subprocess import call, CalledProcessError
-from xml.dom import minidom
+from xml.parsers import expat
 
 import numpy as np
 import pytz
 # This import is required to enable PyQt API v2
 # noinspection PyUnresolvedReferences
 import qgis  # NOQA pylint: disable=unused-import
-from osgeo import gdal, ogr
+from osgeo import gdal, ogr, osr
 from osgeo.gdalconst import GA_ReadOnly
 from pytz import timezone
 from qgis.core import (
@@ -60,7 +60,7 @@ from safe.definitions.units import unit_mmi
 from safe.definitions.utilities import default_classification_thresholds
 from safe.definitions.versions import inasafe_keyword_version
 from safe.gis.raster.contour import (
-    gaussian_kernel, convolve, set_contour_properties)
+    gaussian_kernel, fast_convolve, set_contour_properties)
 from safe.utilities.i18n import tr
 from safe.utilities.keyword_io import KeywordIO
 from safe.utilities.resources import resources_path
@@ -77,6 +77,187 @@ USE_ASCII = 'use_ascii'
 NEAREST_NEIGHBOUR = 'nearest'
 INVDIST = 'invdist'
 
+# grid.xml columns used if the grid_field elements are missing.
+LONGITUDE_COLUMN = 0
+LATITUDE_COLUMN = 1
+MMI_COLUMN = 4
+
+
+class MmiData(object):
+
+    """MMI grid values stored as NumPy arrays.
+
+    It behaves like the list of (lon, lat, mmi) tuples used before, but the
+    values are stored in three contiguous float arrays.
+    """
+
+    def __init__(self, longitudes, latitudes, mmi):
+        """Constructor.
+
+        :param longitudes: The longitude of each grid point.
+        :type longitudes: numpy.ndarray
+
+        :param latitudes: The latitude of each grid point.
+        :type latitudes: numpy.ndarray
+
+        :param mmi: The MMI value of each grid point.
+        :type mmi: numpy.ndarray
+        """
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.mmi = np.asarray(mmi, dtype=np.float64)
+
+    def __len__(self):
+        return self.mmi.shape[0]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(zip(
+                self.longitudes[index].tolist(),
+                self.latitudes[index].tolist(),
+                self.mmi[index].tolist()))
+        return (
+            self.longitudes[index].item(),
+            self.latitudes[index].item(),
+            self.mmi[index].item())
+
+    def __iter__(self):
+        return zip(
+            self.longitudes.tolist(),
+            self.latitudes.tolist(),
+            self.mmi.tolist())
+
+
+class GridXmlReader(object):
+
+    """Incremental reader for USGS grid.xml files.
+
+    The file is read by chunks with expat. The attributes of the header
+    elements are kept, and the grid_data block is parsed directly into float
+    arrays for the longitude, latitude and MMI columns. Only the current
+    chunk of text is kept as a string.
+    """
+
+    def __init__(self, chunk_size=1 << 20):
+        """Constructor.
+
+        :param chunk_size: Number of bytes read at once.
+        :type chunk_size: int
+        """
+        self.chunk_size = chunk_size
+        self.shakemap_grid = {}
+        self.event = {}
+        self.grid_specification = {}
+        self.grid_fields = {}
+
+        self._in_grid_data = False
+        self._pending_text = []
+        self._values = None
+        self._count = 0
+        self._column_count = None
+        self._column_indexes = None
+
+    def read(self, grid_file):
+        """Read a grid.xml file.
+
+        :param grid_file: The file opened in binary mode.
+        :type grid_file: file
+        """
+        parser = expat.ParserCreate()
+        parser.StartElementHandler = self._start_element
+        parser.EndElementHandler = self._end_element
+        parser.CharacterDataHandler = self._character_data
+        parser.buffer_text = True
+        while True:
+            chunk = grid_file.read(self.chunk_size)
+            if not chunk:
+                break
+            parser.Parse(chunk, False)
+        parser.Parse(b'', True)
+
+    def columns(self):
+        """The longitude, latitude and MMI columns.
+
+        :returns: Tuple of three float arrays.
+        :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        if self._values is None:
+            return np.empty(0), np.empty(0), np.empty(0)
+        values = self._values[:self._count]
+        return values[:, 0].copy(), values[:, 1].copy(), values[:, 2].copy()
+
+    def _start_element(self, name, attributes):
+        name = name.split(':')[-1]
+        if name == 'shakemap_grid':
+            self.shakemap_grid = attributes
+        elif name == 'event':
+            self.event = attributes
+        elif name == 'grid_specification':
+            self.grid_specification = attributes
+        elif name == 'grid_field':
+            self.grid_fields[attributes['name'].upper()] = (
+                int(attributes['index']) - 1)
+        elif name == 'grid_data':
+            self._start_grid_data()
+
+    def _end_element(self, name):
+        if name.split(':')[-1] == 'grid_data':
+            self._parse_lines(''.join(self._pending_text))
+            self._pending_text = []
+            self._in_grid_data = False
+
+    def _character_data(self, data):
+        if not self._in_grid_data:
+            return
+        end_of_line = data.rfind('\n')
+        if end_of_line < 0:
+            self._pending_text.append(data)
+            return
+        self._pending_text.append(data[:end_of_line])
+        self._parse_lines(''.join(self._pending_text))
+        self._pending_text = [data[end_of_line + 1:]]
+
+    def _start_grid_data(self):
+        """Prepare the arrays before reading the grid_data block."""
+        self._in_grid_data = True
+        self._column_indexes = [
+            self.grid_fields.get('LON', LONGITUDE_COLUMN),
+            self.grid_fields.get('LAT', LATITUDE_COLUMN),
+            self.grid_fields.get('MMI', MMI_COLUMN),
+        ]
+        if self.grid_fields:
+            self._column_count = max(self.grid_fields.values()) + 1
+        try:
+            expected = int(float(self.grid_specification['nlon'])) * int(
+                float(self.grid_specification['nlat']))
+        except (KeyError, ValueError):
+            expected = 0
+        self._values = np.empty((max(expected, 1), 3))
+        self._count = 0
+
+    def _parse_lines(self, text):
+        """Parse complete lines of the grid_data block.
+
+        :param text: Some lines of the grid_data block.
+        :type text: str
+        """
+        if not text.strip():
+            return
+        if self._column_count is None:
+            # No grid_field, we use the number of values on the first line.
+            first_line = text.strip().split('\n')[0]
+            self._column_count = len(first_line.split())
+        values = np.array(text.split(), dtype=np.float64)
+        values = values.reshape(-1, self._column_count)
+        values = values[:, self._column_indexes]
+
+        size = self._count + values.shape[0]
+        if size > self._values.shape[0]:
+            self._values = np.resize(
+                self._values, (max(size, 2 * self._values.shape[0]), 3))
+        self._values[self._count:size] = values
+        self._count = size
+
 
 class ShakeGrid():
 
@@ -272,83 +453,49 @@ class ShakeGrid():
         LOGGER.debug('ParseGridXml requested.')
         grid_path = self.grid_file_path()
         try:
-            document = minidom.parse(grid_path)
-            shakemap_grid_element = document.getElementsByTagName(
-                'shakemap_grid')
-            shakemap_grid_element = shakemap_grid_element[0]
-            self.event_id = shakemap_grid_element.attributes[
-                'event_id'].nodeValue
-
-            event_element = document.getElementsByTagName('event')
-            event_element = event_element[0]
-            self.magnitude = float(
-                event_element.attributes['magnitude'].nodeValue)
-            self.longitude = float(
-                event_element.attributes['lon'].nodeValue)
-            self.latitude = float(
-                event_element.attributes['lat'].nodeValue)
-            self.location = event_element.attributes[
-                'event_description'].nodeValue.strip()
-            self.depth = float(
-                event_element.attributes['depth'].nodeValue)
+            reader = GridXmlReader()
+            with open(grid_path, 'rb') as grid_file:
+                reader.read(grid_file)
+
+            self.event_id = reader.shakemap_grid['event_id']
+
+            event = reader.event
+            self.magnitude = float(event['magnitude'])
+            self.longitude = float(event['lon'])
+            self.latitude = float(event['lat'])
+            self.location = event['event_description'].strip()
+            self.depth = float(event['depth'])
             # Get the date - it's going to look something like this:
             # 2012-08-07T01:55:12WIB
-            time_stamp = event_element.attributes['event_timestamp'].nodeValue
+            time_stamp = event['event_timestamp']
             # Note the timezone here is inconsistent with YZ from grid.xml
             # use the latter
             self.time_zone = time_stamp[19:]
             self.extract_date_time(time_stamp)
 
-            specification_element = document.getElementsByTagName(
-                'grid_specification')
-            specification_element = specification_element[0]
-            self.x_minimum = float(
-                specification_element.attributes['lon_min'].nodeValue)
-            self.x_maximum = float(
-                specification_element.attributes['lon_max'].nodeValue)
-            self.y_minimum = float(
-                specification_element.attributes['lat_min'].nodeValue)
-            self.y_maximum = float(
-                specification_element.attributes['lat_max'].nodeValue)
+            specification = reader.grid_specification
+            self.x_minimum = float(specification['lon_min'])
+            self.x_maximum = float(specification['lon_max'])
+            self.y_minimum = float(specification['lat_min'])
+            self.y_maximum = float(specification['lat_max'])
             self.grid_bounding_box = QgsRectangle(
                 self.x_minimum, self.y_maximum, self.x_maximum, self.y_minimum)
-            self.rows = int(float(
-                specification_element.attributes['nlat'].nodeValue))
-            self.columns = int(float(
-                specification_element.attributes['nlon'].nodeValue))
-            data_element = document.getElementsByTagName(
-                'grid_data')
-            data_element = data_element[0]
-            data = data_element.firstChild.nodeValue
-
-            # Extract the 1,2 and 5th (MMI) columns and populate mmi_data
-            longitude_column = 0
-            latitude_column = 1
-            mmi_column = 4
-            lon_list = []
-            lat_list = []
-            mmi_list = []
-            for line in data.split('\n'):
-                if not line:
-                    continue
-                tokens = line.split(' ')
-                longitude = tokens[longitude_column]
-                latitude = tokens[latitude_column]
-                mmi = tokens[mmi_column]
-                lon_list.append(float(longitude))
-                lat_list.append(float(latitude))
-                mmi_list.append(float(mmi))
+            self.rows = int(float(specification['nlat']))
+            self.columns = int(float(specification['nlon']))
+
+            lon_list, lat_list, mmi_list = reader.columns()
 
             if self.smoothing_method == NUMPY_SMOOTHING:
                 LOGGER.debug('We are using NUMPY smoothing')
-                ncols = len(np.where(np.array(lon_list) == lon_list[0])[0])
-                nrows = len(np.where(np.array(lat_list) == lat_list[0])[0])
+                ncols = np.count_nonzero(lon_list == lon_list[0])
+                nrows = np.count_nonzero(lat_list == lat_list[0])
 
                 # reshape mmi_list to 2D array to apply gaussian filter
                 Z = np.reshape(mmi_list, (nrows, ncols))
 
                 # smooth MMI matrix
-                mmi_list = convolve(Z, gaussian_kernel(self.smoothing_sigma))
+                mmi_list = fast_convolve(
+                    Z, gaussian_kernel(self.smoothing_sigma))
 
                 # reshape array back to 1D long list of mmi
                 mmi_list = np.reshape(mmi_list, ncols * nrows)
@@ -356,8 +503,8 @@ class ShakeGrid():
             elif self.smoothing_method == SCIPY_SMOOTHING:
                 LOGGER.debug('We are using SCIPY smoothing')
                 from scipy.ndimage.filters import gaussian_filter
-                ncols = len(np.where(np.array(lon_list) == lon_list[0])[0])
-                nrows = len(np.where(np.array(lat_list) == lat_list[0])[0])
+                ncols = np.count_nonzero(lon_list == lon_list[0])
+                nrows = np.count_nonzero(lat_list == lat_list[0])
 
                 # reshape mmi_list to 2D array to apply gaussian filter
                 Z = np.reshape(mmi_list, (nrows, ncols))
@@ -369,8 +516,7 @@ class ShakeGrid():
                 # reshape array back to 1D long list of mmi
                 mmi_list = np.reshape(mmi_list, ncols * nrows)
 
-            # zip lists as list of tuples
-            self.mmi_data = list(zip(lon_list, lat_list, mmi_list))
+            self.mmi_data = MmiData(lon_list, lat_list, mmi_list)
 
         except Exception as e:
             LOGGER.exception('Event parse failed')
@@ -405,10 +551,28 @@ class ShakeGrid():
            123.1500,01.7900,1.16
            etc...
         """
-        delimited_text = 'lon,lat,mmi\n'
-        for row in self.mmi_data:
-            delimited_text += '%s,%s,%s\n' % (row[0], row[1], row[2])
-        return delimited_text
+        return ''.join(self.delimited_lines())
+
+    def delimited_lines(self, chunk_size=65536):
+        """Generate the delimited text of the mmi data by chunks.
+
+        :param chunk_size: The number of grid points in each chunk.
+        :type chunk_size: int
+
+        :returns: A generator of strings, the header then the lines of each
+            chunk.
+        :rtype: generator
+        """
+        yield 'lon,lat,mmi\n'
+        line_format = '%s,%s,%s\n'.__mod__
+        mmi_data = self.mmi_data
+        for start in range(0, len(mmi_data), chunk_size):
+            end = start + chunk_size
+            rows = zip(
+                mmi_data.longitudes[start:end].tolist(),
+                mmi_data.latitudes[start:end].tolist(),
+                mmi_data.mmi[start:end].tolist())
+            yield ''.join(map(line_format, rows))
 
     def mmi_to_delimited_file(self, force_flag=True):
         """Save mmi_data to delimited text file suitable for gdal_grid.
@@ -437,9 +601,8 @@ class ShakeGrid():
         # short circuit if the csv is already created.
         if os.path.exists(csv_path) and force_flag is not True:
             return csv_path
-        csv_file = open(csv_path, 'w')
-        csv_file.write(self.mmi_to_delimited_text())
-        csv_file.close()
+        with open(csv_path, 'w') as csv_file:
+            csv_file.writelines(self.delimited_lines())
 
         # Also write the .csvt which contains metadata about field types
         csvt_path = os.path.join(
@@ -523,8 +686,10 @@ class ShakeGrid():
 
         A geotiff file will be created.
 
-        Unfortunately no python bindings exist for doing this so we are
-        going to do it using a shell call.
+        With the 'use_ascii' algorithm on a regular grid, the values are
+        written directly with the GDAL Python API. Otherwise, no python
+        bindings exist for doing this so we are going to do it using a shell
+        call.
 
         .. see also:: http://www.gdal.org/gdal_grid.html
 
@@ -577,7 +742,10 @@ class ShakeGrid():
         if os.path.exists(tif_path) and force_flag is not True:
             return tif_path
 
-        if algorithm == USE_ASCII:
+        if algorithm == USE_ASCII and self.is_regular_grid():
+            # No need of the ascii file, the grid is written directly.
+            self.mmi_to_geotiff(tif_path)
+        elif algorithm == USE_ASCII:
             # Convert to ascii
             ascii_path = self.mmi_to_ascii(True)
 
@@ -653,6 +821,69 @@ class ShakeGrid():
         shutil.copyfile(qml_source_path, qml_path)
         return tif_path
 
+    def is_regular_grid(self):
+        """Check if the grid points are ordered as a regular raster.
+
+        The points must be ordered row by row, with the same longitudes on
+        each row and the same latitude along a row.
+
+        :returns: True if the MMI values can be reshaped to the raster.
+        :rtype: bool
+        """
+        if not self.rows or not self.columns:
+            return False
+        if len(self.mmi_data) != self.rows * self.columns:
+            return False
+        longitudes = np.reshape(
+            self.mmi_data.longitudes, (self.rows, self.columns))
+        latitudes = np.reshape(
+            self.mmi_data.latitudes, (self.rows, self.columns))
+        same_longitudes = (longitudes == longitudes[0]).all()
+        same_latitudes = (latitudes == latitudes[:, [0]]).all()
+        return bool(same_longitudes and same_latitudes)
+
+    def mmi_to_geotiff(self, tif_path):
+        """Write the MMI values of a regular grid to a geotiff.
+
+        The values are reshaped to the raster and written with the GDAL
+        Python API. The result is the same as the ascii file converted with
+        gdal_translate: the cell size and the values are rounded to 3
+        decimals as in the ascii file.
+
+        :param tif_path: The output path.
+        :type tif_path: str
+
+        :returns: The output path.
+        :rtype: str
+        """
+        cell_size = round(
+            (self.x_maximum - self.x_minimum) / (self.rows - 1), 3)
+        x_lower_left = round(self.x_minimum, 3)
+        y_lower_left = round(self.y_minimum, 3)
+        cell_values = np.round(np.reshape(
+            self.mmi_data.mmi, (self.rows, self.columns)), 3)
+
+        driver = gdal.GetDriverByName('GTiff')
+        raster = driver.Create(
+            tif_path, self.columns, self.rows, 1, gdal.GDT_Float32)
+        raster.SetGeoTransform([
+            x_lower_left,
+            cell_size,
+            0,
+            y_lower_left + self.rows * cell_size,
+            0,
+            -cell_size])
+        spatial_reference = osr.SpatialReference()
+        spatial_reference.ImportFromEPSG(4326)
+        raster.SetProjection(spatial_reference.ExportToWkt())
+        band = raster.GetRasterBand(1)
+        # Same nodata value as in the ascii file.
+        band.SetNoDataValue(-9999)
+        band.WriteArray(cell_values.astype(np.float32))
+        raster.FlushCache()
+        del raster
+        return tif_path
+
     def mmi_to_shapefile(self, force_flag=False):
         """Convert grid.xml's mmi column to a vector shp file using ogr2ogr.
 
@@ -974,7 +1205,7 @@ class ShakeGrid():
 
         cell_string = ''
         cell_values = np.reshape(
-            [v[2] for v in self.mmi_data], (self.rows, self.columns))
+            self.mmi_data.mmi, (self.rows, self.columns))
         for i in range(self.rows):
             for j in range(self.columns):
                 cell_string += '%.3f ' % cell_values[i][j]
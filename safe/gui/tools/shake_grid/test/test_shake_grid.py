@@ -2,9 +2,12 @@
 """Test Shake Grid."""
 
 import os
+import time
 import unittest
 import shutil
 
+import numpy as np
+from osgeo import gdal
 from qgis.core import QgsVectorLayer
 
 from safe.definitions.hazard import hazard_earthquake
@@ -143,6 +146,12 @@ class TestShakeGrid(unittest.TestCase):
         grid_xml_data = SMOOTHED_SHAKE_GRID.mmi_data
         self.assertEqual(10201, len(grid_xml_data))
 
+        # The data is stored in arrays but it can be used as tuples.
+        grid_xml_data = NORMAL_SHAKE_GRID.mmi_data
+        self.assertEqual((139.37, -1.1813, 1.0), grid_xml_data[0])
+        self.assertEqual(10201, grid_xml_data.mmi.shape[0])
+        self.assertEqual(list(grid_xml_data)[-1], grid_xml_data[-1])
+
         # Check SHAKE_GRID.grid_bounding_box
         bounds = SMOOTHED_SHAKE_GRID.grid_bounding_box.toString()
         expected_result = (
@@ -192,6 +201,60 @@ class TestShakeGrid(unittest.TestCase):
         csvt_file.close()
         self.assertEqual(1, len(csvt_string))
 
+        # The streamed file is the same as the delimited text.
+        with open(file_path) as delimited_file:
+            self.assertEqual(
+                SMOOTHED_SHAKE_GRID.mmi_to_delimited_text(),
+                delimited_file.read())
+
+    @unittest.skipIf(
+        not os.environ.get('INASAFE_BENCHMARK'),
+        'Set INASAFE_BENCHMARK to run benchmarks.')
+    def test_mmi_to_delimited_file_benchmark(self):
+        """Benchmark the delimited file on a 1M points synthetic grid."""
+        size = 1000
+        with open(SOURCE_PATH) as source_file:
+            source = source_file.read()
+        header = source[:source.index('<grid_data>')]
+        header = header.replace('nlon="101"', 'nlon="%s"' % size)
+        header = header.replace('nlat="101"', 'nlat="%s"' % size)
+        longitudes = np.round(np.linspace(139.37, 141.87, size), 4)
+        latitudes = np.round(np.linspace(-1.18125, -3.67875, size), 4)
+        mmi = np.round(np.random.RandomState(0).uniform(1, 9, size), 2)
+
+        grid_path = os.path.join(temp_dir(__name__), 'benchmark', 'grid.xml')
+        if not os.path.exists(os.path.dirname(grid_path)):
+            os.makedirs(os.path.dirname(grid_path))
+        with open(grid_path, 'w') as grid_file:
+            grid_file.write(header)
+            grid_file.write('<grid_data>\n')
+            for latitude in latitudes:
+                grid_file.writelines(
+                    '%s %s 0 0 %s 0 0 0\n' % (longitude, latitude, value)
+                    for longitude, value in zip(longitudes, mmi))
+            grid_file.write('</grid_data>\n</shakemap_grid>\n')
+
+        shake_grid = ShakeGrid('Benchmark', 'Benchmark', grid_path)
+        self.assertEqual(size * size, len(shake_grid.mmi_data))
+
+        # The previous implementation, as a reference.
+        start = time.time()
+        delimited_text = 'lon,lat,mmi\n'
+        for row in shake_grid.mmi_data:
+            delimited_text += '%s,%s,%s\n' % (row[0], row[1], row[2])
+        with open(grid_path.replace('.xml', '.csv'), 'w') as csv_file:
+            csv_file.write(delimited_text)
+        previous_duration = time.time() - start
+
+        start = time.time()
+        csv_path = shake_grid.mmi_to_delimited_file(force_flag=True)
+        duration = time.time() - start
+
+        with open(csv_path) as csv_file:
+            self.assertEqual(delimited_text, csv_file.read())
+        print('Delimited file with %s points: %.2fs, previously %.2fs' % (
+            size * size, duration, previous_duration))
+
     def test_mmi_to_raster(self):
         """Check we can convert the shake event to a raster."""
         # Check the tif file
@@ -207,6 +270,32 @@ class TestShakeGrid(unittest.TestCase):
         keywords = read_iso19115_metadata(raster_path)
         self.assertIn('extra_keywords', list(keywords.keys()))
 
+    def test_mmi_to_geotiff(self):
+        """Check the direct geotiff is the same as the ascii conversion."""
+        self.assertTrue(NORMAL_SHAKE_GRID.is_regular_grid())
+
+        tif_path = unique_filename(suffix='.tif', dir=temp_dir(__name__))
+        NORMAL_SHAKE_GRID.mmi_to_geotiff(tif_path)
+
+        ascii_path = NORMAL_SHAKE_GRID.mmi_to_ascii(force_flag=True)
+        expected_path = unique_filename(
+            suffix='.tif', dir=temp_dir(__name__))
+        gdal.Translate(expected_path, ascii_path, outputSRS='EPSG:4326')
+
+        raster = gdal.Open(tif_path)
+        expected = gdal.Open(expected_path)
+        self.assertEqual(raster.RasterXSize, expected.RasterXSize)
+        self.assertEqual(raster.RasterYSize, expected.RasterYSize)
+        self.assertTrue(np.allclose(
+            raster.GetGeoTransform(), expected.GetGeoTransform()))
+        self.assertTrue(np.allclose(
+            raster.GetRasterBand(1).ReadAsArray(),
+            expected.GetRasterBand(1).ReadAsArray()))
+        self.assertEqual(
+            raster.GetRasterBand(1).GetNoDataValue(),
+            expected.GetRasterBand(1).GetNoDataValue())
+        self.assertEqual(raster.GetRasterBand(1).GetNoDataValue(), -9999)
+
     def test_mmi_to_shapefile(self):
         """Check we can convert the shake event to a shapefile."""
         # Check the shp file
@@ -96,7 +96,6 @@ from safe.gui.analysis_utilities import (
 from safe.gui.gui_utilities import add_ordered_combo_item, layer_from_combo
 from safe.gui.tools.about_dialog import AboutDialog
 from safe.gui.tools.help_dialog import HelpDialog
-from safe.gui.tools.print_report_dialog import PrintReportDialog
 from safe.gui.widgets.message import (
     conflicting_plugin_message,
     conflicting_plugin_string,
@@ -106,12 +105,7 @@ from safe.gui.widgets.message import (
     show_keyword_version_message,
     show_no_keywords_message
 )
-from safe.impact_function.impact_function import ImpactFunction
-from safe.impact_function.multi_exposure_wrapper import \
-    MultiExposureImpactFunction
 from safe.messaging import styles
-from safe.report.impact_report import ImpactReport
-from safe.report.report_metadata import ReportMetadata
 from safe.utilities.extent import Extent
 from safe.utilities.gis import layer_icon, qgis_version, wkt_to_rectangle
 from safe.utilities.i18n import tr
@@ -810,6 +804,10 @@ class Dock(QDockWidget, FORM_CLASS):
 
     def show_print_dialog(self):
         """Open the print dialog"""
+        from safe.gui.tools.print_report_dialog import PrintReportDialog
+        from safe.impact_function.impact_function import ImpactFunction
+        from safe.impact_function.multi_exposure_wrapper import (
+            MultiExposureImpactFunction)
         if not self.impact_function:
             # Now try to read the keywords and show them in the dock
             try:
@@ -994,6 +992,10 @@ class Dock(QDockWidget, FORM_CLASS):
 
             if provenances:
                 set_provenance_to_project_variables(provenances)
+            # Not imported at startup, the dock is created with the plugin.
+            from safe.impact_function.impact_function import ImpactFunction
+            from safe.impact_function.multi_exposure_wrapper import (
+                MultiExposureImpactFunction)
             try:
                 if is_multi_exposure:
                     self.impact_function = (
@@ -1103,6 +1105,8 @@ class Dock(QDockWidget, FORM_CLASS):
 
     def print_map(self):
         """Open impact report dialog used to tune report when printing."""
+        from safe.report.impact_report import ImpactReport
+        from safe.report.report_metadata import ReportMetadata
         # Check if selected layer is valid
         impact_layer = self.iface.activeLayer()
         if impact_layer is None:
@@ -1310,6 +1314,8 @@ class Dock(QDockWidget, FORM_CLASS):
         Please update the code in step_fc990_analysis.py in function
         setup_and_run_analysis(). It should follow approximately the same code.
         """
+        from safe.impact_function.impact_function import ImpactFunction
+        from safe.report.impact_report import ImpactReport
         if self.conflicting_plugin_detected:
             display_critical_message_bar(
                 tr('Conflicting plugin'),
@@ -1428,6 +1434,7 @@ class Dock(QDockWidget, FORM_CLASS):
 
         .. versionadded:: 4.0
         """
+        from safe.impact_function.impact_function import ImpactFunction
         # First, we check if the dock is not busy.
         if self.busy:
             return False, None
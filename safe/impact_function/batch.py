@@ -0,0 +1,431 @@
+# coding=utf-8
+
+"""Run the scenarios of the batch runner without GUI, on many processes.
+
+The scenario files are the .txt files used by the batch runner dialog. Each
+scenario is run by a worker process with its own QGIS application. The
+outputs of a scenario are written in a folder named after the scenario file
+and the scenario. A JSON summary with the status and the duration of each
+scenario is written at the end::
+
+    python -m safe.impact_function.batch scenarios/ -o outputs -w 8
+"""
+
+import argparse
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from configparser import ConfigParser, MissingSectionHeaderError, Error
+from datetime import datetime
+from io import StringIO
+from multiprocessing import get_context
+
+from safe.impact_function.parallel import start_qgis
+from safe.utilities.utilities import write_json
+
+__copyright__ = "Copyright 2018, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+summary_file = 'summary.json'
+
+
+def read_scenarios(filename):
+    """Read keywords dictionary from file.
+
+    :param filename: Name of file holding scenarios .
+
+    :return Dictionary of with structure like this
+        {{ 'foo' : { 'a': 'b', 'c': 'd'},
+            { 'bar' : { 'd': 'e', 'f': 'g'}}
+
+    A scenarios file may look like this:
+
+        [jakarta_flood]
+        hazard: /path/to/hazard.tif
+        exposure: /path/to/exposure.tif
+        function: function_id
+        aggregation: /path/to/aggregation_layer.tif
+        extent: minx, miny, maxx, maxy
+
+    Notes:
+        path for hazard, exposure, and aggregation are relative to scenario
+        file path
+    """
+    # Input checks
+    filename = os.path.abspath(filename)
+
+    blocks = {}
+    parser = ConfigParser()
+
+    # Parse the file content.
+    # if the content don't have section header
+    # we use the filename.
+    try:
+        parser.read(filename)
+    except MissingSectionHeaderError:
+        base_name = os.path.basename(filename)
+        name = os.path.splitext(base_name)[0]
+        section = '[%s]\n' % name
+        content = section + open(filename).read()
+        parser.readfp(StringIO(content))
+
+    # convert to dictionary
+    for section in parser.sections():
+        items = parser.items(section)
+        # add section as scenario name
+        items.append(('scenario_name', section))
+        # add full path to the blocks
+        items.append(('full_path', filename))
+        blocks[section] = {}
+        for key, value in items:
+            blocks[section][key] = value
+
+    # Ok we have generated a structure that looks like this:
+    # blocks = {{ 'foo' : { 'a': 'b', 'c': 'd'},
+    #           { 'bar' : { 'd': 'e', 'f': 'g'}}
+    # where foo and bar are scenarios and their dicts are the options for
+    # that scenario (e.g. hazard, exposure etc)
+    return blocks
+
+
+def validate_scenario(blocks, scenario_directory):
+    """Function to validate input layer stored in scenario file.
+
+    Check whether the files that are used in scenario file need to be
+    updated or not.
+
+    :param blocks: dictionary from read_scenarios
+    :type blocks: dictionary
+
+    :param scenario_directory: directory where scenario text file is saved
+    :type scenario_directory: file directory
+
+    :return: pass message to dialog and log detailed status
+    """
+    # dictionary to temporary contain status message
+    blocks_update = {}
+    for section, section_item in list(blocks.items()):
+        ready = True
+        for item in section_item:
+            if item in ['hazard', 'exposure', 'aggregation']:
+                # get relative path
+                rel_path = section_item[item]
+                full_path = os.path.join(scenario_directory, rel_path)
+                filepath = os.path.normpath(full_path)
+                if not os.path.exists(filepath):
+                    blocks_update[section] = {
+                        'status': 'Please update scenario'}
+                    LOGGER.info(section + ' needs to be updated')
+                    LOGGER.info('Unable to find ' + filepath)
+                    ready = False
+        if ready:
+            blocks_update[section] = {'status': 'Scenario ready'}
+            # LOGGER.info(section + " scenario is ready")
+    for section, section_item in list(blocks_update.items()):
+        blocks[section]['status'] = blocks_update[section]['status']
+
+
+def scenario_files(paths):
+    """List the scenario files from files and folders.
+
+    :param paths: Scenario files or folders with .txt scenario files.
+    :type paths: list
+
+    :return: The scenario files.
+    :rtype: list
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if os.path.splitext(name)[1] == '.txt')
+        else:
+            files.append(path)
+    return files
+
+
+def scenario_layer(layer_path, scenario_directory):
+    """Create a raster or vector layer from a path in a scenario.
+
+    :param layer_path: The path, relative to the scenario directory.
+    :type layer_path: str
+
+    :param scenario_directory: The directory of the scenario file.
+    :type scenario_directory: str
+
+    :return: The layer, None if it's not a raster nor a vector layer.
+    :rtype: QgsMapLayer
+    """
+    from qgis.core import QgsRasterLayer, QgsVectorLayer
+
+    full_path = os.path.normpath(os.path.join(scenario_directory, layer_path))
+    base_name = os.path.splitext(os.path.split(layer_path)[-1])[0]
+
+    layer = QgsRasterLayer(full_path, base_name)
+    if layer.isValid():
+        return layer
+    layer = QgsVectorLayer(full_path, base_name, 'ogr')
+    if layer.isValid():
+        return layer
+    return None
+
+
+def scenario_folders(scenarios, output_directory):
+    """Output folder of each scenario.
+
+    The folder name is the name of the scenario file and the name of the
+    scenario, so scenarios with the same name in different files are not
+    written in the same folder. A number is added if the name is still
+    used.
+
+    :param scenarios: The scenarios, from read_scenarios.
+    :type scenarios: list
+
+    :param output_directory: The directory for the scenario folders.
+    :type output_directory: str
+
+    :return: The folder of each scenario, in the same order.
+    :rtype: list
+    """
+    folders = []
+    used_names = set()
+    for scenario in scenarios:
+        file_name = os.path.splitext(
+            os.path.basename(scenario['full_path']))[0]
+        name = base_name = '%s_%s' % (file_name, scenario['scenario_name'])
+        count = 1
+        # Some file systems are not case sensitive.
+        while name.lower() in used_names:
+            count += 1
+            name = '%s_%s' % (base_name, count)
+        used_names.add(name.lower())
+        folders.append(os.path.join(output_directory, name))
+    return folders
+
+
+def run_scenario(scenario, folder):
+    """Run the impact function of a scenario.
+
+    It's the same analysis as the batch runner dialog, without the report.
+    Without aggregation, the extent CRS is the analysis CRS.
+
+    :param scenario: The scenario, from read_scenarios.
+    :type scenario: dict
+
+    :param folder: The output folder of the scenario, from
+        scenario_folders.
+    :type folder: str
+
+    :return: The scenario name, the status, the message, the output folder
+        and the duration in seconds.
+    :rtype: dict
+    """
+    start = datetime.now()
+    name = scenario['scenario_name']
+    result = {
+        'scenario': name,
+        'file': scenario['full_path'],
+        'status': 'failed',
+        'message': None,
+        'output_directory': None,
+    }
+    try:
+        message = _run_scenario(scenario, folder, result)
+        result['message'] = message
+    except Exception as e:
+        LOGGER.exception('Scenario %s failed.' % name)
+        result['message'] = '%s: %s' % (type(e).__name__, e)
+    result['duration'] = (datetime.now() - start).total_seconds()
+    return result
+
+
+def _run_scenario(scenario, folder, result):
+    """Run the impact function of a scenario, see run_scenario.
+
+    :param scenario: The scenario, from read_scenarios.
+    :type scenario: dict
+
+    :param folder: The output folder of the scenario.
+    :type folder: str
+
+    :param result: The result of run_scenario, to update.
+    :type result: dict
+
+    :return: The error message, None if the analysis succeeded.
+    :rtype: str
+    """
+    start_qgis()
+
+    from qgis.core import QgsCoordinateReferenceSystem, QgsRectangle
+    from safe.datastore.folder import Folder
+    from safe.definitions.constants import ANALYSIS_SUCCESS, PREPARE_SUCCESS
+    from safe.impact_function.impact_function import ImpactFunction
+    from safe.utilities.gis import extent_string_to_array
+
+    scenario_directory = os.path.dirname(scenario['full_path'])
+    layers = {}
+    for key in ['hazard', 'exposure', 'aggregation']:
+        if scenario.get(key):
+            layers[key] = scenario_layer(scenario[key], scenario_directory)
+            if not layers[key]:
+                return 'Unable to find {path}'.format(path=scenario[key])
+        elif key != 'aggregation':
+            return 'The scenario does not contain the {key} path'.format(
+                key=key)
+
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    result['output_directory'] = folder
+
+    impact_function = ImpactFunction()
+    impact_function.datastore = Folder(folder)
+    impact_function.datastore.default_vector_format = 'geojson'
+    impact_function.hazard = layers['hazard']
+    impact_function.exposure = layers['exposure']
+    if layers.get('aggregation'):
+        impact_function.aggregation = layers['aggregation']
+    else:
+        impact_function.crs = QgsCoordinateReferenceSystem(
+            scenario.get('extent_crs', 'EPSG:4326'))
+        if scenario.get('extent'):
+            coordinates = extent_string_to_array(scenario['extent'])
+            impact_function.requested_extent = QgsRectangle(*coordinates)
+
+    status, message = impact_function.prepare()
+    if status != PREPARE_SUCCESS:
+        return message.to_text()
+
+    status, message = impact_function.run()
+    if status != ANALYSIS_SUCCESS:
+        return message.to_text()
+
+    result['status'] = 'success'
+    return None
+
+
+def run_scenarios(scenarios, output_directory, workers=1):
+    """Run many scenarios on many processes.
+
+    :param scenarios: The scenarios, from read_scenarios.
+    :type scenarios: list
+
+    :param output_directory: The directory for the scenario folders.
+    :type output_directory: str
+
+    :param workers: The number of processes. With one process, scenarios
+        are run in this process.
+    :type workers: int
+
+    :return: The result of run_scenario for each scenario, in the same
+        order.
+    :rtype: list
+    """
+    folders = scenario_folders(scenarios, output_directory)
+    if workers < 2 or len(scenarios) < 2:
+        return [
+            run_scenario(scenario, folder)
+            for scenario, folder in zip(scenarios, folders)]
+
+    results = [None] * len(scenarios)
+    with ProcessPoolExecutor(
+            max_workers=min(workers, len(scenarios)),
+            mp_context=get_context('spawn')) as executor:
+        futures = {
+            executor.submit(run_scenario, scenario, folder): index
+            for index, (scenario, folder) in enumerate(
+                zip(scenarios, folders))}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                # The worker process died or the scenario could not be sent
+                # to the worker.
+                scenario = scenarios[index]
+                results[index] = {
+                    'scenario': scenario['scenario_name'],
+                    'file': scenario['full_path'],
+                    'status': 'failed',
+                    'message': '%s: %s' % (type(e).__name__, e),
+                    'output_directory': None,
+                    'duration': None,
+                }
+            LOGGER.info('Scenario {scenario}: {status}'.format(
+                **results[index]))
+    return results
+
+
+def main(arguments=None):
+    """Command line entry point.
+
+    :param arguments: The command line arguments, without the program name.
+        If None, sys.argv is used.
+    :type arguments: list
+
+    :return: The exit status, 0 if every scenario succeeded.
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(
+        description='Run InaSAFE batch scenario files without GUI.')
+    parser.add_argument(
+        'paths', nargs='+',
+        help='Scenario .txt files or folders with scenario files.')
+    parser.add_argument(
+        '-o', '--output', default=os.getcwd(),
+        help='Output directory, with a folder for each scenario.')
+    parser.add_argument(
+        '-w', '--workers', type=int, default=os.cpu_count() or 1,
+        help='Number of processes.')
+    parser.add_argument(
+        '-s', '--summary', default=None,
+        help='JSON summary path. Default to summary.json in the output '
+             'directory.')
+    options = parser.parse_args(arguments)
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    start = datetime.now()
+    scenarios = []
+    errors = []
+    for path in scenario_files(options.paths):
+        try:
+            blocks = read_scenarios(path)
+        except Error as e:
+            errors.append({'file': path, 'message': str(e)})
+            continue
+        scenarios.extend(blocks[name] for name in sorted(blocks))
+
+    if not os.path.exists(options.output):
+        os.makedirs(options.output)
+    results = run_scenarios(scenarios, options.output, options.workers)
+
+    summary = {
+        'start_datetime': start.isoformat(),
+        'duration': (datetime.now() - start).total_seconds(),
+        'workers': options.workers,
+        'total': len(results),
+        'success': len(
+            [result for result in results if result['status'] == 'success']),
+        'failed': len(
+            [result for result in results if result['status'] != 'success']),
+        'unparsed_files': errors,
+        'scenarios': results,
+    }
+    summary_path = options.summary or os.path.join(
+        options.output, summary_file)
+    write_json(summary, summary_path)
+    LOGGER.info('Summary written in %s' % summary_path)
+
+    if summary['failed'] or errors:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -43,7 +43,6 @@ from safe.common.utilities import temp_dir
 from safe.common.version import get_version
 from safe.datastore.datastore import DataStore
 from safe.datastore.folder import Folder
-from safe.definitions import count_ratio_mapping
 from safe.definitions.analysis_steps import analysis_steps
 from safe.definitions.constants import (
     GLOBAL,
@@ -62,9 +61,9 @@ from safe.definitions.exposure import (
     exposure_population,
     exposure_place,
 )
+from safe.definitions.field_groups import count_ratio_mapping
 from safe.definitions.fields import (
     size_field,
-    exposure_class_field,
     hazard_class_field,
     distance_field,
 )
@@ -118,6 +117,7 @@ from safe.definitions.provenance import (
     provenance_layer_analysis_impacted,
     provenance_layer_exposure_summary_table,
     provenance_layer_profiling,
+    provenance_profiling_trace,
     provenance_layer_aggregate_hazard_impacted_id,
     provenance_layer_aggregation_summary_id,
     provenance_layer_exposure_summary_table_id,
@@ -125,7 +125,8 @@ from safe.definitions.provenance import (
     provenance_layer_exposure_summary_id,
     provenance_crs,
     provenance_use_rounding,
-    provenance_debug_mode)
+    provenance_debug_mode,
+    provenance_prepared_layers_cache)
 from safe.definitions.reports.components import (
     infographic_report,
     map_report,
@@ -142,12 +143,15 @@ from safe.definitions.utilities import (
     get_name,
     set_provenance,
     get_provenance,
-    update_template_component
+    update_template_component,
+    HazardClassResolver,
 )
 from safe.gis.raster.clip_bounding_box import clip_by_extent
 from safe.gis.raster.polygonize import polygonize
 from safe.gis.raster.reclassify import reclassify as reclassify_raster
-from safe.gis.raster.zonal_statistics import zonal_stats
+from safe.gis.raster.sample_hazard import (
+    can_sample_raster_hazard, sample_raster_hazard)
+from safe.gis.raster.zonal_statistics import zonal_histogram, zonal_stats
 from safe.gis.sanity_check import check_inasafe_fields, check_layer
 from safe.gis.tools import (
     geometry_type,
@@ -158,8 +162,8 @@ from safe.gis.tools import (
 from safe.gis.vector.assign_highest_value import assign_highest_value
 from safe.gis.vector.clean_geometry import clean_layer
 from safe.gis.vector.clip import clip
+from safe.gis.vector.attribute_plan import prepare_exposure_attributes
 from safe.gis.vector.default_values import add_default_values
-from safe.gis.vector.from_counts_to_ratios import from_counts_to_ratios
 from safe.gis.vector.intersection import intersection
 from safe.gis.vector.prepare_vector_layer import prepare_vector_layer
 from safe.gis.vector.reclassify import reclassify as reclassify_vector
@@ -172,7 +176,8 @@ from safe.gis.vector.summary_2_aggregation import aggregation_summary
 from safe.gis.vector.summary_3_analysis import analysis_summary
 from safe.gis.vector.summary_4_exposure_summary_table import (
     exposure_summary_table)
-from safe.gis.vector.tools import remove_fields, create_memory_layer
+from safe.gis.vector.tools import (
+    copy_layer, create_memory_layer, remove_fields)
 from safe.gis.vector.union import union
 from safe.gis.vector.update_value_map import update_value_map
 from safe.gui.analysis_utilities import add_layer_to_canvas
@@ -188,6 +193,8 @@ from safe.impact_function.impact_function_utilities import (
 from safe.impact_function.postprocessors import (
     run_single_post_processor, enough_input, should_run,
 )
+from safe.impact_function.prepared_layers_cache import (
+    PreparedLayersCache, prepared_layers_key)
 from safe.impact_function.provenance_utilities import (
     get_map_title, get_analysis_question)
 from safe.impact_function.style import (
@@ -197,6 +204,7 @@ from safe.impact_function.style import (
     simple_polygon_without_brush,
 )
 from safe.messaging import styles
+from safe.metadata.metadata_db_io import metadata_db_transaction
 from safe.processors import post_processors, pre_processors
 from safe.report.impact_report import ImpactReport
 from safe.report.report_metadata import ReportMetadata
@@ -212,7 +220,7 @@ from safe.utilities.metadata import (
     append_ISO19115_keywords,
 )
 from safe.utilities.profiling import (
-    profile, clear_prof_data, profiling_log)
+    profile, clear_prof_data, profiling_log, write_trace)
 from safe.utilities.settings import setting
 from safe.utilities.unicode import byteify
 from safe.utilities.utilities import (
@@ -257,6 +265,19 @@ class ImpactFunction():
         # Use debug to store intermediate results
         self.debug_mode = False
         self.use_rounding = True
+        # Sample a raster hazard with the exposure instead of polygonizing
+        # it. Only used for a point or a continuous raster exposure.
+        # If None, the raster_hazard_sampling setting is used.
+        self.use_raster_hazard_sampling = None
+        self._sample_raster_hazard = False
+        # Hazard and aggregate hazard prepared by another impact function.
+        # See use_prepared_aggregate_hazard.
+        self._prepared_hazard = None
+        self._prepared_aggregate_hazard = None
+        # Use the cache on disk of the prepared hazard and aggregate hazard.
+        # If None, the prepared_layers_cache setting is used.
+        self.use_prepared_layers_cache = None
+        self._prepared_layers_key = None
 
         # Requested extent to use (according to the CRS property).
         self._requested_extent = None
@@ -296,6 +317,8 @@ class ImpactFunction():
         self._output_layer_expected = None
         self._preprocessors = []  # List of pre-processors which will run
         self._preprocessors_layers = {}  # List of layers produced
+        # Hazard class lookup tables, built once per analysis.
+        self._hazard_class_resolver = None
         self._impact_report = None
         self._report_metadata = []
 
@@ -1201,6 +1224,20 @@ class ImpactFunction():
                 provenance_aggregation_keywords,
                 aggregation_keywords)
 
+            self._prepared_layers_key = None
+            if self._use_prepared_layers_cache():
+                try:
+                    self._prepared_layers_key = prepared_layers_key(
+                        original_hazard,
+                        self.exposure,
+                        original_aggregation,
+                        self._analysis_extent,
+                        self._crs,
+                        self.use_selected_features_only)
+                except Exception as e:
+                    LOGGER.info(
+                        'The prepared layers cache can not be used: %s' % e)
+
             # Set output layer expected
             self._output_layer_expected = self._compute_output_layer_expected()
 
@@ -1466,6 +1503,12 @@ class ImpactFunction():
                 self.profiling.source(),
                 self.profiling.keywords)
 
+            # The profiling with memory and features as a Chrome trace.
+            trace_path = get_provenance(
+                self.provenance, provenance_profiling_trace)
+            if trace_path:
+                write_trace(self._performance_log, trace_path)
+
             # Style all output layers.
             self.style()
 
@@ -1648,6 +1691,12 @@ class ImpactFunction():
 
         step_count = len(analysis_steps)
 
+        self._sample_raster_hazard = (
+            self._use_raster_hazard_sampling()
+            and self._prepared_hazard is None
+            and can_sample_raster_hazard(self.hazard, self.exposure))
+        from_cache = self._read_prepared_layers_cache()
+
         self._performance_log = profiling_log()
         self.callback(4, step_count, analysis_steps['hazard_preparation'])
         self.hazard_preparation()
@@ -1656,6 +1705,7 @@ class ImpactFunction():
         self.callback(
             5, step_count, analysis_steps['aggregate_hazard_preparation'])
         self.aggregate_hazard_preparation()
+        self._write_prepared_layers_cache(from_cache)
 
         self._performance_log = profiling_log()
         self.callback(6, step_count, analysis_steps['exposure_preparation'])
@@ -1667,6 +1717,7 @@ class ImpactFunction():
 
         self._performance_log = profiling_log()
         self.callback(8, step_count, analysis_steps['post_processing'])
+        self._hazard_class_resolver = HazardClassResolver()
         if is_vector_layer(self._exposure_summary):
             # We post process the exposure summary
             self.post_process(self._exposure_summary)
@@ -1720,6 +1771,7 @@ class ImpactFunction():
             provenance_layer_analysis_impacted['provenance_key']: None,
             provenance_layer_exposure_summary_table['provenance_key']: None,
             provenance_layer_profiling['provenance_key']: None,
+            provenance_profiling_trace['provenance_key']: None,
             provenance_layer_exposure_summary_id['provenance_key']: None,
             provenance_layer_aggregate_hazard_impacted_id[
                 'provenance_key']: None,
@@ -1842,37 +1894,45 @@ class ImpactFunction():
                 layer_purpose_profiling['name'] + '.csv')
             output_layer_provenance[
                 provenance_layer_profiling['provenance_key']] = profiling_path
+            output_layer_provenance[
+                provenance_profiling_trace['provenance_key']] = join(
+                    dirname(profiling_path),
+                    layer_purpose_profiling['name'] + '.json')
 
         # Update provenance data with output layers URI
         self._provenance.update(output_layer_provenance)
-        if self._exposure_summary:
-            self._exposure_summary.keywords[
+        # Layers in a database have their metadata written in one commit.
+        with metadata_db_transaction():
+            if self._exposure_summary:
+                self._exposure_summary.keywords[
+                    'provenance_data'] = self.provenance
+                write_iso19115_metadata(
+                    self._exposure_summary.source(),
+                    self._exposure_summary.keywords)
+            if self._aggregate_hazard_impacted:
+                self._aggregate_hazard_impacted.keywords[
+                    'provenance_data'] = self.provenance
+                write_iso19115_metadata(
+                    self._aggregate_hazard_impacted.source(),
+                    self._aggregate_hazard_impacted.keywords)
+            if self._exposure_summary_table:
+                self._exposure_summary_table.keywords[
+                    'provenance_data'] = self.provenance
+                write_iso19115_metadata(
+                    self._exposure_summary_table.source(),
+                    self._exposure_summary_table.keywords)
+
+            self.aggregation_summary.keywords[
                 'provenance_data'] = self.provenance
             write_iso19115_metadata(
-                self._exposure_summary.source(),
-                self._exposure_summary.keywords)
-        if self._aggregate_hazard_impacted:
-            self._aggregate_hazard_impacted.keywords[
-                'provenance_data'] = self.provenance
-            write_iso19115_metadata(
-                self._aggregate_hazard_impacted.source(),
-                self._aggregate_hazard_impacted.keywords)
-        if self._exposure_summary_table:
-            self._exposure_summary_table.keywords[
+                self.aggregation_summary.source(),
+                self.aggregation_summary.keywords)
+
+            self.analysis_impacted.keywords[
                 'provenance_data'] = self.provenance
             write_iso19115_metadata(
-                self._exposure_summary_table.source(),
-                self._exposure_summary_table.keywords)
-
-        self.aggregation_summary.keywords['provenance_data'] = self.provenance
-        write_iso19115_metadata(
-            self.aggregation_summary.source(),
-            self.aggregation_summary.keywords)
-
-        self.analysis_impacted.keywords['provenance_data'] = self.provenance
-        write_iso19115_metadata(
-            self.analysis_impacted.source(),
-            self.analysis_impacted.keywords)
+                self.analysis_impacted.source(),
+                self.analysis_impacted.keywords)
 
     @profile
     def pre_process(self):
@@ -2130,6 +2190,12 @@ class ImpactFunction():
         """This function is doing the hazard preparation."""
         LOGGER.info('ANALYSIS : Hazard preparation')
 
+        if self._prepared_hazard is not None:
+            self.set_state_process(
+                'hazard', 'Use the hazard prepared for another exposure')
+            self.hazard = self._prepared_hazard
+            return
+
         use_same_projection = (
             self.hazard.crs().authid() == self._crs.authid())
         self.set_state_info(
@@ -2159,6 +2225,10 @@ class ImpactFunction():
                     self.hazard, self.exposure.keywords['exposure'])
                 self.debug_layer(self.hazard)
 
+            if self._sample_raster_hazard:
+                # The classified raster is sampled with the exposure later.
+                return
+
             self.set_state_process(
                 'hazard', 'Polygonize classified raster hazard')
             # noinspection PyTypeChecker
@@ -2220,6 +2290,28 @@ class ImpactFunction():
         aggregation areas and assign hazard class.
         """
         LOGGER.info('ANALYSIS : Aggregate hazard preparation')
+        if self._sample_raster_hazard:
+            # The aggregate hazard is made with the exposure summary.
+            return
+
+        if self._prepared_aggregate_hazard is not None:
+            self.set_state_process(
+                'aggregation',
+                'Use the aggregate hazard prepared for another exposure')
+            # The summary steps are adding fields to the aggregate hazard,
+            # the prepared layer is shared so we work on a copy.
+            prepared = self._prepared_aggregate_hazard
+            self._aggregate_hazard_impacted = create_memory_layer(
+                prepared.name(),
+                prepared.geometryType(),
+                prepared.crs(),
+                prepared.fields())
+            copy_layer(prepared, self._aggregate_hazard_impacted)
+            self._aggregate_hazard_impacted.keywords = copy_layer_keywords(
+                prepared.keywords)
+            self.debug_layer(self._aggregate_hazard_impacted)
+            return
+
         self.set_state_process('hazard', 'Make hazard layer valid')
         self.hazard = clean_layer(self.hazard)
         self.debug_layer(self.hazard)
@@ -2231,6 +2323,126 @@ class ImpactFunction():
         self._aggregate_hazard_impacted = union(self.hazard, self.aggregation)
         self.debug_layer(self._aggregate_hazard_impacted)
 
+    def prepare_aggregate_hazard(self):
+        """Run only the steps making the hazard and aggregate hazard layers.
+
+        The impact function must be prepared and have a datastore. It can't
+        be run after, but its layers can be given to other impact functions
+        with the same hazard, aggregation and analysis extent, with
+        use_prepared_aggregate_hazard.
+
+        :return: Tuple with the prepared hazard and aggregate hazard.
+        :rtype: (QgsVectorLayer, QgsVectorLayer)
+
+        .. versionadded:: 5.0
+        """
+        self.reset_state()
+        self._sample_raster_hazard = False
+        self.aggregation_preparation()
+        from_cache = self._read_prepared_layers_cache()
+        self.hazard_preparation()
+        self.aggregate_hazard_preparation()
+        self._write_prepared_layers_cache(from_cache)
+        self._is_ready = False
+        return self.hazard, self._aggregate_hazard_impacted
+
+    def _use_raster_hazard_sampling(self):
+        """Check if the raster hazard sampling is enabled.
+
+        :return: The use_raster_hazard_sampling attribute, or the setting.
+        :rtype: bool
+        """
+        if self.use_raster_hazard_sampling is None:
+            return setting('raster_hazard_sampling', expected_type=bool)
+        return self.use_raster_hazard_sampling
+
+    def _use_prepared_layers_cache(self):
+        """Check if the cache of the prepared layers is enabled.
+
+        :return: The use_prepared_layers_cache attribute, or the setting.
+        :rtype: bool
+        """
+        if self.use_prepared_layers_cache is None:
+            return setting('prepared_layers_cache', expected_type=bool)
+        return self.use_prepared_layers_cache
+
+    def _can_cache_prepared_layers(self):
+        """Check if the prepared layers can be read from or saved in cache.
+
+        :return: True if the cache is enabled and the hazard and the aggregate
+            hazard are prepared by this impact function.
+        :rtype: bool
+        """
+        return (
+            bool(self._prepared_layers_key)
+            and self._prepared_hazard is None
+            and not self._sample_raster_hazard)
+
+    def _read_prepared_layers_cache(self):
+        """Use the prepared hazard and aggregate hazard from the cache.
+
+        The provenance records if the cache has been used.
+
+        :return: True if the prepared layers are from the cache.
+        :rtype: bool
+        """
+        from_cache = False
+        if self._can_cache_prepared_layers():
+            # The cache is optional, an error must not stop the analysis.
+            try:
+                layers = PreparedLayersCache().get(self._prepared_layers_key)
+            except Exception as e:
+                LOGGER.info(
+                    'The prepared layers cache can not be read: %s' % e)
+                layers = None
+            if layers:
+                self.use_prepared_aggregate_hazard(*layers)
+                from_cache = True
+
+        set_provenance(
+            self._provenance, provenance_prepared_layers_cache, from_cache)
+        return from_cache
+
+    def _write_prepared_layers_cache(self, from_cache):
+        """Save the prepared hazard and aggregate hazard in the cache.
+
+        :param from_cache: If the prepared layers are from the cache. They
+            are only used for this run.
+        :type from_cache: bool
+        """
+        if from_cache:
+            self.use_prepared_aggregate_hazard(None, None)
+        elif self._can_cache_prepared_layers():
+            try:
+                PreparedLayersCache().put(
+                    self._prepared_layers_key,
+                    self.hazard,
+                    self._aggregate_hazard_impacted)
+            except Exception as e:
+                LOGGER.info(
+                    'The prepared layers can not be saved in the cache: %s'
+                    % e)
+
+    def use_prepared_aggregate_hazard(self, hazard, aggregate_hazard):
+        """Use a hazard and an aggregate hazard prepared before.
+
+        The hazard preparation and the aggregate hazard preparation are
+        skipped. The layers must come from prepare_aggregate_hazard, with the
+        same hazard, aggregation, analysis extent and the same hazard
+        classification for this exposure.
+
+        :param hazard: The prepared hazard layer.
+        :type hazard: QgsVectorLayer
+
+        :param aggregate_hazard: The prepared aggregate hazard layer. It's
+            copied, not modified.
+        :type aggregate_hazard: QgsVectorLayer
+
+        .. versionadded:: 5.0
+        """
+        self._prepared_hazard = hazard
+        self._prepared_aggregate_hazard = aggregate_hazard
+
     @profile
     def exposure_preparation(self):
         """This function is doing the exposure preparation."""
@@ -2286,8 +2498,14 @@ class ImpactFunction():
                 self.exposure, self._crs)
             self.debug_layer(self.exposure)
 
-        self.set_state_process('exposure', 'Compute ratios from counts')
-        self.exposure = from_counts_to_ratios(self.exposure)
+        # Ratios, default values and classes are computed in one pass on the
+        # attribute table. They don't depend on the geometry, so it can be
+        # done before splitting the features.
+        self.set_state_process(
+            'exposure',
+            'Compute ratios from counts, add default values and assign '
+            'classes based on value map')
+        self.exposure = prepare_exposure_attributes(self.exposure)
         self.debug_layer(self.exposure)
 
         exposure = self.exposure.keywords.get('exposure')
@@ -2303,17 +2521,6 @@ class ImpactFunction():
             self.exposure = clip(self.exposure, self._analysis_impacted)
             self.debug_layer(self.exposure)
 
-        self.set_state_process('exposure', 'Add default values')
-        self.exposure = add_default_values(self.exposure)
-        self.debug_layer(self.exposure)
-
-        fields = self.exposure.keywords['inasafe_fields']
-        if exposure_class_field['key'] not in fields:
-            self.set_state_process(
-                'exposure', 'Assign classes based on value map')
-            self.exposure = update_value_map(self.exposure)
-            self.debug_layer(self.exposure)
-
     @profile
     def intersect_exposure_and_aggregate_hazard(self):
         """This function intersects the exposure with the aggregate hazard.
@@ -2324,16 +2531,26 @@ class ImpactFunction():
         """
         LOGGER.info('ANALYSIS : Intersect Exposure and Aggregate Hazard')
         if is_raster_layer(self.exposure):
-            self.set_state_process(
-                'impact function',
-                'Zonal stats between exposure and aggregate hazard')
+            if self._sample_raster_hazard:
+                self.set_state_process(
+                    'impact function',
+                    'Zonal histogram between exposure, hazard and '
+                    'aggregation')
+                # The hazard is warped to the exposure grid.
+                # noinspection PyTypeChecker
+                self._aggregate_hazard_impacted = zonal_histogram(
+                    self.exposure, self.hazard, self.aggregation)
+            else:
+                self.set_state_process(
+                    'impact function',
+                    'Zonal stats between exposure and aggregate hazard')
 
-            # Be careful, our own zonal stats will take care of different
-            # projections between the two layers. We don't want to reproject
-            # rasters.
-            # noinspection PyTypeChecker
-            self._aggregate_hazard_impacted = zonal_stats(
-                self.exposure, self._aggregate_hazard_impacted)
+                # Be careful, our own zonal stats will take care of different
+                # projections between the two layers. We don't want to
+                # reproject rasters.
+                # noinspection PyTypeChecker
+                self._aggregate_hazard_impacted = zonal_stats(
+                    self.exposure, self._aggregate_hazard_impacted)
             self.debug_layer(self._aggregate_hazard_impacted)
 
             self.set_state_process('impact function', 'Add default values')
@@ -2387,6 +2604,17 @@ class ImpactFunction():
                         self._exposure_summary)
                     self.debug_layer(self._exposure_summary)
 
+            elif self._sample_raster_hazard:
+                self.set_state_process(
+                    'impact function',
+                    'Sample the hazard raster with the exposure and the '
+                    'aggregation')
+                self._exposure_summary, self._aggregate_hazard_impacted = (
+                    sample_raster_hazard(
+                        self._exposure, self.hazard, self.aggregation))
+                self.debug_layer(self._exposure_summary)
+                self.debug_layer(self._aggregate_hazard_impacted)
+
             else:
                 self.set_state_process(
                     'impact function',
@@ -2429,7 +2657,7 @@ class ImpactFunction():
                 name = post_processor['name']
                 if valid:
                     valid, message = run_single_post_processor(
-                        layer, post_processor)
+                        layer, post_processor, self._hazard_class_resolver)
                     if valid:
                         self.set_state_process('post_processor', name)
                         message = '{name} : Running'.format(name=name)
@@ -2459,7 +2687,9 @@ class ImpactFunction():
                 'impact function',
                 'Aggregate the impact summary')
             self._aggregate_hazard_impacted = aggregate_hazard_summary(
-                self.exposure_summary, self._aggregate_hazard_impacted)
+                self.exposure_summary,
+                self._aggregate_hazard_impacted,
+                resolver=self._hazard_class_resolver)
             self.debug_layer(self._exposure_summary, add_to_datastore=False)
 
         self.set_state_process(
@@ -2472,14 +2702,18 @@ class ImpactFunction():
         self.set_state_process(
             'impact function', 'Aggregate the analysis summary')
         self._analysis_impacted = analysis_summary(
-            self._aggregate_hazard_impacted, self._analysis_impacted)
+            self._aggregate_hazard_impacted,
+            self._analysis_impacted,
+            resolver=self._hazard_class_resolver)
         self.debug_layer(self._analysis_impacted)
 
         if self._exposure.keywords.get('classification'):
             self.set_state_process(
                 'impact function', 'Build the exposure summary table')
             self._exposure_summary_table = exposure_summary_table(
-                self._aggregate_hazard_impacted, self._exposure_summary)
+                self._aggregate_hazard_impacted,
+                self._exposure_summary,
+                resolver=self._hazard_class_resolver)
             self.debug_layer(
                 self._exposure_summary_table, add_to_datastore=False)
 
@@ -17,7 +17,6 @@ from safe.definitions.reports import (
 from safe.definitions.versions import inasafe_keyword_version
 from safe.gis.sanity_check import check_inasafe_fields
 from safe.gui.widgets.message import generate_input_error_message
-from safe.report.impact_report import ImpactReport
 from safe.utilities.gis import is_vector_layer
 from safe.utilities.i18n import tr
 from safe.utilities.keyword_io import KeywordIO
@@ -154,6 +153,9 @@ def report_urls(impact_function):
             }
     :rtype: dict
     """
+    # The dock imports this module at startup, the report is imported here.
+    from safe.report.impact_report import ImpactReport
+
     report_path = impact_function.impact_report.output_folder
     standard_report_metadata = impact_function.report_metadata
 
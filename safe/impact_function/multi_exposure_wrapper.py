@@ -8,6 +8,7 @@ This class will manage how to launch and optimize a multi exposure analysis.
 
 
 import getpass
+import json
 import logging
 from copy import deepcopy
 from datetime import datetime
@@ -40,9 +41,11 @@ from safe.definitions.constants import (
     PREPARE_SUCCESS,
     PREPARE_FAILED_BAD_INPUT,
     ANALYSIS_FAILED_BAD_INPUT,
+    ANALYSIS_FAILED_BAD_CODE,
     ANALYSIS_SUCCESS,
     MULTI_EXPOSURE_ANALYSIS_FLAG)
 from safe.definitions.exposure import exposure_population
+from safe.definitions.field_groups import count_ratio_mapping
 from safe.definitions.layer_purposes import (
     layer_purpose_analysis_impacted,
     layer_purpose_aggregation_summary,
@@ -110,11 +113,18 @@ from safe.gui.widgets.message import generate_input_error_message
 from safe.impact_function.create_extra_layers import (
     create_analysis_layer, create_virtual_aggregation)
 from safe.impact_function.impact_function import ImpactFunction
+from safe.impact_function.parallel import (
+    can_run_in_process,
+    layer_task,
+    multi_exposure_workers,
+    run_impact_functions,
+)
 from safe.impact_function.impact_function_utilities import (
     check_input_layer, FROM_CANVAS, report_urls)
 from safe.impact_function.provenance_utilities import (
     get_multi_exposure_analysis_question)
 from safe.impact_function.style import simple_polygon_without_brush
+from safe.metadata.metadata_db_io import metadata_db_transaction
 from safe.report.impact_report import ImpactReport
 from safe.report.report_metadata import ReportMetadata
 from safe.utilities.gis import clone_layer
@@ -122,6 +132,8 @@ from safe.utilities.gis import qgis_version
 from safe.utilities.i18n import tr
 from safe.utilities.keyword_io import KeywordIO
 from safe.utilities.metadata import (
+    active_classification,
+    active_thresholds_value_maps,
     copy_layer_keywords,
     write_iso19115_metadata,
     append_ISO19115_keywords,
@@ -129,6 +141,7 @@ from safe.utilities.metadata import (
 from safe.utilities.settings import setting
 from safe.utilities.unicode import byteify
 from safe.utilities.utilities import (
+    get_error_message,
     replace_accentuated_characters,
     readable_os_version,
     write_json)
@@ -184,6 +197,9 @@ class MultiExposureImpactFunction():
         self.callback = None
         self.debug = False
         self.use_selected_features_only = False
+        # Number of processes for the single exposure impact functions.
+        # If None, the multi_exposure_workers setting is used.
+        self.workers = None
         self._name = None
         self._unique_name = None
         self._is_ready = False
@@ -963,28 +979,36 @@ class MultiExposureImpactFunction():
         dict_of_analysis_summary_path = {}
         dict_of_analysis_summary_id = {}
 
-        for i, impact_function in enumerate(self._impact_functions):
-            self._current_impact_function = impact_function
-            LOGGER.info('Running %s' % impact_function.name)
-            if isinstance(self._datastore, Folder):
-                # We can include this analysis in the parent datastore.
-                # We can't do that with a geopackage.
-                current_name = impact_function.name.replace(' ', '')
-                current_name = replace_accentuated_characters(current_name)
-                folder = temp_dir(join(self._datastore.uri_path, current_name))
-                if not exists(folder):
-                    makedirs(folder)
-                impact_function.datastore = Folder(folder)
+        if isinstance(self._datastore, Folder):
+            # We can include each analysis in the parent datastore.
+            # We can't do that with a geopackage.
+            for impact_function in self._impact_functions:
+                impact_function.datastore = Folder(
+                    self._sub_folder(impact_function.name))
                 impact_function.datastore.default_vector_format = 'geojson'
 
-            impact_function.hazard.keywords = copy_layer_keywords(
-                self._hazard_keywords)
-            code, message = impact_function.run()
+        prepared_layers = self._share_aggregate_hazard()
+
+        workers = multi_exposure_workers(self.workers)
+        in_parallel = self._can_run_in_parallel(workers)
+        if in_parallel:
+            code, message, current_exposure = self._run_in_parallel(
+                workers, prepared_layers)
             if code != ANALYSIS_SUCCESS:
-                current_exposure = (
-                    impact_function.exposure.keywords['exposure'])
                 return code, message, current_exposure
 
+        for i, impact_function in enumerate(self._impact_functions):
+            self._current_impact_function = impact_function
+            if not in_parallel:
+                LOGGER.info('Running %s' % impact_function.name)
+                impact_function.hazard.keywords = copy_layer_keywords(
+                    self._hazard_keywords)
+                code, message = impact_function.run()
+                if code != ANALYSIS_SUCCESS:
+                    current_exposure = (
+                        impact_function.exposure.keywords['exposure'])
+                    return code, message, current_exposure
+
             if (self._aggregation and i == 1) or not self._aggregation:
                 list_geometries.append(impact_function.analysis_extent)
 
@@ -1090,14 +1114,17 @@ class MultiExposureImpactFunction():
 
         # Update provenance data with output layers URI
         self._provenance.update(output_layer_provenance)
-        self._aggregation_summary.keywords['provenance_data'] = self.provenance
-        write_iso19115_metadata(
-            self._aggregation_summary.source(),
-            self._aggregation_summary.keywords)
-        self._analysis_summary.keywords['provenance_data'] = self.provenance
-        write_iso19115_metadata(
-            self._analysis_summary.source(),
-            self._analysis_summary.keywords)
+        with metadata_db_transaction():
+            self._aggregation_summary.keywords[
+                'provenance_data'] = self.provenance
+            write_iso19115_metadata(
+                self._aggregation_summary.source(),
+                self._aggregation_summary.keywords)
+            self._analysis_summary.keywords[
+                'provenance_data'] = self.provenance
+            write_iso19115_metadata(
+                self._analysis_summary.source(),
+                self._analysis_summary.keywords)
 
         # Quick style
         simple_polygon_without_brush(
@@ -1122,6 +1149,240 @@ class MultiExposureImpactFunction():
 
         return ANALYSIS_SUCCESS, None, None
 
+    def _sub_folder(self, name):
+        """Create a folder in the datastore of the multi exposure analysis.
+
+        :param name: The name of the folder, spaces and accents are removed.
+        :type name: str
+
+        :return: The path of the folder.
+        :rtype: str
+        """
+        name = replace_accentuated_characters(name.replace(' ', ''))
+        folder = temp_dir(join(self._datastore.uri_path, name))
+        if not exists(folder):
+            makedirs(folder)
+        return folder
+
+    def _shared_preparation_key(self, impact_function):
+        """Key of the hazard and aggregate hazard of an impact function.
+
+        Impact functions with the same key have the same hazard and aggregate
+        hazard layers after their preparation. The hazard preparation only
+        depends on the exposure with the hazard classification, the
+        thresholds or the value map used for this exposure. The aggregation
+        preparation removes the ratio fields when the exposure has the count.
+
+        :param impact_function: The prepared single exposure impact function.
+        :type impact_function: ImpactFunction
+
+        :return: The key.
+        :rtype: tuple
+        """
+        exposure = impact_function.exposure.keywords['exposure']
+        exposure_fields = impact_function.exposure.keywords.get(
+            'inasafe_fields', {})
+        counts = sorted(
+            key for key in exposure_fields if key in count_ratio_mapping)
+        return (
+            tuple(counts),
+            active_classification(self._hazard_keywords, exposure),
+            json.dumps(
+                active_thresholds_value_maps(self._hazard_keywords, exposure),
+                sort_keys=True),
+            impact_function.analysis_extent.asWkt(),
+            impact_function.crs.toWkt() if impact_function.crs else None,
+        )
+
+    def _share_aggregate_hazard(self):
+        """Prepare the aggregate hazard once for impact functions sharing it.
+
+        The impact functions are grouped by _shared_preparation_key. For
+        each group of many impact functions, a new impact function makes the
+        hazard and the aggregate hazard layers, and they are given to every
+        impact function of the group.
+
+        :return: The prepared hazard and aggregate hazard, for each impact
+            function. None if it's not shared.
+        :rtype: list
+        """
+        groups = OrderedDict()
+        for impact_function in self._impact_functions:
+            key = self._shared_preparation_key(impact_function)
+            groups.setdefault(key, []).append(impact_function)
+
+        prepared = {}
+        for group in list(groups.values()):
+            if len(group) < 2:
+                continue
+
+            first = group[0]
+            preparer = ImpactFunction()
+            preparer.debug_mode = self.debug
+            preparer.hazard = clone_layer(self._hazard)
+            preparer.hazard.keywords = copy_layer_keywords(
+                self._hazard_keywords)
+            preparer.exposure = first.exposure
+            if self._aggregation:
+                preparer.aggregation = clone_layer(self._aggregation)
+                preparer.use_selected_features_only = (
+                    self.use_selected_features_only)
+            else:
+                preparer.crs = self._crs
+            if isinstance(self._datastore, Folder):
+                preparer.datastore = Folder(self._sub_folder(
+                    'AggregateHazard%s' % first.exposure.keywords['exposure']))
+            else:
+                preparer.datastore = Folder(
+                    temp_dir(sub_dir=self._unique_name))
+            preparer.datastore.default_vector_format = 'geojson'
+
+            try:
+                code, message = preparer.prepare()
+                if code != PREPARE_SUCCESS:
+                    LOGGER.info(
+                        'The aggregate hazard can not be shared: %s'
+                        % message.to_text())
+                    continue
+                layers = preparer.prepare_aggregate_hazard()
+            except Exception as e:
+                LOGGER.exception(
+                    'The aggregate hazard can not be shared: %s' % e)
+                continue
+            finally:
+                # The hazard keywords can be changed in place.
+                self._hazard.keywords = copy_layer_keywords(
+                    self._hazard_keywords)
+
+            LOGGER.info(
+                'Aggregate hazard shared by %s impact functions.'
+                % len(group))
+            for impact_function in group:
+                impact_function.use_prepared_aggregate_hazard(*layers)
+                prepared[id(impact_function)] = (preparer.datastore, layers)
+
+        return [
+            prepared.get(id(impact_function))
+            for impact_function in self._impact_functions]
+
+    def _can_run_in_parallel(self, workers):
+        """Check if the impact functions can run in worker processes.
+
+        Layers are loaded again in each process, they can't be memory layers
+        and the selection of features can't be used.
+
+        :param workers: The number of processes.
+        :type workers: int
+
+        :return: True if the impact functions can run in parallel.
+        :rtype: bool
+        """
+        if workers < 2 or len(self._impact_functions) < 2:
+            return False
+        if self.use_selected_features_only and self._aggregation:
+            return False
+        layers = [self._hazard, self._aggregation] + self._exposures
+        return all(can_run_in_process(layer) for layer in layers)
+
+    def _run_in_parallel(self, workers, prepared_layers):
+        """Run the single exposure impact functions in worker processes.
+
+        Each impact function is replaced by the one loaded from its outputs.
+
+        :param workers: The number of processes.
+        :type workers: int
+
+        :param prepared_layers: The prepared hazard and aggregate hazard
+            for each impact function, from _share_aggregate_hazard.
+        :type prepared_layers: list
+
+        :return: A tuple with the status, the message and the exposure key
+            of the failed impact function.
+        :rtype: (int, m.Message, str)
+        """
+        try:
+            tasks = self._parallel_tasks(prepared_layers)
+            results = run_impact_functions(tasks, workers)
+        except Exception as e:
+            return ANALYSIS_FAILED_BAD_CODE, get_error_message(e), None
+
+        impact_functions = []
+        for impact_function, result in zip(self._impact_functions, results):
+            code, message, impact_layer_uri = result
+            if code != ANALYSIS_SUCCESS:
+                current_exposure = (
+                    impact_function.exposure.keywords['exposure'])
+                return code, m.Message(m.Paragraph(message)), current_exposure
+
+            impact_layer = load_layer_from_registry(impact_layer_uri)
+            keywords = KeywordIO.read_keywords(impact_layer)
+            impact_functions.append(
+                ImpactFunction.load_from_output_metadata(keywords))
+
+        self._impact_functions = impact_functions
+        return ANALYSIS_SUCCESS, None, None
+
+    def _parallel_tasks(self, prepared_layers):
+        """Describe the single exposure impact functions for the workers.
+
+        :param prepared_layers: The prepared hazard and aggregate hazard
+            for each impact function, from _share_aggregate_hazard.
+        :type prepared_layers: list
+
+        :return: One task for each impact function, see run_impact_function.
+        :rtype: list
+        """
+        tasks = []
+        for impact_function, prepared in zip(
+                self._impact_functions, prepared_layers):
+            task = {
+                'hazard': layer_task(self._hazard),
+                'exposure': layer_task(impact_function.exposure),
+                'aggregation': layer_task(self._aggregation),
+                'crs': self._crs.toWkt() if self._crs else None,
+                'prepared_hazard': None,
+                'prepared_aggregate_hazard': None,
+                'datastore': None,
+                'debug_mode': self.debug,
+                'use_rounding': self.use_rounding,
+            }
+            task['hazard']['keywords'] = copy_layer_keywords(
+                self._hazard_keywords)
+            if impact_function.datastore:
+                task['datastore'] = impact_function.datastore.uri_path
+            if prepared:
+                datastore, layers = prepared
+                task['prepared_hazard'], task['prepared_aggregate_hazard'] = [
+                    layer_task(layer) for layer in
+                    self._store_prepared_layers(datastore, layers)]
+            tasks.append(task)
+        return tasks
+
+    @staticmethod
+    def _store_prepared_layers(datastore, layers):
+        """Save the prepared layers in a datastore, once.
+
+        :param datastore: The datastore of the impact function which prepared
+            the layers.
+        :type datastore: Folder
+
+        :param layers: The prepared hazard and aggregate hazard.
+        :type layers: (QgsVectorLayer, QgsVectorLayer)
+
+        :return: The layers from the datastore.
+        :rtype: list
+        """
+        stored = []
+        for name, layer in zip(['hazard', 'aggregate_hazard'], layers):
+            if not datastore.layer_uri(name):
+                result, message = datastore.add_layer(layer, name)
+                if not result:
+                    raise Exception(
+                        'Something went wrong with the datastore : '
+                        '{error_message}'.format(error_message=message))
+            stored.append(datastore.layer(name))
+        return stored
+
     def generate_report(
             self,
             components,
@@ -0,0 +1,183 @@
+# coding=utf-8
+
+"""Run the impact functions of a multi exposure analysis on many processes.
+
+Each worker process starts its own QGIS application without GUI. QGIS layers
+can't be sent to another process, so a worker receives a task with the URI
+and the keywords of each layer. It runs one impact function and returns the
+URI of its main output layer. The impact function is loaded back in the
+parent process from the metadata of this layer.
+"""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from safe.definitions.constants import ANALYSIS_SUCCESS, PREPARE_SUCCESS
+from safe.gis.tools import full_layer_uri, load_layer
+from safe.utilities.metadata import copy_layer_keywords
+from safe.utilities.settings import setting
+
+__copyright__ = "Copyright 2018, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+# The QGIS application of a worker process.
+_qgis_application = None
+
+
+def multi_exposure_workers(workers=None):
+    """Number of processes to use for a multi exposure analysis.
+
+    :param workers: The number of processes. If None, the
+        multi_exposure_workers setting is used.
+    :type workers: int
+
+    :return: The number of processes, at least 1.
+    :rtype: int
+    """
+    if workers is None:
+        workers = setting('multi_exposure_workers', expected_type=int)
+    try:
+        return max(int(workers), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def can_run_in_process(layer):
+    """Check if a layer can be opened again in another process.
+
+    :param layer: The layer.
+    :type layer: QgsMapLayer
+
+    :return: True if the layer is not only in the memory of this process.
+    :rtype: bool
+    """
+    return layer is None or layer.providerType() != 'memory'
+
+
+def layer_task(layer):
+    """Describe a layer with values which can be sent to another process.
+
+    :param layer: The layer.
+    :type layer: QgsMapLayer
+
+    :return: The full URI and the keywords, None if there is no layer.
+    :rtype: dict
+    """
+    if layer is None:
+        return None
+    return {
+        'uri': full_layer_uri(layer),
+        'name': layer.name(),
+        'keywords': copy_layer_keywords(layer.keywords),
+    }
+
+
+def _load_layer_task(task):
+    """Load a layer described by layer_task.
+
+    :param task: The layer description.
+    :type task: dict
+
+    :return: The layer with its keywords, None if there is no layer.
+    :rtype: QgsMapLayer
+    """
+    if task is None:
+        return None
+    layer = load_layer(task['uri'], name=task['name'])[0]
+    layer.keywords = copy_layer_keywords(task['keywords'])
+    return layer
+
+
+def start_qgis():
+    """Start QGIS without GUI in this process, if it's not started yet."""
+    global _qgis_application
+    from qgis.core import QgsApplication
+    if QgsApplication.instance() is not None:
+        return
+
+    _qgis_application = QgsApplication([], False)
+    # Make sure QGIS_PREFIX_PATH is set in your env if needed!
+    _qgis_application.initQgis()
+
+    import processing
+    processing.Processing.initialize()
+
+
+def run_impact_function(task):
+    """Run one impact function in a worker process.
+
+    :param task: The impact function description with the keys hazard,
+        exposure, aggregation, crs as WKT, prepared_hazard,
+        prepared_aggregate_hazard, datastore, debug_mode and use_rounding.
+        Layers are described with layer_task.
+    :type task: dict
+
+    :return: A tuple with the status, the message as text and the full URI
+        of the exposure summary or of the aggregate hazard impacted.
+    :rtype: (int, str, str)
+    """
+    start_qgis()
+
+    from qgis.core import QgsCoordinateReferenceSystem
+    from safe.datastore.folder import Folder
+    from safe.impact_function.impact_function import ImpactFunction
+
+    impact_function = ImpactFunction()
+    impact_function.hazard = _load_layer_task(task['hazard'])
+    impact_function.exposure = _load_layer_task(task['exposure'])
+    impact_function.debug_mode = task['debug_mode']
+    impact_function.use_rounding = task['use_rounding']
+    if task['aggregation']:
+        impact_function.aggregation = _load_layer_task(task['aggregation'])
+    else:
+        impact_function.crs = QgsCoordinateReferenceSystem.fromWkt(
+            task['crs'])
+    if task['datastore']:
+        impact_function.datastore = Folder(task['datastore'])
+        impact_function.datastore.default_vector_format = 'geojson'
+    if task['prepared_aggregate_hazard']:
+        impact_function.use_prepared_aggregate_hazard(
+            _load_layer_task(task['prepared_hazard']),
+            _load_layer_task(task['prepared_aggregate_hazard']))
+
+    code, message = impact_function.prepare()
+    if code != PREPARE_SUCCESS:
+        return code, message.to_text(), None
+
+    code, message = impact_function.run()
+    if code != ANALYSIS_SUCCESS:
+        return code, message.to_text(), None
+
+    impact_layer = impact_function.exposure_summary or (
+        impact_function.aggregate_hazard_impacted)
+    return code, None, full_layer_uri(impact_layer)
+
+
+def run_impact_functions(tasks, workers):
+    """Run many impact functions on many processes.
+
+    Processes are spawned, not forked, as a QGIS application can't be shared
+    with a child process.
+
+    :param tasks: The impact function descriptions, see run_impact_function.
+    :type tasks: list
+
+    :param workers: The number of processes.
+    :type workers: int
+
+    :return: The result of run_impact_function for each task, in the same
+        order.
+    :rtype: list
+    """
+    workers = min(workers, len(tasks))
+    LOGGER.debug(
+        'Running %s impact functions with %s processes.' % (
+            len(tasks), workers))
+    with ProcessPoolExecutor(
+            max_workers=workers, mp_context=get_context('spawn')) as executor:
+        return list(executor.map(run_impact_function, tasks))
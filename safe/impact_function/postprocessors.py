@@ -2,9 +2,12 @@
 
 """Postprocessors."""
 
+import ast
+
+import numpy
 
 # noinspection PyUnresolvedReferences
-from qgis.core import QgsFeatureRequest
+from qgis.core import QgsFeatureRequest, QgsVectorDataProvider
 
 from safe.definitions.minimum_needs import minimum_needs_parameter
 from safe.gis.vector.tools import (
@@ -19,8 +22,10 @@ from safe.processors import (
     constant_input_type,
     geometry_property_input_type,
     layer_property_input_type,
-    size_calculator_input_value
+    size_calculator_input_value,
+    hazard_class_resolver_input_type,
 )
+from safe.definitions.utilities import HazardClassResolver
 from safe.utilities.i18n import tr
 from safe.utilities.profiling import profile
 from functools import reduce
@@ -52,8 +57,216 @@ def evaluate_formula(formula, variables):
     return result
 
 
+def is_null(value):
+    """Check if an attribute value is NULL.
+
+    :param value: The attribute value, can be a QVariant.
+    :type value: object
+
+    :returns: True if the value is None or a NULL QVariant.
+    :rtype: bool
+    """
+    return value is None or (hasattr(value, 'isNull') and value.isNull())
+
+
+def compile_formula(formula):
+    """Parse a formula once so it can be evaluated on whole columns.
+
+    :param formula: A simple formula, such as 'population * ratio'.
+    :type formula: str
+
+    :returns: Tuple with the compiled code object and the list of variable
+        names used in the formula.
+    :rtype: (code, list)
+    """
+    tree = ast.parse(formula.strip(), mode='eval')
+    names = sorted(set(
+        node.id for node in ast.walk(tree) if isinstance(node, ast.Name)))
+    return compile(tree, '<formula>', 'eval'), names
+
+
+def attribute_column(values):
+    """Convert a list of attribute values to a numeric NumPy array.
+
+    NULL values are replaced by 0 in the array and flagged in the mask.
+
+    :param values: List of attribute values.
+    :type values: list
+
+    :returns: Tuple with the numeric array and the boolean NULL mask.
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    mask = numpy.fromiter(
+        (is_null(value) for value in values), dtype=bool, count=len(values))
+    if mask.any():
+        values = [0 if null else value for value, null in zip(values, mask)]
+    column = numpy.array(values)
+    if column.dtype.kind not in 'iuf':
+        # Strings or mixed values, they were evaluated as numbers before.
+        column = column.astype(numpy.float64)
+    return column, mask
+
+
+def evaluate_compiled_formula(compiled_formula, columns, constants, size):
+    """Evaluate a compiled formula on attribute columns.
+
+    NULL are propagated: if one input is NULL for a row, the result for this
+    row is NULL, as in evaluate_formula.
+
+    :param compiled_formula: The output of compile_formula.
+    :type compiled_formula: (code, list)
+
+    :param columns: Dictionary of variable name and list of values.
+    :type columns: dict
+
+    :param constants: Dictionary of variable name and scalar value, shared by
+        all rows.
+    :type constants: dict
+
+    :param size: The number of rows.
+    :type size: int
+
+    :returns: Tuple with the result array and the boolean NULL mask.
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    code, _ = compiled_formula
+    namespace = {}
+    null_mask = numpy.zeros(size, dtype=bool)
+
+    for key, value in list(constants.items()):
+        if is_null(value):
+            null_mask[:] = True
+            value = 0
+        namespace[key] = value
+
+    for key, values in list(columns.items()):
+        column, mask = attribute_column(values)
+        null_mask |= mask
+        namespace[key] = column
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        result = eval(code, {'__builtins__': {}}, namespace)
+    result = numpy.broadcast_to(numpy.asarray(result), (size, ))
+    return result, null_mask
+
+
+def formula_values(formula, columns, constants, size):
+    """Evaluate a formula on attribute columns, like evaluate_formula.
+
+    The formula is evaluated once on whole columns. The rows NumPy can't
+    compute, like a division by zero, are evaluated again with
+    evaluate_formula, so they give the same value or raise the same error.
+
+    :param formula: A simple formula, such as 'population * ratio'.
+    :type formula: str
+
+    :param columns: Dictionary of variable name and list of values.
+    :type columns: dict
+
+    :param constants: Dictionary of variable name and scalar value, shared by
+        all rows.
+    :type constants: dict
+
+    :param size: The number of rows.
+    :type size: int
+
+    :returns: The value of each row, None if an input is NULL.
+    :rtype: list
+    """
+    result, null_mask = evaluate_compiled_formula(
+        compile_formula(formula), columns, constants, size)
+
+    if result.dtype == bool:
+        # The affected postprocessor returns a boolean.
+        values = [tr(str(value)) for value in result.tolist()]
+    else:
+        values = result.tolist()
+    for row in numpy.flatnonzero(null_mask).tolist():
+        values[row] = None
+
+    if result.dtype.kind == 'f':
+        not_computed = ~numpy.isfinite(result) & ~null_mask
+        for row in numpy.flatnonzero(not_computed).tolist():
+            variables = dict(constants)
+            variables.update(
+                (key, column[row]) for key, column in list(columns.items()))
+            values[row] = evaluate_formula(formula, variables)
+    return values
+
+
+def _compiled_formula_values(layer, formula, inputs, constants):
+    """Evaluate a formula on the whole layer.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+
+    :param formula: The formula to evaluate.
+    :type formula: str
+
+    :param inputs: Dictionary of variable name and field index.
+    :type inputs: dict
+
+    :param constants: Dictionary of variable name and value.
+    :type constants: dict
+
+    :returns: Tuple with the list of feature ids and the list of values.
+    :rtype: (list, list)
+    """
+    request = QgsFeatureRequest()
+    request.setFlags(QgsFeatureRequest.NoGeometry)
+    request.setSubsetOfAttributes(list(inputs.values()))
+
+    feature_ids = []
+    columns = dict((key, []) for key in inputs)
+    for feature in layer.getFeatures(request):
+        feature_ids.append(feature.id())
+        attributes = feature.attributes()
+        for key, index in list(inputs.items()):
+            columns[key].append(attributes[index])
+
+    return feature_ids, formula_values(
+        formula, columns, constants, len(feature_ids))
+
+
+def _write_provider_values(layer, provider_values):
+    """Write the values of the new fields on the data provider.
+
+    The new fields must be committed. All values are written with a single
+    changeAttributeValues call. If it fails, the edit buffer is used.
+
+    :param layer: The vector layer, not in editing mode.
+    :type layer: QgsVectorLayer
+
+    :param provider_values: Dictionary of field name and tuple with the
+        list of feature ids and the list of values.
+    :type provider_values: dict
+
+    :returns: True if the values have been written.
+    :rtype: bool
+    """
+    provider = layer.dataProvider()
+    changes = {}
+    for field_name, (feature_ids, values) in list(provider_values.items()):
+        index = provider.fields().lookupField(field_name)
+        if index == -1:
+            break
+        for feature_id, value in zip(feature_ids, values):
+            changes.setdefault(feature_id, {})[index] = value
+    else:
+        if provider.changeAttributeValues(changes):
+            return True
+
+    if not layer.startEditing():
+        return False
+    for field_name, (feature_ids, values) in list(provider_values.items()):
+        index = layer.fields().lookupField(field_name)
+        for feature_id, value in zip(feature_ids, values):
+            layer.changeAttributeValue(feature_id, index, value)
+    return layer.commitChanges()
+
+
 @profile
-def run_single_post_processor(layer, post_processor):
+def run_single_post_processor(layer, post_processor, resolver=None):
     """Run single post processor.
 
     If the layer has the output field, it will pass the post
@@ -65,6 +278,10 @@ def run_single_post_processor(layer, post_processor):
     :param post_processor: A post processor definition.
     :type post_processor: dict
 
+    :param resolver: The hazard class lookup tables of the analysis. If it's
+        not provided and the post processor needs it, a new one is built.
+    :type resolver: HazardClassResolver
+
     :returns: Tuple with True if success, else False with an error message.
     :rtype: (bool, str)
     """
@@ -75,6 +292,14 @@ def run_single_post_processor(layer, post_processor):
             msg = tr('The impact layer could not start the editing mode.')
             return False, msg
 
+    # Values computed on whole columns, written on the data provider after
+    # the commit of the new fields.
+    provider_values = {}
+    provider = layer.dataProvider()
+    can_write_provider = bool(
+        provider.capabilities() & QgsVectorDataProvider.ChangeAttributeValues
+        and not layer.editBuffer().addedFeatures())
+
     # Calculate based on formula
     # Iterate all possible output and create the correct field.
     for output_key, output_value in list(post_processor['output'].items()):
@@ -139,8 +364,15 @@ def run_single_post_processor(layer, post_processor):
                     value['type'] == needs_profile_input_type)
                 is_layer_property_input = (
                     value['type'] == layer_property_input_type)
+                is_resolver_input = (
+                    value['type'] == hazard_class_resolver_input_type)
                 if value['type'] == keyword_value_expected:
                     break
+                if is_resolver_input:
+                    if not resolver:
+                        resolver = HazardClassResolver()
+                    default_parameters[key] = resolver
+                    break
                 if is_constant_input:
                     default_parameters[key] = value['value']
                     break
@@ -220,6 +452,19 @@ def run_single_post_processor(layer, post_processor):
                 layer.rollBack()
                 return False, msg
 
+        formula = output_value.get('formula')
+        if not output_value.get('function') and not input_properties:
+            # Formula on attributes only, we can evaluate whole columns.
+            feature_ids, values = _compiled_formula_values(
+                layer, formula, input_indexes, default_parameters)
+            if can_write_provider:
+                provider_values[output_field_name] = (feature_ids, values)
+            else:
+                for feature_id, value in zip(feature_ids, values):
+                    layer.changeAttributeValue(
+                        feature_id, output_field_index, value)
+            continue
+
         # Create iterator for feature
         request = QgsFeatureRequest().setSubsetOfAttributes(
             list(input_indexes.values()))
@@ -265,7 +510,18 @@ def run_single_post_processor(layer, post_processor):
                 post_processor_result
             )
 
-    layer.commitChanges()
+    if not layer.commitChanges():
+        msg = tr(
+            'The impact layer could not be saved: %s'
+            % ', '.join(layer.commitErrors()))
+        layer.rollBack()
+        return False, msg
+
+    if provider_values and not _write_provider_values(
+            layer, provider_values):
+        msg = tr('The post processor values could not be written.')
+        return False, msg
+
     return True, None
 
 
@@ -334,6 +590,8 @@ def enough_input(layer, post_processor_input):
             is_keyword_input = input_value['type'] == keyword_input_type
             is_layer_input = input_value['type'] == layer_property_input_type
             is_keyword_value = input_value['type'] == keyword_value_expected
+            is_resolver_input = (
+                input_value['type'] == hazard_class_resolver_input_type)
             is_geometry_input = (
                 input_value['type'] == geometry_property_input_type)
             if is_constant_input:
@@ -373,7 +631,7 @@ def enough_input(layer, post_processor_input):
                 except KeyError:
                     msg = 'Value %s is missing in keyword: %s' % (
                         input_key, input_value['value'])
-            elif is_layer_input or is_geometry_input:
+            elif is_layer_input or is_geometry_input or is_resolver_input:
                 # will be taken from the layer itself, so always true
                 break
             elif is_keyword_value:
@@ -0,0 +1,382 @@
+# coding=utf-8
+
+"""Cache on disk of the prepared hazard and aggregate hazard layers.
+
+Preparing the hazard and the aggregate hazard is the same work each time the
+same hazard is used with the same aggregation, even with other exposures. The
+prepared layers are saved in a GeoPackage for each key. The key is a checksum
+of the hazard and aggregation data, their keywords, the analysis extent, the
+CRS and the InaSAFE version. The least recently used entries are removed when
+the cache is bigger than the maximum size.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from os.path import exists, getmtime, getsize, isdir, isfile, join, splitext
+
+from qgis.core import (
+    QgsFeature,
+    QgsFields,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+)
+
+from safe.common.version import get_version
+from safe.definitions.field_groups import count_ratio_mapping
+from safe.gis.vector.tools import create_memory_layer
+from safe.metadata.encoder import MetadataEncoder
+from safe.utilities.metadata import (
+    active_classification,
+    active_thresholds_value_maps,
+    copy_layer_keywords,
+)
+from safe.utilities.settings import setting
+
+__copyright__ = "Copyright 2018, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+LOGGER = logging.getLogger('InaSAFE')
+
+# Files of a cache entry.
+layers_file = 'layers.gpkg'
+keywords_file = 'keywords.json'
+prepared_layer_names = ['hazard', 'aggregate_hazard']
+
+# Other files needed by some formats, beside the file in the layer source.
+sidecar_extensions = {
+    '.shp': ['.dbf', '.shx'],
+}
+
+# Checksums already computed, by path, size and modification time.
+_checksums = {}
+
+
+def file_checksum(path):
+    """Checksum of the content of a file.
+
+    :param path: The file path.
+    :type path: str
+
+    :return: The SHA-256 hexadecimal digest.
+    :rtype: str
+    """
+    stat = os.stat(path)
+    memo_key = (path, stat.st_size, stat.st_mtime)
+    if memo_key not in _checksums:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as data_file:
+            for block in iter(lambda: data_file.read(1 << 20), b''):
+                digest.update(block)
+        _checksums[memo_key] = digest.hexdigest()
+    return _checksums[memo_key]
+
+
+def layer_checksum(layer):
+    """Checksum of the data of a file based layer.
+
+    :param layer: The layer.
+    :type layer: QgsMapLayer
+
+    :return: The SHA-256 hexadecimal digest, None if the layer is not file
+        based.
+    :rtype: str
+    """
+    source = layer.source()
+    path = source.split('|')[0]
+    if layer.providerType() == 'memory' or not isfile(path):
+        return None
+
+    base, extension = splitext(path)
+    paths = [path] + [
+        base + sidecar
+        for sidecar in sidecar_extensions.get(extension.lower(), [])
+        if isfile(base + sidecar)]
+    checksums = [file_checksum(file_path) for file_path in paths]
+    # The source can have a layer name or a subset after the path.
+    checksums.append(source[len(path):])
+    if hasattr(layer, 'subsetString'):
+        checksums.append(layer.subsetString())
+    return hashlib.sha256('|'.join(checksums).encode('utf-8')).hexdigest()
+
+
+def prepared_layers_key(
+        hazard,
+        exposure,
+        aggregation,
+        analysis_extent,
+        crs,
+        use_selected_features_only=False):
+    """Key of the hazard and aggregate hazard prepared from input layers.
+
+    The exposure is only used with its type and its count fields, which are
+    changing the hazard classification and the aggregation fields.
+
+    :param hazard: The hazard layer.
+    :type hazard: QgsMapLayer
+
+    :param exposure: The exposure layer.
+    :type exposure: QgsMapLayer
+
+    :param aggregation: The aggregation layer, None if there isn't one.
+    :type aggregation: QgsVectorLayer
+
+    :param analysis_extent: The analysis extent.
+    :type analysis_extent: QgsGeometry
+
+    :param crs: The analysis CRS if there isn't an aggregation layer.
+    :type crs: QgsCoordinateReferenceSystem
+
+    :param use_selected_features_only: If only the selected aggregation
+        areas are used.
+    :type use_selected_features_only: bool
+
+    :return: The key, None if a layer is not file based.
+    :rtype: str
+    """
+    hazard_checksum = layer_checksum(hazard)
+    if not hazard_checksum:
+        return None
+
+    exposure_key = exposure.keywords['exposure']
+    exposure_fields = exposure.keywords.get('inasafe_fields', {})
+    inputs = {
+        'inasafe_version': get_version(),
+        'hazard': hazard_checksum,
+        'hazard_crs': hazard.crs().toWkt(),
+        'hazard_keywords': hazard.keywords,
+        'exposure': exposure_key,
+        'classification': active_classification(
+            hazard.keywords, exposure_key),
+        'thresholds': active_thresholds_value_maps(
+            hazard.keywords, exposure_key),
+        'counts': sorted(
+            key for key in exposure_fields if key in count_ratio_mapping),
+        'analysis_extent': analysis_extent.asWkt(),
+        'crs': crs.toWkt() if crs else None,
+        'aggregation': None,
+    }
+    if aggregation:
+        aggregation_checksum = layer_checksum(aggregation)
+        if not aggregation_checksum:
+            return None
+        inputs['aggregation'] = aggregation_checksum
+        inputs['aggregation_crs'] = aggregation.crs().toWkt()
+        inputs['aggregation_keywords'] = aggregation.keywords
+        if use_selected_features_only:
+            inputs['selection'] = sorted(aggregation.selectedFeatureIds())
+
+    serialized = json.dumps(inputs, sort_keys=True, cls=MetadataEncoder)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+def _write_layer(layer, path, name):
+    """Write a vector layer in a GeoPackage.
+
+    :param layer: The vector layer.
+    :type layer: QgsVectorLayer
+
+    :param path: The GeoPackage path. It's created if needed.
+    :type path: str
+
+    :param name: The name of the layer in the GeoPackage.
+    :type name: str
+    """
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = 'GPKG'
+    options.fileEncoding = 'utf-8'
+    options.layerName = name
+    if exists(path):
+        options.actionOnExistingFile = (
+            QgsVectorFileWriter.CreateOrOverwriteLayer)
+    error, message = QgsVectorFileWriter.writeAsVectorFormat(
+        layer, path, options)
+    if error != QgsVectorFileWriter.NoError:
+        raise Exception(message)
+
+
+def _read_layer(path, name):
+    """Read a vector layer from a GeoPackage in memory.
+
+    The primary key added by the GeoPackage is removed, the memory layer has
+    the same fields as the layer which has been written.
+
+    :param path: The GeoPackage path.
+    :type path: str
+
+    :param name: The name of the layer in the GeoPackage.
+    :type name: str
+
+    :return: The memory layer, without keywords.
+    :rtype: QgsVectorLayer
+    """
+    source = QgsVectorLayer('%s|layername=%s' % (path, name), name, 'ogr')
+    if not source.isValid():
+        raise Exception('%s is not in the cache.' % name)
+
+    primary_keys = source.dataProvider().pkAttributeIndexes()
+    indexes = [
+        index for index in range(source.fields().count())
+        if index not in primary_keys]
+    fields = QgsFields()
+    for index in indexes:
+        fields.append(source.fields().at(index))
+
+    layer = create_memory_layer(
+        name, source.geometryType(), source.crs(), fields)
+    features = []
+    for source_feature in source.getFeatures():
+        feature = QgsFeature(fields)
+        feature.setGeometry(source_feature.geometry())
+        attributes = source_feature.attributes()
+        feature.setAttributes([attributes[index] for index in indexes])
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    return layer
+
+
+class PreparedLayersCache(object):
+
+    """Cache on disk of the prepared hazard and aggregate hazard layers.
+
+    Each entry is a folder with a GeoPackage with the two layers and a JSON
+    file with their keywords. An entry is written in a temporary folder and
+    renamed, so processes can share the cache.
+
+    .. versionadded:: 5.0
+    """
+
+    def __init__(self, path=None, max_size=None):
+        """Constructor.
+
+        :param path: The cache folder. If None, the
+            prepared_layers_cache_path setting is used.
+        :type path: str
+
+        :param max_size: The maximum size in megabytes. If None, the
+            prepared_layers_cache_size setting is used.
+        :type max_size: int
+        """
+        if path is None:
+            path = setting('prepared_layers_cache_path')
+        if max_size is None:
+            max_size = setting('prepared_layers_cache_size', expected_type=int)
+        self.path = path
+        self.max_size = max_size * 1024 * 1024
+        if not exists(self.path):
+            os.makedirs(self.path)
+
+    def entries(self):
+        """List the entries, the least recently used first.
+
+        :return: List of tuples with the key, the last use time and the size
+            in bytes.
+        :rtype: list
+        """
+        entries = []
+        for key in os.listdir(self.path):
+            folder = join(self.path, key)
+            keywords_path = join(folder, keywords_file)
+            if not isfile(keywords_path):
+                # A temporary folder or something else.
+                continue
+            size = sum(
+                getsize(join(folder, name)) for name in os.listdir(folder))
+            entries.append((key, getmtime(keywords_path), size))
+        return sorted(entries, key=lambda entry: entry[1])
+
+    def get(self, key):
+        """Get the prepared layers.
+
+        :param key: The key, from prepared_layers_key.
+        :type key: str
+
+        :return: The prepared hazard and aggregate hazard in memory with
+            their keywords, None if the key is not in the cache.
+        :rtype: (QgsVectorLayer, QgsVectorLayer)
+        """
+        folder = join(self.path, key)
+        keywords_path = join(folder, keywords_file)
+        if not isfile(keywords_path) or not isfile(join(folder, layers_file)):
+            return None
+
+        try:
+            with open(keywords_path) as json_file:
+                keywords = json.load(json_file)
+            layers = []
+            for name in prepared_layer_names:
+                layer = _read_layer(join(folder, layers_file), name)
+                layer.keywords = keywords[name]
+                layers.append(layer)
+        except Exception as e:
+            LOGGER.info(
+                'The prepared layers cache entry %s can not be read: %s' % (
+                    key, e))
+            return None
+
+        # Last use, for the eviction.
+        os.utime(keywords_path, None)
+        LOGGER.info('Prepared layers found in the cache: %s' % key)
+        return tuple(layers)
+
+    def put(self, key, hazard, aggregate_hazard):
+        """Save the prepared layers.
+
+        :param key: The key, from prepared_layers_key.
+        :type key: str
+
+        :param hazard: The prepared hazard.
+        :type hazard: QgsVectorLayer
+
+        :param aggregate_hazard: The prepared aggregate hazard.
+        :type aggregate_hazard: QgsVectorLayer
+
+        :return: True if the layers have been saved.
+        :rtype: bool
+        """
+        folder = join(self.path, key)
+        if exists(folder):
+            return False
+
+        temporary = tempfile.mkdtemp(prefix='.%s-' % key, dir=self.path)
+        try:
+            keywords = {}
+            for name, layer in zip(
+                    prepared_layer_names, [hazard, aggregate_hazard]):
+                _write_layer(layer, join(temporary, layers_file), name)
+                keywords[name] = copy_layer_keywords(layer.keywords)
+            with open(join(temporary, keywords_file), 'w') as json_file:
+                json.dump(keywords, json_file, cls=MetadataEncoder)
+            os.rename(temporary, folder)
+        except Exception as e:
+            # Another process might have saved the same key.
+            LOGGER.info(
+                'The prepared layers can not be saved in the cache: %s' % e)
+            shutil.rmtree(temporary, ignore_errors=True)
+            return False
+
+        self.evict()
+        return True
+
+    def evict(self):
+        """Remove the least recently used entries above the maximum size."""
+        entries = self.entries()
+        total = sum(entry[2] for entry in entries)
+        for key, _, size in entries:
+            if total <= self.max_size:
+                break
+            LOGGER.info('Removing %s from the prepared layers cache.' % key)
+            shutil.rmtree(join(self.path, key), ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """Remove every entry."""
+        for key in os.listdir(self.path):
+            folder = join(self.path, key)
+            if isdir(folder):
+                shutil.rmtree(folder, ignore_errors=True)
@@ -0,0 +1,156 @@
+# coding=utf-8
+
+"""Test for the batch runner without GUI."""
+
+import json
+import os
+import unittest
+
+from safe.definitions.constants import INASAFE_TEST
+from safe.test.utilities import get_qgis_app, standard_data_path
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app(qsetting=INASAFE_TEST)
+
+from safe.common.utilities import temp_dir, unique_filename
+from safe.impact_function.batch import (
+    main,
+    read_scenarios,
+    run_scenarios,
+    scenario_files,
+    scenario_folders,
+    summary_file)
+
+__copyright__ = "Copyright 2018, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+scenarios = """[buildings]
+hazard = {hazard}
+exposure = {exposure}
+aggregation = {aggregation}
+
+[missing]
+hazard = {hazard}
+exposure = not_a_layer.geojson
+"""
+
+
+class TestBatch(unittest.TestCase):
+
+    """Test the batch runner without GUI."""
+
+    def setUp(self):
+        self.directory = unique_filename(dir=temp_dir('test'))
+        os.makedirs(self.directory)
+        self.scenario_path = self.write_scenarios('scenarios.txt')
+
+    def write_scenarios(self, name):
+        """Write the test scenarios in a file.
+
+        :param name: The file name.
+        :type name: str
+
+        :return: The path of the file.
+        :rtype: str
+        """
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as scenario_file:
+            scenario_file.write(scenarios.format(
+                hazard=standard_data_path(
+                    'gisv4', 'hazard', 'classified_vector.geojson'),
+                exposure=standard_data_path(
+                    'gisv4', 'exposure', 'building-points.geojson'),
+                aggregation=standard_data_path(
+                    'gisv4', 'aggregation', 'small_grid.geojson')))
+        return path
+
+    def test_scenario_files(self):
+        """Test we can list scenario files."""
+        self.assertEqual(
+            scenario_files([self.directory]), [self.scenario_path])
+        self.assertEqual(
+            scenario_files([self.scenario_path]), [self.scenario_path])
+
+        blocks = read_scenarios(self.scenario_path)
+        self.assertEqual(sorted(blocks), ['buildings', 'missing'])
+        self.assertEqual(
+            blocks['buildings']['full_path'], self.scenario_path)
+
+    def test_scenario_folders(self):
+        """Test each scenario has its own output folder."""
+        other_path = self.write_scenarios('other.txt')
+        blocks = read_scenarios(self.scenario_path)
+        other_blocks = read_scenarios(other_path)
+        folders = scenario_folders(
+            [blocks['buildings'], other_blocks['buildings'],
+             blocks['buildings']],
+            self.directory)
+        self.assertEqual(
+            folders,
+            [os.path.join(self.directory, name) for name in [
+                'scenarios_buildings',
+                'other_buildings',
+                'scenarios_buildings_2']])
+
+    def test_main(self):
+        """Test we can run scenarios and write the summary."""
+        output = os.path.join(self.directory, 'output')
+        status = main([self.scenario_path, '-o', output, '-w', '1'])
+        self.assertEqual(status, 1)
+
+        with open(os.path.join(output, summary_file)) as json_file:
+            summary = json.load(json_file)
+        self.assertEqual(summary['total'], 2)
+        self.assertEqual(summary['success'], 1)
+        self.assertEqual(summary['failed'], 1)
+
+        results = dict(
+            (result['scenario'], result) for result in summary['scenarios'])
+        self.assertEqual(results['buildings']['status'], 'success')
+        self.assertIsNone(results['buildings']['message'])
+        self.assertTrue(os.path.exists(
+            results['buildings']['output_directory']))
+        self.assertEqual(results['missing']['status'], 'failed')
+        self.assertIn('not_a_layer', results['missing']['message'])
+
+    def test_main_workers(self):
+        """Test we can run scenarios with the same name on processes."""
+        other_path = self.write_scenarios('other.txt')
+        output = os.path.join(self.directory, 'output')
+        status = main(
+            [self.scenario_path, other_path, '-o', output, '-w', '2'])
+        self.assertEqual(status, 1)
+
+        with open(os.path.join(output, summary_file)) as json_file:
+            summary = json.load(json_file)
+        self.assertEqual(summary['total'], 4)
+        self.assertEqual(summary['success'], 2)
+        self.assertEqual(summary['failed'], 2)
+
+        folders = [
+            result['output_directory'] for result in summary['scenarios']
+            if result['scenario'] == 'buildings']
+        self.assertEqual(
+            folders,
+            [os.path.join(output, 'scenarios_buildings'),
+             os.path.join(output, 'other_buildings')])
+        for folder in folders:
+            self.assertTrue(os.path.exists(folder))
+
+    def test_run_scenarios_error(self):
+        """Test a scenario failing in the process pool is reported."""
+        blocks = read_scenarios(self.scenario_path)
+        # This scenario can't be sent to a worker process.
+        broken = dict(blocks['missing'], hazard=lambda: None)
+        output = os.path.join(self.directory, 'output')
+        results = run_scenarios(
+            [blocks['missing'], broken], output, workers=2)
+        self.assertEqual(
+            [result['status'] for result in results], ['failed', 'failed'])
+        self.assertIn('not_a_layer', results[0]['message'])
+        self.assertIn('pickle', results[1]['message'].lower())
+        self.assertIsNone(results[1]['duration'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -264,3 +264,54 @@ class TestMultiExposureImpactFunction(unittest.TestCase):
         new_analysis_layer_id = new_impact_function.provenance[
             provenance_layer_analysis_impacted['provenance_key']]
         self.assertEqual(old_analysis_layer_id, new_analysis_layer_id)
+
+    def test_multi_exposure_shared_and_parallel(self):
+        """Test the aggregate hazard is shared and the parallel run."""
+        results = []
+        for workers in [1, 2]:
+            hazard_layer = load_test_vector_layer(
+                'gisv4', 'hazard', 'classified_vector.geojson')
+            building_layer = load_test_vector_layer(
+                'gisv4', 'exposure', 'building-points.geojson')
+            population_layer = load_test_vector_layer(
+                'gisv4', 'exposure', 'population.geojson')
+            roads_layer = load_test_vector_layer(
+                'gisv4', 'exposure', 'roads.geojson')
+            aggregation_layer = load_test_vector_layer(
+                'gisv4', 'aggregation', 'small_grid.geojson')
+
+            impact_function = MultiExposureImpactFunction()
+            impact_function.hazard = hazard_layer
+            impact_function.exposures = [
+                building_layer, population_layer, roads_layer]
+            impact_function.aggregation = aggregation_layer
+            impact_function.workers = workers
+
+            code, message = impact_function.prepare()
+            self.assertEqual(code, PREPARE_SUCCESS, message)
+            code, message, exposure = impact_function.run()
+            self.assertEqual(code, ANALYSIS_SUCCESS, message)
+
+            if workers == 1:
+                # The hazard has the same value map for every exposure, but
+                # the population has counts removing ratios from the
+                # aggregation.
+                shared = 'Use the aggregate hazard prepared for another ' \
+                    'exposure'
+                for single_impact_function in (
+                        impact_function.impact_functions):
+                    exposure = single_impact_function.exposure.keywords[
+                        'exposure']
+                    process = single_impact_function.state['aggregation'][
+                        'process']
+                    if exposure == 'population':
+                        self.assertNotIn(shared, process)
+                    else:
+                        self.assertIn(shared, process)
+
+            analysis = impact_function.analysis_impacted
+            feature = next(analysis.getFeatures())
+            results.append(dict(
+                list(zip(analysis.fields().names(), feature.attributes()))))
+
+        self.assertDictEqual(results[0], results[1])
@@ -65,6 +65,9 @@ from safe.test.utilities import load_test_vector_layer
 from safe.impact_function.postprocessors import (
     run_single_post_processor,
     evaluate_formula,
+    compile_formula,
+    evaluate_compiled_formula,
+    formula_values,
     enough_input,
     should_run,
     )
@@ -601,6 +604,54 @@ class TestPostProcessors(unittest.TestCase):
         }
         self.assertIsNone(evaluate_formula(formula, variables))
 
+    def test_evaluate_compiled_formula(self):
+        """Test for evaluating a compiled formula on columns."""
+        formula = '(population - fatalities) * displacement_ratio'
+        compiled_formula = compile_formula(formula)
+        self.assertEqual(
+            ['displacement_ratio', 'fatalities', 'population'],
+            compiled_formula[1])
+
+        columns = {
+            'population': [100, None, 20.5, 8],
+            'fatalities': [10, 3, 0.5, None],
+        }
+        constants = {'displacement_ratio': 0.5}
+        result, null_mask = evaluate_compiled_formula(
+            compiled_formula, columns, constants, 4)
+        self.assertListEqual([False, True, False, True], null_mask.tolist())
+
+        # The result must be the same as the row by row evaluation.
+        for row in range(4):
+            variables = dict(constants)
+            variables['population'] = columns['population'][row]
+            variables['fatalities'] = columns['fatalities'][row]
+            expected = evaluate_formula(formula, variables)
+            if expected is None:
+                self.assertTrue(null_mask[row])
+            else:
+                self.assertEqual(expected, result[row])
+
+        # A NULL constant gives NULL everywhere.
+        _, null_mask = evaluate_compiled_formula(
+            compiled_formula, columns, {'displacement_ratio': None}, 4)
+        self.assertTrue(null_mask.all())
+
+    def test_formula_values(self):
+        """Test the values of a formula are the same as row by row."""
+        formula = 'population / households'
+        columns = {
+            'population': [100, 30, None, 7],
+            'households': [20, 0, 0, 2],
+        }
+        # The second row raises like evaluate_formula.
+        self.assertRaises(
+            ZeroDivisionError, formula_values, formula, columns, {}, 4)
+
+        columns['households'][1] = 10
+        self.assertListEqual(
+            [5.0, 3.0, None, 3.5], formula_values(formula, columns, {}, 4))
+
 
 if __name__ == '__main__':
     unittest.main()
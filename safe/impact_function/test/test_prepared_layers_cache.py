@@ -0,0 +1,154 @@
+# coding=utf-8
+
+"""Test for the prepared layers cache."""
+
+import os
+import unittest
+
+from safe.definitions.constants import INASAFE_TEST
+from safe.test.utilities import (
+    get_qgis_app,
+    load_test_vector_layer,
+)
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app(qsetting=INASAFE_TEST)
+
+from qgis.core import QgsCoordinateReferenceSystem, QgsGeometry
+
+from safe.common.utilities import temp_dir, unique_filename
+from safe.definitions.constants import ANALYSIS_SUCCESS, PREPARE_SUCCESS
+from safe.definitions.provenance import provenance_prepared_layers_cache
+from safe.definitions.utilities import get_provenance
+from safe.impact_function.impact_function import ImpactFunction
+from safe.impact_function.prepared_layers_cache import (
+    PreparedLayersCache, keywords_file, prepared_layers_key)
+from safe.utilities.settings import set_setting, setting
+
+__copyright__ = "Copyright 2018, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+def _set_last_use(cache, key, timestamp):
+    """Set the last use of a cache entry to a given time."""
+    path = os.path.join(cache.path, key, keywords_file)
+    os.utime(path, (timestamp, timestamp))
+
+
+class TestPreparedLayersCache(unittest.TestCase):
+
+    """Test the prepared layers cache."""
+
+    def setUp(self):
+        self.path = unique_filename(dir=temp_dir('test'))
+        self.cache_path = setting('prepared_layers_cache_path')
+        set_setting('prepared_layers_cache_path', self.path)
+
+    def tearDown(self):
+        set_setting('prepared_layers_cache_path', self.cache_path)
+
+    def test_prepared_layers_key(self):
+        """Test the key of the prepared layers."""
+        hazard = load_test_vector_layer(
+            'gisv4', 'hazard', 'classified_vector.geojson')
+        exposure = load_test_vector_layer(
+            'gisv4', 'exposure', 'building-points.geojson')
+        aggregation = load_test_vector_layer(
+            'gisv4', 'aggregation', 'small_grid.geojson')
+        extent = QgsGeometry.fromWkt(
+            'POLYGON((106.8 -6.2, 106.9 -6.2, 106.9 -6.1, 106.8 -6.1, '
+            '106.8 -6.2))')
+        crs = QgsCoordinateReferenceSystem('EPSG:4326')
+
+        key = prepared_layers_key(hazard, exposure, aggregation, extent, None)
+        self.assertEqual(
+            key,
+            prepared_layers_key(hazard, exposure, aggregation, extent, None))
+        self.assertNotEqual(
+            key, prepared_layers_key(hazard, exposure, None, extent, crs))
+
+        hazard.keywords['title'] = 'Another title'
+        self.assertNotEqual(
+            key,
+            prepared_layers_key(hazard, exposure, aggregation, extent, None))
+
+        # A memory layer can't be cached.
+        memory_hazard = load_test_vector_layer(
+            'gisv4', 'hazard', 'classified_vector.geojson',
+            clone_to_memory=True)
+        self.assertIsNone(prepared_layers_key(
+            memory_hazard, exposure, aggregation, extent, None))
+
+    def test_put_get_evict(self):
+        """Test we can save, read and evict entries."""
+        hazard = load_test_vector_layer(
+            'gisv4', 'hazard', 'classified_vector.geojson')
+        aggregation = load_test_vector_layer(
+            'gisv4', 'aggregation', 'small_grid.geojson')
+
+        cache = PreparedLayersCache(self.path, 1024)
+        self.assertIsNone(cache.get('key'))
+        self.assertTrue(cache.put('key', hazard, aggregation))
+        self.assertFalse(cache.put('key', hazard, aggregation))
+
+        cached_hazard, cached_aggregation = cache.get('key')
+        self.assertDictEqual(
+            cached_hazard.keywords['inasafe_fields'],
+            hazard.keywords['inasafe_fields'])
+        self.assertListEqual(
+            cached_aggregation.fields().names(),
+            aggregation.fields().names())
+        self.assertEqual(
+            cached_aggregation.featureCount(), aggregation.featureCount())
+
+        self.assertTrue(cache.put('other', aggregation, hazard))
+        _set_last_use(cache, 'key', 1000)
+        _set_last_use(cache, 'other', 2000)
+        self.assertEqual(
+            [entry[0] for entry in cache.entries()], ['key', 'other'])
+
+        # Only one entry fits, the least recently used goes first.
+        cache.get('key')
+        self.assertEqual(
+            [entry[0] for entry in cache.entries()], ['other', 'key'])
+        cache.max_size = cache.entries()[-1][2]
+        cache.evict()
+        self.assertEqual([entry[0] for entry in cache.entries()], ['key'])
+
+        cache.clear()
+        self.assertEqual(cache.entries(), [])
+
+    def test_impact_function_cache(self):
+        """Test the impact function uses the cache on the second run."""
+        results = []
+        for expected_from_cache in [False, True]:
+            impact_function = ImpactFunction()
+            impact_function.hazard = load_test_vector_layer(
+                'gisv4', 'hazard', 'classified_vector.geojson')
+            impact_function.exposure = load_test_vector_layer(
+                'gisv4', 'exposure', 'building-points.geojson')
+            impact_function.aggregation = load_test_vector_layer(
+                'gisv4', 'aggregation', 'small_grid.geojson')
+            impact_function.use_prepared_layers_cache = True
+
+            status, message = impact_function.prepare()
+            self.assertEqual(PREPARE_SUCCESS, status, message)
+            status, message = impact_function.run()
+            self.assertEqual(ANALYSIS_SUCCESS, status, message)
+
+            self.assertEqual(
+                get_provenance(
+                    impact_function.provenance,
+                    provenance_prepared_layers_cache),
+                expected_from_cache)
+
+            analysis = impact_function.analysis_impacted
+            feature = next(analysis.getFeatures())
+            results.append(dict(
+                list(zip(analysis.fields().names(), feature.attributes()))))
+
+        self.assertDictEqual(results[0], results[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,8 +14,8 @@ from safe.metadata.encoder import MetadataEncoder
 from safe.metadata.metadata_db_io import MetadataDbIO
 from safe.metadata.utilities import (
     XML_NS,
+    XmlIndex,
     insert_xml_element,
-    read_property_from_xml,
     reading_ancillary_files
 )
 from safe.utilities.i18n import tr
@@ -45,6 +45,9 @@ class BaseMetadata(with_metaclass(abc.ABCMeta, object)):
     The class will try to read all she can without throwing errors because
     the more we can read from malformed input the better.
 
+    The XML is parsed once in an XmlIndex. The text of each property is kept
+    and decoded only when the property is used.
+
     .. versionadded:: 3.2
     """
 
@@ -185,7 +188,7 @@ class BaseMetadata(with_metaclass(abc.ABCMeta, object)):
         return self.dict == other.dict
 
     @abc.abstractmethod
-    def __init__(self, layer_uri, xml_uri=None, json_uri=None):
+    def __init__(self, layer_uri, xml_uri=None, json_uri=None, xml_index=None):
         """
         Constructor.
 
@@ -195,6 +198,9 @@ class BaseMetadata(with_metaclass(abc.ABCMeta, object)):
         :type xml_uri: str
         :param json_uri: uri of a json file to use
         :type json_uri: str
+        :param xml_index: the xml already parsed by another metadata object
+            of the same layer, instead of parsing xml_uri again
+        :type xml_index: XmlIndex
         """
         # private members
         self._layer_uri = layer_uri
@@ -235,6 +241,10 @@ class BaseMetadata(with_metaclass(abc.ABCMeta, object)):
 
         self.reading_ancillary_files = False
         self._properties = {}
+        # text read from the xml, decoded when the property is used
+        self._pending = {}
+        self._xml_index = xml_index
+        self._reuse_xml_index = xml_index is not None
 
         # initialise the properties
         for name, path in list(self._standard_properties.items()):
@@ -372,18 +382,55 @@ class BaseMetadata(with_metaclass(abc.ABCMeta, object)):
         :return: the root element of the xml
         :rtype: ElementTree.Element
         """
-        if self.xml_uri is None:
-            root = self._read_xml_db()
+        if self._reuse_xml_index:
+            self._reuse_xml_index = False
         else:
-            root = self._read_xml_file()
-        if root is not None:
-            for name, path in list(self._standard_properties.items()):
-                value = read_property_from_xml(root, path)
-                if value is not None:
-                    # this calls the default setters
-                    setattr(self, name, value)
+            if self.xml_uri is None:
+                root = self._read_xml_db()
+            else:
+                root = self._read_xml_file()
+            self._xml_index = XmlIndex(root) if root is not None else None
 
-        return root
+        if self._xml_index is None:
+            return None
+
+        for name, path in list(self._standard_properties.items()):
+            value = self._xml_index.text(path)
+            if value is not None:
+                # decoded by the default setters in get_property
+                self._pending[name] = (value, path)
+                self.set_last_update_to_now()
+
+        return self._xml_index.root
+
+    @property
+    def xml_index(self):
+        """
+        the last xml read, to create another metadata object without
+        parsing it again.
+
+        :return: the indexed xml, None if no xml has been read
+        :rtype: XmlIndex
+        """
+        return self._xml_index
+
+    def _decode_property(self, name):
+        """
+        set a property from the text read in the xml.
+
+        :param name: the name of the property
+        :type name: str
+        """
+        value, path = self._pending.pop(name)
+        last_update = self._last_update
+        reading_ancillary_files = self.reading_ancillary_files
+        # we accept as much as possible from the file, like read_xml
+        self.reading_ancillary_files = True
+        try:
+            self.set(name, value, path)
+        finally:
+            self.reading_ancillary_files = reading_ancillary_files
+        self._last_update = last_update
 
     def _read_xml_file(self):
         """
@@ -504,7 +551,9 @@ class BaseMetadata(with_metaclass(abc.ABCMeta, object)):
         :return: the property
         :rtype: BaseProperty
         """
-        return self.properties[name]
+        if name in self._pending:
+            self._decode_property(name)
+        return self._properties[name]
 
     @property
     def properties(self):
@@ -514,6 +563,8 @@ class BaseMetadata(with_metaclass(abc.ABCMeta, object)):
         :return: the properties
         :rtype: dict
         """
+        for name in list(self._pending):
+            self._decode_property(name)
         return self._properties
 
     def update(self, name, value):
@@ -552,6 +603,8 @@ class BaseMetadata(with_metaclass(abc.ABCMeta, object)):
         except KeyError:
             raise KeyError('The xml type %s is not supported yet' % xml_type)
 
+        # a new value replaces the one read in the xml
+        self._pending.pop(name, None)
         try:
             metadata_property = property_class(name, value, xml_path)
             self._properties[name] = metadata_property
@@ -37,7 +37,7 @@ class GenericLayerMetadata(BaseMetadata):
     .. versionadded:: 3.2
     """
 
-    def __init__(self, layer_uri, xml_uri=None, json_uri=None):
+    def __init__(self, layer_uri, xml_uri=None, json_uri=None, xml_index=None):
         """Constructor
 
         :param layer_uri: URI of the layer for which the metadata.
@@ -46,10 +46,13 @@ class GenericLayerMetadata(BaseMetadata):
         :type xml_uri: str
         :param json_uri: URI of a json file to use.
         :type json_uri: str
+        :param xml_index: XML already parsed by another metadata object of
+            the same layer.
+        :type xml_index: XmlIndex
         """
         # initialize base class
         super(GenericLayerMetadata, self).__init__(
-            layer_uri, xml_uri, json_uri)
+            layer_uri, xml_uri, json_uri, xml_index)
 
     @property
     def dict(self):
@@ -5,6 +5,9 @@
 import logging
 import os
 import sqlite3 as sqlite
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from sqlite3 import OperationalError
 
 # noinspection PyPackageRequirements
@@ -22,6 +25,20 @@ __revision__ = '$Format:%H$'
 
 LOGGER = logging.getLogger('InaSAFE')
 
+# Connections and pending writes of each thread.
+_pool = threading.local()
+
+# Seconds to wait for a lock held by another connection.
+busy_timeout = 30
+
+# Maximum number of values in one query.
+max_sql_variables = 500
+
+select_metadata_sql = {
+    'json': 'select hash, json from metadata where hash in (%s);',
+    'xml': 'select hash, xml from metadata where hash in (%s);',
+}
+
 
 class MetadataDbIO(QObject):
 
@@ -87,6 +104,9 @@ class MetadataDbIO(QObject):
         overridden in QSettings. If the db does not exist it will
         be created.
 
+        The connection is taken from a pool of connections of the current
+        thread, so the database is opened only once per thread.
+
         :raises: An sqlite.Error is raised if anything goes wrong
         """
         self.connection = None
@@ -100,23 +120,24 @@ class MetadataDbIO(QObject):
                 raise
 
         try:
-            self.connection = sqlite.connect(self.metadata_db_path)
+            self.connection = pooled_connection(self.metadata_db_path)
         except (OperationalError, sqlite.Error):
             LOGGER.exception('Failed to open metadata cache database.')
             raise
 
     def close_connection(self):
-        """Close the active sqlite3 connection."""
-        if self.connection is not None:
-            self.connection.close()
-            self.connection = None
+        """Release the active sqlite3 connection.
+
+        The connection stays open in the pool, see close_connections.
+        """
+        self.connection = None
 
     def get_cursor(self):
         """Get a cursor for the active connection.
 
         The cursor can be used to execute arbitrary queries against the
-        database. This method also checks that the metadata table exists in
-        the schema, and if not, it creates it.
+        database. The metadata table is created when the connection is
+        opened.
 
         :returns: A valid cursor opened against the connection.
         :rtype: sqlite.
@@ -124,36 +145,8 @@ class MetadataDbIO(QObject):
         :raises: An sqlite.Error will be raised if anything goes wrong.
         """
         if self.connection is None:
-            try:
-                self.open_connection()
-            except OperationalError:
-                raise
-        try:
-            cursor = self.connection.cursor()
-            cursor.execute('SELECT SQLITE_VERSION()')
-            data = cursor.fetchone()
-            LOGGER.debug("SQLite version: %s" % data)
-            # Check if we have some tables, if not create them
-            sql = 'select sql from sqlite_master where type = \'table\';'
-            cursor.execute(sql)
-            data = cursor.fetchone()
-            LOGGER.debug("Tables: %s" % data)
-            if data is None:
-                LOGGER.debug('No tables found')
-                sql = (
-                    'create table metadata (hash varchar(32) primary key,'
-                    'json text, xml text);')
-                LOGGER.debug(sql)
-                cursor.execute(sql)
-                # data = cursor.fetchone()
-                cursor.fetchone()
-            else:
-                LOGGER.debug('metadata table already exists')
-
-            return cursor
-        except sqlite.Error as e:
-            LOGGER.debug("Error %s:" % e.args[0])
-            raise
+            self.open_connection()
+        return self.connection.cursor()
 
     @staticmethod
     def are_metadata_file_based(layer):
@@ -225,20 +218,18 @@ class MetadataDbIO(QObject):
 
         :type uri: str
         """
+        batch = self._batch()
+        if batch is not None:
+            batch.pop(uri, None)
+
         hash_value = self.hash_for_datasource(uri)
         try:
             cursor = self.get_cursor()
-            # now see if we have any data for our hash
-            sql = 'delete from metadata where hash = \'' + hash_value + '\';'
-            cursor.execute(sql)
-            self.connection.commit()
+            with self.connection:
+                cursor.execute(
+                    'delete from metadata where hash = ?;', (hash_value, ))
         except sqlite.Error as e:
             LOGGER.debug("SQLITE Error %s:" % e.args[0])
-            self.connection.rollback()
-        except Exception as e:
-            LOGGER.debug("Error %s:" % e.args[0])
-            self.connection.rollback()
-            raise
         finally:
             self.close_connection()
 
@@ -249,6 +240,9 @@ class MetadataDbIO(QObject):
         in a local SQLite database for the metadata. If there is an existing
         record it will be updated, if not, a new one will be created.
 
+        Inside metadata_db_transaction, the metadata is written at the end
+        of the transaction.
+
         .. seealso:: read_metadata_from_uri, delete_metadata_for_uri
 
         :param uri: A layer uri. e.g. ```dbname=\'osm\' host=localhost
@@ -265,36 +259,42 @@ class MetadataDbIO(QObject):
         :type xml: str
 
         """
-        hash_value = self.hash_for_datasource(uri)
+        batch = self._batch()
+        if batch is not None:
+            batch[uri] = (json, xml)
+            return
+        self.write_many([(uri, json, xml)])
+
+    def write_many(self, metadata):
+        """Write the metadata of many URIs in a single transaction.
+
+        .. versionadded:: 5.0
+
+        .. seealso:: write_metadata_for_uri, read_many
+
+        :param metadata: Tuples with the layer uri, the JSON str and the XML
+            str.
+        :type metadata: list
+
+        :raises: An sqlite.Error if the metadata can't be written, nothing
+            is written in this case.
+        """
+        rows = [
+            (self.hash_for_datasource(uri), json, xml)
+            for uri, json, xml in metadata]
+        if not rows:
+            return
         try:
             cursor = self.get_cursor()
-            # now see if we have any data for our hash
-            sql = (
-                'select json, xml from metadata where hash = \'%s\';' %
-                hash_value)
-            cursor.execute(sql)
-            data = cursor.fetchone()
-            if data is None:
-                # insert a new rec
-                # cursor.execute('insert into metadata(hash) values(:hash);',
-                #             {'hash': hash_value})
-                cursor.execute(
-                    'insert into metadata(hash, json, xml ) '
-                    'values(:hash, :json, :xml);',
-                    {'hash': hash_value, 'json': json, 'xml': xml})
-                self.connection.commit()
-            else:
-                # update existing rec
-                cursor.execute(
-                    'update metadata set json=?, xml=? where hash = ?;',
-                    (json, xml, hash_value))
-                self.connection.commit()
+            # Commit at the end, or roll back everything.
+            with self.connection:
+                cursor.executemany(
+                    'insert or replace into metadata(hash, json, xml) '
+                    'values(?, ?, ?);',
+                    rows)
         except sqlite.Error:
             LOGGER.exception('Error writing metadata to SQLite db %s' %
                              self.metadata_db_path)
-            # See if we can roll back.
-            if self.connection is not None:
-                self.connection.rollback()
             raise
         finally:
             self.close_connection()
@@ -325,38 +325,147 @@ class MetadataDbIO(QObject):
 
         :raises: metadataNotFoundError if the metadata is not found.
         """
+        metadata = self.read_many([uri], metadata_format)
+        if uri not in metadata:
+            raise HashNotFoundError(
+                'No hash found for %s' % self.hash_for_datasource(uri))
+        return metadata[uri]
+
+    def read_many(self, uris, metadata_format):
+        """Get the metadata of many URIs with one query.
+
+        .. versionadded:: 5.0
+
+        .. seealso:: read_metadata_from_uri, write_many
+
+        :param uris: The layer uris.
+        :type uris: list
 
-        allowed_formats = ['json', 'xml']
-        if metadata_format not in allowed_formats:
+        :param metadata_format: The format of the metadata to retrieve.
+            Valid types are: 'json', 'xml'
+        :type metadata_format: str
+
+        :returns: The metadata str of each uri found in the DB.
+        :rtype: dict
+        """
+        if metadata_format not in select_metadata_sql:
             message = 'Metadata format %s is not valid. Valid types: %s' % (
-                metadata_format, allowed_formats)
+                metadata_format, sorted(select_metadata_sql))
             raise RuntimeError('%s' % message)
 
-        hash_value = self.hash_for_datasource(uri)
-        try:
-            self.open_connection()
-        except OperationalError:
-            raise
+        result = {}
+        hashes = {}
+        batch = self._batch() or {}
+        for uri in uris:
+            if uri in batch:
+                # Not written yet.
+                json, xml = batch[uri]
+                result[uri] = str(json if metadata_format == 'json' else xml)
+            else:
+                hashes[self.hash_for_datasource(uri)] = uri
+
+        hash_values = list(hashes)
         try:
             cursor = self.get_cursor()
-            # now see if we have any data for our hash
-            sql = (
-                'select %s from metadata where hash = \'%s\';' % (
-                    metadata_format, hash_value))
-            cursor.execute(sql)
-            data = cursor.fetchone()
-            if data is None:
-                raise HashNotFoundError('No hash found for %s' % hash_value)
-            data = data[0]  # first field
-
-            # get the ISO out of the DB
-            metadata = str(data)
-            return metadata
-
+            for i in range(0, len(hash_values), max_sql_variables):
+                chunk = hash_values[i:i + max_sql_variables]
+                sql = select_metadata_sql[metadata_format] % ', '.join(
+                    '?' * len(chunk))
+                cursor.execute(sql, chunk)
+                for hash_value, data in cursor.fetchall():
+                    # get the ISO out of the DB
+                    result[hashes[hash_value]] = str(data)
         except sqlite.Error as e:
             LOGGER.debug("Error %s:" % e.args[0])
-        except Exception as e:
-            LOGGER.debug("Error %s:" % e.args[0])
-            raise
         finally:
             self.close_connection()
+        return result
+
+    def _batch(self):
+        """The metadata waiting for the end of metadata_db_transaction.
+
+        :returns: The JSON and XML by uri, None outside of a transaction.
+        :rtype: OrderedDict
+        """
+        batches = getattr(_pool, 'batches', None)
+        if batches is None:
+            return None
+        return batches.setdefault(self.metadata_db_path, OrderedDict())
+
+
+def pooled_connection(path):
+    """Get the connection of the current thread to a metadata database.
+
+    The database is opened the first time with the write-ahead log, so
+    readers in other processes are not blocked by a writer. The metadata
+    table is created if needed.
+
+    .. versionadded:: 5.0
+
+    :param path: The database path.
+    :type path: str
+
+    :returns: The connection.
+    :rtype: sqlite.Connection
+    """
+    connections = getattr(_pool, 'connections', None)
+    if connections is None:
+        connections = _pool.connections = {}
+    connection = connections.get(path)
+    if connection is None:
+        connection = sqlite.connect(path, timeout=busy_timeout)
+        try:
+            connection.execute('PRAGMA journal_mode=WAL;')
+            connection.execute('PRAGMA synchronous=NORMAL;')
+        except sqlite.Error as e:
+            # For instance on a read only file system.
+            LOGGER.debug('Write-ahead log not available: %s' % e)
+        with connection:
+            connection.execute(
+                'create table if not exists metadata ('
+                'hash varchar(32) primary key, json text, xml text);')
+        connections[path] = connection
+    return connection
+
+
+def close_connections():
+    """Close the connections of the current thread to metadata databases.
+
+    .. versionadded:: 5.0
+    """
+    connections = getattr(_pool, 'connections', None) or {}
+    for connection in list(connections.values()):
+        connection.close()
+    _pool.connections = {}
+
+
+@contextmanager
+def metadata_db_transaction():
+    """Write the metadata in the DB in a single transaction at the end.
+
+    Metadata written with write_metadata_for_uri in this context, in this
+    thread, is kept in memory and written with write_many when the
+    outermost context ends. If an exception is raised in the context, the
+    metadata is not written.
+
+    .. versionadded:: 5.0
+    """
+    if getattr(_pool, 'batches', None) is not None:
+        # Already in a transaction.
+        yield
+        return
+
+    _pool.batches = OrderedDict()
+    try:
+        yield
+        batches = _pool.batches
+        _pool.batches = None
+        for path, batch in list(batches.items()):
+            if not batch:
+                continue
+            db_io = MetadataDbIO()
+            db_io.set_metadata_db_path(path)
+            db_io.write_many(
+                [(uri, json, xml) for uri, (json, xml) in batch.items()])
+    finally:
+        _pool.batches = None
@@ -2,6 +2,7 @@
 """Test Generic Metadata."""
 
 import os
+import shutil
 import uuid
 from unittest import TestCase
 
@@ -102,6 +103,24 @@ class TestGenericMetadata(TestCase):
         finally:
             metadata.db_io.delete_metadata_for_uri(layer_uri)
 
+    def test_write_keywords_no_metadata(self):
+        """Test write keywords for a layer without any xml file."""
+        layer_uri = unique_filename(suffix='.shp', dir=TEMP_DIR)
+        shutil.copy(EXISTING_NO_METADATA, layer_uri)
+        xml_uri = os.path.splitext(layer_uri)[0] + '.xml'
+        self.assertFalse(os.path.isfile(xml_uri))
+
+        metadata = GenericLayerMetadata(layer_uri)
+        metadata.update_from_dict({
+            'layer_purpose': 'exposure',
+            'title': 'No metadata',
+        })
+        metadata.write_to_file(xml_uri)
+
+        metadata = GenericLayerMetadata(layer_uri, xml_uri)
+        self.assertEqual(metadata.layer_purpose, 'exposure')
+        self.assertEqual(metadata.title, 'No metadata')
+
     def generate_test_metadata(self, layer=None):
         # if you change this you need to update GENERIC_TEST_FILE_JSON
         if layer is None:
@@ -0,0 +1,90 @@
+# coding=utf-8
+"""Test Metadata DB IO."""
+
+import os
+import sqlite3
+import uuid
+from unittest import TestCase
+
+from safe.common.exceptions import HashNotFoundError
+from safe.common.utilities import unique_filename
+from safe.metadata.metadata_db_io import (
+    MetadataDbIO, close_connections, metadata_db_transaction)
+from safe.metadata.test import TEMP_DIR
+
+__copyright__ = "Copyright 2018, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+class TestMetadataDbIO(TestCase):
+
+    """Test for the metadata DB."""
+
+    def setUp(self):
+        self.path = unique_filename(suffix='.db', dir=TEMP_DIR)
+        self.db_io = MetadataDbIO()
+        self.db_io.set_metadata_db_path(self.path)
+
+    def tearDown(self):
+        close_connections()
+        for suffix in ['', '-wal', '-shm']:
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def count(self):
+        """Count the rows committed in the DB."""
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute(
+                'select count(*) from metadata;').fetchone()[0]
+        finally:
+            connection.close()
+
+    def test_read_write_delete(self):
+        """Test we can write, read and delete the metadata of a URI."""
+        uri = 'test_db_layer-%s' % uuid.uuid4()
+        self.db_io.write_metadata_for_uri(uri, '{}', '<xml/>')
+        self.assertEqual(self.db_io.read_metadata_from_uri(uri, 'json'), '{}')
+        self.assertEqual(
+            self.db_io.read_metadata_from_uri(uri, 'xml'), '<xml/>')
+
+        self.db_io.write_metadata_for_uri(uri, '{"a": 1}', '<xml/>')
+        self.assertEqual(
+            self.db_io.read_metadata_from_uri(uri, 'json'), '{"a": 1}')
+        self.assertEqual(self.count(), 1)
+
+        self.db_io.delete_metadata_for_uri(uri)
+        self.assertRaises(
+            HashNotFoundError,
+            self.db_io.read_metadata_from_uri, uri, 'json')
+        self.assertRaises(
+            RuntimeError, self.db_io.read_many, [uri], 'html')
+
+    def test_transaction(self):
+        """Test the metadata is written at the end of the transaction."""
+        uris = ['test_db_layer-%s' % i for i in range(1000)]
+        with metadata_db_transaction():
+            for uri in uris:
+                self.db_io.write_metadata_for_uri(uri, uri, None)
+            # It's not committed yet, but we can read it.
+            self.assertEqual(
+                self.db_io.read_metadata_from_uri(uris[0], 'json'), uris[0])
+            self.assertEqual(self.count(), 0)
+        self.assertEqual(self.count(), len(uris))
+
+        metadata = self.db_io.read_many(uris + ['not_a_layer'], 'json')
+        self.assertEqual(len(metadata), len(uris))
+        self.assertEqual(metadata[uris[-1]], uris[-1])
+
+        # Nothing is written if the transaction fails.
+        uri = 'test_db_layer-%s' % uuid.uuid4()
+        with self.assertRaises(ValueError):
+            with metadata_db_transaction():
+                self.db_io.write_metadata_for_uri(uri, uri, None)
+                raise ValueError
+        self.assertEqual(self.count(), len(uris))
+        self.assertRaises(
+            HashNotFoundError,
+            self.db_io.read_metadata_from_uri, uri, 'json')
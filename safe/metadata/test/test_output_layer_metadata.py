@@ -32,7 +32,7 @@ from qgis.PyQt.QtCore import QDate, QUrl
 from safe.common.exceptions import MetadataReadError
 from safe.common.utilities import unique_filename
 
-from safe.metadata import OutputLayerMetadata
+from safe.metadata import GenericLayerMetadata, OutputLayerMetadata
 from safe.metadata.test import (
     TEMP_DIR,
     EXISTING_IMPACT_JSON,
@@ -158,6 +158,26 @@ class TestImpactMetadata(TestCase):
         # TODO (MB): add more checks
         self.assertEqual(generated_metadata.get_xml_value('license'), 'GPLv2')
 
+    def test_xml_read_once(self):
+        """Test the XML is decoded when used and is not parsed again."""
+        generic_metadata = GenericLayerMetadata(
+            EXISTING_IMPACT_FILE, xml_uri=EXISTING_IMPACT_XML)
+        self.assertIn('license', generic_metadata._pending)
+        self.assertEqual(generic_metadata.license, 'GPLv2')
+        self.assertNotIn('license', generic_metadata._pending)
+
+        generated_metadata = OutputLayerMetadata(
+            EXISTING_IMPACT_FILE,
+            xml_uri=EXISTING_IMPACT_XML,
+            xml_index=generic_metadata.xml_index)
+        self.assertIs(
+            generated_metadata.xml_index, generic_metadata.xml_index)
+
+        expected_metadata = OutputLayerMetadata(
+            EXISTING_IMPACT_FILE, xml_uri=EXISTING_IMPACT_XML)
+        self.assertEqual(generated_metadata.dict, expected_metadata.dict)
+        self.assertEqual(generated_metadata._pending, {})
+
     def test_xml_to_json_to_xml(self):
         generated_metadata = OutputLayerMetadata(
             EXISTING_IMPACT_FILE, xml_uri=EXISTING_IMPACT_XML
@@ -103,6 +103,82 @@ def read_property_from_xml(root, path):
         return None
 
 
+class XmlIndex(object):
+
+    """Index of the elements of an XML document by their path.
+
+    The document is walked once. Each path, like the paths of the metadata
+    properties, is then found without searching the document again. Only
+    simple paths of tags are indexed, other paths are searched in the
+    document.
+
+    .. versionadded:: 5.0
+    """
+
+    def __init__(self, root):
+        """Constructor.
+
+        :param root: The parsed document.
+        :type root: ElementTree.ElementTree, ElementTree.Element
+        """
+        self.root = root
+        if hasattr(root, 'getroot'):
+            root = root.getroot()
+        self._element = root
+
+        prefixes = {
+            '{%s}' % uri: '%s:' % prefix for prefix, uri in XML_NS.items()}
+        self._elements = {}
+        # Walk in the document order, the first element of a path is kept.
+        stack = [(child, '') for child in reversed(list(root))]
+        while stack:
+            element, parent_path = stack.pop()
+            tag = element.tag
+            if not isinstance(tag, str):
+                # A comment or a processing instruction.
+                continue
+            if tag.startswith('{'):
+                namespace, local_name = tag[1:].split('}', 1)
+                prefix = prefixes.get('{%s}' % namespace)
+                if prefix:
+                    tag = prefix + local_name
+            path = parent_path + '/' + tag if parent_path else tag
+            self._elements.setdefault(path, element)
+            stack.extend(
+                (child, path) for child in reversed(list(element)))
+
+    def find(self, path):
+        """Find the first element at a path.
+
+        :param path: The path relative to the root, with namespace prefixes.
+        :type path: str
+
+        :return: The element, None if there isn't any.
+        :rtype: ElementTree.Element
+        """
+        if '[' in path or '.' in path or '*' in path:
+            return self._element.find(path, XML_NS)
+        return self._elements.get(path)
+
+    def text(self, path):
+        """Get the text of the element at a path.
+
+        Whitespaces, tabs and new lines are trimmed, as with
+        read_property_from_xml.
+
+        :param path: The path relative to the root, with namespace prefixes.
+        :type path: str
+
+        :return: The text of the element at the given path.
+        :rtype: str, None
+        """
+        element = self.find(path)
+        try:
+            return element.text.strip(' \t\n\r')
+        except AttributeError:
+            return None
+
+
 def prettify_xml(xml_str):
     """
     returns prettified XML without blank lines
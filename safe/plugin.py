@@ -4,7 +4,6 @@
 import sys
 import os
 from functools import partial
-from distutils.version import StrictVersion
 
 # noinspection PyUnresolvedReferences
 import qgis  # NOQA pylint: disable=unused-import
@@ -30,7 +29,6 @@ from qgis.PyQt.QtWidgets import (
 from qgis.PyQt.QtGui import QIcon
 
 from safe.common.custom_logging import LOGGER
-from safe.utilities.expressions import qgis_expressions
 from safe.definitions.versions import inasafe_release_status, inasafe_version
 from safe.common.exceptions import (
     KeywordNotFoundError,
@@ -40,13 +38,7 @@ from safe.common.exceptions import (
 from safe.common.signals import send_static_message
 from safe.utilities.resources import resources_path
 from safe.utilities.gis import is_raster_layer
-from safe.definitions.layer_purposes import (
-    layer_purpose_exposure, layer_purpose_hazard
-)
-from safe.definitions.utilities import get_field_groups
 from safe.utilities.i18n import tr
-from safe.utilities.keyword_io import KeywordIO
-from safe.utilities.utilities import is_keyword_version_supported
 from safe.utilities.settings import setting, set_setting
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
@@ -559,6 +551,9 @@ class Plugin():
         self.toolbar = self.iface.addToolBar('InaSAFE')
         self.toolbar.setObjectName('InaSAFEToolBar')
         self.dock_widget = None
+        # Importing the expressions registers them in QGIS.
+        from safe.utilities.expressions import qgis_expressions
+        qgis_expressions()
         # Now create the actual dock
         self._create_dock()
         # And all the menu actions
@@ -667,6 +662,7 @@ class Plugin():
         self.iface.currentLayerChanged.disconnect(self.layer_changed)
 
         # Unload QGIS expressions loaded by the plugin.
+        from safe.utilities.expressions import qgis_expressions
         for qgis_expression in list(qgis_expressions().keys()):
             QgsExpression.unregisterFunction(qgis_expression)
 
@@ -798,6 +794,8 @@ class Plugin():
         """Show the welcome message."""
         # import here only so that it is AFTER i18n set up
         from safe.gui.tools.options_dialog import OptionsDialog
+        # distutils is slow to import, we only need it here.
+        from distutils.version import StrictVersion
 
         # Do not show by default
         show_message = False
@@ -992,6 +990,14 @@ class Plugin():
         :param layer: The layer that is now active.
         :type layer: QgsMapLayer
         """
+        # Imported when the first layer is selected, not at startup.
+        from safe.definitions.layer_purposes import (
+            layer_purpose_exposure, layer_purpose_hazard
+        )
+        from safe.definitions.utilities import get_field_groups
+        from safe.utilities.keyword_io import KeywordIO
+        from safe.utilities.utilities import is_keyword_version_supported
+
         if not layer:
             enable_keyword_wizard = False
         elif not hasattr(layer, 'providerType'):
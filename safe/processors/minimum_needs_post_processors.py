@@ -2,11 +2,14 @@
 
 """Postprocessors about additional items in minimum needs."""
 
-from safe.definitions import minimum_needs_fields, displaced_field
 from safe.definitions.concepts import concepts
-from safe.definitions.fields import additional_rice_count_field
 from safe.definitions.fields import (
-    pregnant_displaced_count_field, lactating_displaced_count_field)
+    additional_rice_count_field,
+    displaced_field,
+    pregnant_displaced_count_field,
+    lactating_displaced_count_field,
+)
+from safe.definitions.minimum_needs import minimum_needs_fields
 from safe.processors.post_processor_inputs import (
     constant_input_type,
     field_input_type,
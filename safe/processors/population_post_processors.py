@@ -66,6 +66,7 @@ from safe.processors.post_processor_inputs import (
     keyword_input_type,
     dynamic_field_input_type,
     keyword_value_expected,
+    hazard_class_resolver_input_type,
 )
 from safe.utilities.i18n import tr
 
@@ -106,6 +107,9 @@ post_processor_displaced_ratio = {
                 'field_param': exposure_population['key'],
                 'type': dynamic_field_input_type,
             }],
+        'resolver': {
+            'type': hazard_class_resolver_input_type,
+        },
     },
     'output': {
         'population_displacement_ratio': {
@@ -202,6 +206,9 @@ post_processor_fatality_ratio = {
             'value': ['hazard_keywords', 'classification'],
             'expected_value': earthquake_mmi_scale['key']
         },
+        'resolver': {
+            'type': hazard_class_resolver_input_type,
+        },
     },
     'output': {
         'fatality_ratio': {
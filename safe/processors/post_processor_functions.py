@@ -171,7 +171,11 @@ def calculate_cardinality(
 
 # This postprocessor function is also used in the aggregation_summary
 def post_processor_affected_function(
-        exposure=None, hazard=None, classification=None, hazard_class=None):
+        exposure=None,
+        hazard=None,
+        classification=None,
+        hazard_class=None,
+        resolver=None):
     """Private function used in the affected postprocessor.
 
     It returns a boolean if it's affected or not, or not exposed.
@@ -188,11 +192,18 @@ def post_processor_affected_function(
     :param hazard_class: The hazard class of the feature.
     :type hazard_class: str
 
+    :param resolver: Optional lookup tables of the analysis.
+    :type resolver: safe.definitions.utilities.HazardClassResolver
+
     :return: If this hazard class is affected or not. It can be `not exposed`.
         The not exposed value returned is the key defined in
         `hazard_classification.py` at the top of the file.
     :rtype: bool,'not exposed'
     """
+    if resolver:
+        return resolver.affected(
+            exposure, hazard, classification, hazard_class)
+
     if exposure == exposure_population['key']:
         affected = is_affected(
             hazard, classification, hazard_class)
@@ -214,7 +225,11 @@ def post_processor_affected_function(
 
 
 def post_processor_population_displacement_function(
-        hazard=None, classification=None, hazard_class=None, population=None):
+        hazard=None,
+        classification=None,
+        hazard_class=None,
+        population=None,
+        resolver=None):
     """Private function used in the displacement postprocessor.
 
     :param hazard: The hazard to use.
@@ -230,16 +245,24 @@ def post_processor_population_displacement_function(
         condition for the postprocessor to run.
     :type population: float, int
 
+    :param resolver: Optional lookup tables of the analysis.
+    :type resolver: safe.definitions.utilities.HazardClassResolver
+
     :return: The displacement ratio for a given hazard class.
     :rtype: float
     """
     _ = population  # NOQA
 
+    if resolver:
+        return resolver.displacement_rate(
+            hazard, classification, hazard_class)
+
     return get_displacement_rate(hazard, classification, hazard_class)
 
 
 def post_processor_population_fatality_function(
-        classification=None, hazard_class=None, population=None):
+        classification=None, hazard_class=None, population=None,
+        resolver=None):
     """Private function used in the fatality postprocessor.
 
     :param classification: The hazard classification to use.
@@ -252,10 +275,16 @@ def post_processor_population_fatality_function(
         condition for the postprocessor to run.
     :type population: float, int
 
+    :param resolver: Optional lookup tables of the analysis.
+    :type resolver: safe.definitions.utilities.HazardClassResolver
+
     :return: The displacement ratio for a given hazard class.
     :rtype: float
     """
     _ = population  # NOQA
+    if resolver:
+        return resolver.fatality_rate(classification, hazard_class)
+
     for hazard in hazard_classes_all:
         if hazard['key'] == classification:
             classification = hazard['classes']
@@ -52,6 +52,13 @@ layer_property_input_type = {
         'This type of input takes it\'s value from a layer property. For '
         'example the layer Coordinate Reference System of the layer.')
 }
+hazard_class_resolver_input_type = {
+    'key': 'hazard_class_resolver',
+    'description': tr(
+        'This type of input takes the hazard class lookup tables of the '
+        'analysis, built once from the population preference and the hazard '
+        'classifications.')
+}
 post_processor_input_types = [
     constant_input_type,
     field_input_type,
@@ -59,7 +66,8 @@ post_processor_input_types = [
     keyword_input_type,
     needs_profile_input_type,
     geometry_property_input_type,
-    layer_property_input_type
+    layer_property_input_type,
+    hazard_class_resolver_input_type
 ]
 
 # Input values
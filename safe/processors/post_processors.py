@@ -37,6 +37,7 @@ from safe.processors.post_processor_inputs import (
     size_calculator_input_value,
     keyword_input_type,
     field_input_type,
+    hazard_class_resolver_input_type,
 )
 from safe.utilities.i18n import tr
 
@@ -256,6 +257,9 @@ post_processor_affected = {
             'type': keyword_input_type,
             'value': ['hazard_keywords', 'hazard'],
         },
+        'resolver': {
+            'type': hazard_class_resolver_input_type,
+        },
     },
     'output': {
         'affected': {
@@ -0,0 +1,124 @@
+# coding=utf-8
+
+"""Test the modules imported when QGIS is loading the plugin."""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from safe.common.utilities import safe_dir
+
+__copyright__ = "Copyright 2018, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+# Script run in a new Python process, the modules must not be imported yet.
+# QGIS is already loaded when the plugin is imported, it's not measured.
+import_script = """
+import json
+import sys
+import time
+
+import qgis.core
+
+before = set(sys.modules)
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'time': elapsed,
+    'modules': sorted(set(sys.modules) - before),
+}}))
+"""
+
+# Subsystems imported by the plugin only when they are used.
+deferred_modules = [
+    'safe.definitions.exposure',
+    'safe.definitions.exposure_classifications',
+    'safe.definitions.field_groups',
+    'safe.definitions.fields',
+    'safe.definitions.hazard',
+    'safe.definitions.hazard_classifications',
+    'safe.definitions.layer_purposes',
+    'safe.definitions.minimum_needs',
+    'safe.definitions.provenance',
+    'safe.gui.tools.wizard.wizard_dialog',
+    'safe.impact_function.impact_function',
+    'safe.report.impact_report',
+    'safe.report.report_metadata',
+    'safe.utilities.expressions',
+    'safe.utilities.keyword_io',
+    'distutils.version',
+]
+
+
+def import_in_new_process(module):
+    """Import a module in a new Python process.
+
+    :param module: The module name.
+    :type module: str
+
+    :return: The import time in seconds and the list of the new modules.
+    :rtype: (float, list)
+    """
+    environment = dict(os.environ)
+    python_path = [safe_dir(os.pardir)]
+    if environment.get('PYTHONPATH'):
+        python_path.append(environment['PYTHONPATH'])
+    environment['PYTHONPATH'] = os.pathsep.join(python_path)
+    output = subprocess.check_output(
+        [sys.executable, '-c', import_script.format(module=module)],
+        env=environment)
+    # The last line, the plugin might print other things.
+    result = json.loads(output.decode('utf-8').strip().split('\n')[-1])
+    return result['time'], result['modules']
+
+
+class TestStartup(unittest.TestCase):
+
+    """Test the modules imported when QGIS is loading the plugin."""
+
+    def test_deferred_imports(self):
+        """Test the heavy subsystems are not imported with the plugin."""
+        _, modules = import_in_new_process('safe.plugin')
+        self.assertIn('safe.plugin', modules)
+        for module in deferred_modules:
+            self.assertNotIn(module, modules)
+
+    def test_deferred_definitions(self):
+        """Test the definitions are imported on first use."""
+        _, modules = import_in_new_process('safe.definitions')
+        self.assertNotIn('safe.definitions.hazard_classifications', modules)
+
+        from safe import definitions
+        from safe.definitions.hazard import hazard_all
+        from safe.definitions.layer_purposes import layer_purposes
+        self.assertIs(definitions.hazard_all, hazard_all)
+        self.assertIs(definitions.layer_purposes, layer_purposes)
+        self.assertIn('hazard_all', dir(definitions))
+        with self.assertRaises(AttributeError):
+            _ = definitions.not_a_definition  # NOQA
+
+    @unittest.skipIf(
+        not os.environ.get('INASAFE_BENCHMARK'),
+        'Set INASAFE_BENCHMARK to run benchmarks.')
+    def test_startup_benchmark(self):
+        """Benchmark the import of the plugin."""
+        for module in ['safe', 'safe.plugin']:
+            durations = []
+            for _ in range(5):
+                duration, modules = import_in_new_process(module)
+                durations.append(duration)
+            safe_modules = [
+                name for name in modules if name.split('.')[0] == 'safe']
+            print(
+                'import %s: best of 5 %.3f s, %d modules loaded, '
+                '%d from InaSAFE' % (
+                    module, min(durations), len(modules), len(safe_modules)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,7 @@
 
 """Helpers to get/set default values."""
 
-from safe.definitions import GLOBAL, zero_default_value
+from safe.definitions.constants import GLOBAL, zero_default_value
 from safe.definitions.utilities import definition
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
@@ -4,9 +4,6 @@
 
 from inspect import getmembers
 
-from safe.gis import generic_expressions
-from safe.report.expressions import infographic, map_report, html_report
-
 __copyright__ = "Copyright 2016, The InaSAFE Project"
 __license__ = "GPL version 3"
 __email__ = "info@inasafe.org"
@@ -16,9 +13,15 @@ __revision__ = '$Format:%H$'
 def qgis_expressions():
     """Retrieve all QGIS Expressions provided by InaSAFE.
 
+    The expressions are registered in QGIS when their modules are imported.
+    These modules import the report, so they are only imported here.
+
     :return: Dictionary of expression name and the expression itself.
     :rtype: dict
     """
+    from safe.gis import generic_expressions
+    from safe.report.expressions import infographic, map_report, html_report
+
     all_expressions = {
         fct[0]: fct[1] for fct in getmembers(generic_expressions)
         if fct[1].__class__.__name__ == 'QgsExpressionFunction'}
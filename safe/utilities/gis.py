@@ -19,7 +19,6 @@ from qgis.core import (
     QgsRasterLayer,
 )
 
-from safe.utilities.metadata import copy_layer_keywords
 from safe.utilities.utilities import LOGGER
 
 
@@ -200,6 +199,8 @@ def clone_layer(layer, keep_selection=True):
         new_layer = QgsRasterLayer(
             layer.source(), layer.name(), layer.providerType())
 
+    # Localised import, the metadata imports the definitions.
+    from safe.utilities.metadata import copy_layer_keywords
     new_layer.keywords = copy_layer_keywords(layer.keywords)
 
     return layer
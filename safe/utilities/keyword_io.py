@@ -3,7 +3,11 @@
 
 
 import logging
+import os
+import threading
 from ast import literal_eval
+from collections import OrderedDict
+from copy import deepcopy
 from datetime import datetime
 
 from qgis.PyQt.QtCore import QObject
@@ -11,6 +15,7 @@ from qgis.PyQt.QtCore import QUrl, QDateTime
 from qgis.core import QgsMapLayer
 
 from safe import messaging as m
+from safe.common.exceptions import KeywordNotFoundError
 from safe.definitions.keyword_properties import property_extra_keywords
 from safe.definitions.utilities import definition
 from safe.messaging import styles
@@ -26,6 +31,130 @@ __revision__ = '$Format:%H$'
 LOGGER = logging.getLogger('InaSAFE')
 
 
+class KeywordCache(object):
+
+    """Process wide cache of the keywords read from XML files.
+
+    An entry is valid while the XML file next to the layer has the same
+    modification time and size. Layers without XML file, for instance layers
+    from a database, are not cached.
+
+    .. versionadded:: 5.0
+    """
+
+    def __init__(self, max_entries=1024):
+        """Constructor.
+
+        :param max_entries: The maximum number of layers in the cache.
+        :type max_entries: int
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def validation_key(source):
+        """Key to check if the keywords of a layer have changed.
+
+        :param source: The layer source.
+        :type source: str
+
+        :return: The source, the XML path, its modification time and its
+            size. None if there isn't any XML file.
+        :rtype: tuple
+        """
+        xml_path = os.path.splitext(source)[0] + '.xml'
+        # Remove the prefix for local file. For example csv.
+        file_prefix = 'file:'
+        if xml_path.startswith(file_prefix):
+            xml_path = xml_path[len(file_prefix):]
+        try:
+            stat = os.stat(xml_path)
+        except (OSError, ValueError):
+            return None
+        return source, xml_path, stat.st_mtime_ns, stat.st_size
+
+    def get(self, source):
+        """Get the keywords of a layer, if they are still valid.
+
+        :param source: The layer source.
+        :type source: str
+
+        :return: The validation key and the keywords, which must not be
+            modified. The keywords are None if they are not in the cache.
+        :rtype: (tuple, dict)
+        """
+        key = self.validation_key(source)
+        with self._lock:
+            entry = self._entries.get(source)
+            if key is not None and entry is not None and entry[0] == key:
+                self.hits += 1
+                self._entries.move_to_end(source)
+                return key, entry[1]
+            self.misses += 1
+        return key, None
+
+    def put(self, key, keywords):
+        """Save the keywords of a layer.
+
+        :param key: The validation key, from validation_key.
+        :type key: tuple
+
+        :param keywords: The keywords.
+        :type keywords: dict
+        """
+        if key is None:
+            return
+        with self._lock:
+            self._entries[key[0]] = (key, keywords)
+            self._entries.move_to_end(key[0])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, source=None):
+        """Remove the keywords of a layer from the cache.
+
+        Other sources using the same XML file are removed too.
+
+        :param source: The layer source. If None, the cache is emptied.
+        :type source: str
+        """
+        with self._lock:
+            if source is None:
+                self._entries.clear()
+                return
+            self._entries.pop(source, None)
+            xml_path = self.validation_key(source)
+            xml_path = xml_path[1] if xml_path else None
+            for other, (key, _) in list(self._entries.items()):
+                if key[1] == xml_path:
+                    del self._entries[other]
+
+    def statistics(self):
+        """Statistics about the use of the cache.
+
+        :return: The number of hits, misses and entries.
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+            }
+
+    def reset_statistics(self):
+        """Set the hits and misses counters to zero."""
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+keyword_cache = KeywordCache()
+
+
 # Notes(IS): This class can be replaced by safe.utilities.metadata
 # Some methods for viewing the keywords should be put in the other class
 class KeywordIO(QObject):
@@ -75,8 +204,22 @@ class KeywordIO(QObject):
         """
         source = layer.source()
 
-        # Try to read from ISO metadata first.
-        return read_iso19115_metadata(source, keyword)
+        key, keywords = keyword_cache.get(source)
+        if keywords is None:
+            # Try to read from ISO metadata first.
+            keywords = read_iso19115_metadata(source)
+            keyword_cache.put(key, keywords)
+
+        if keyword:
+            try:
+                return deepcopy(keywords[keyword])
+            except KeyError:
+                message = 'Keyword with key %s is not found. ' % keyword
+                message += 'Layer path: %s' % source
+                raise KeywordNotFoundError(message)
+
+        # Callers are free to modify their keywords.
+        return deepcopy(keywords)
 
     @staticmethod
     def write_keywords(layer, keywords):
@@ -177,6 +177,10 @@ def write_iso19115_metadata(layer_uri, keywords, version_35=False):
     else:
         metadata.write_to_db()
 
+    # Keyword IO is importing this module.
+    from safe.utilities.keyword_io import keyword_cache
+    keyword_cache.invalidate(layer_uri)
+
     return metadata
 
 
@@ -214,13 +218,28 @@ def read_iso19115_metadata(layer_uri, keyword=None, version_35=False):
         active_metadata_classes = METADATA_CLASSES35
 
     if metadata.layer_purpose in active_metadata_classes:
-        metadata = active_metadata_classes[
-            metadata.layer_purpose](layer_uri, xml_uri)
+        if version_35:
+            metadata = active_metadata_classes[
+                metadata.layer_purpose](layer_uri, xml_uri)
+        else:
+            # The XML is not parsed again.
+            metadata = active_metadata_classes[metadata.layer_purpose](
+                layer_uri, xml_uri, xml_index=metadata.xml_index)
 
-    # dictionary comprehension
+    if keyword and not version_35:
+        # Only this property is decoded.
+        try:
+            value = metadata.get_value(keyword)
+        except KeyError:
+            value = None
+        if value is not None and (
+                not xml_uri or metadata.keyword_version is not None):
+            return value
+
+    # Get dictionary keywords that has value != None
     keywords = {
-        x[0]: x[1]['value'] for x in list(metadata.dict['properties'].items())
-        if x[1]['value'] is not None}
+        name: prop.value for name, prop in list(metadata.properties.items())
+        if prop.value is not None}
     if 'keyword_version' not in list(keywords.keys()) and xml_uri:
         message = 'No keyword version found. Metadata xml file is invalid.\n'
         message += 'Layer uri: %s\n' % layer_uri
@@ -231,11 +250,6 @@ def read_iso19115_metadata(layer_uri, keyword=None, version_35=False):
             message += '%s: %s\n' % (k, v)
         raise MetadataReadError(message)
 
-    # Get dictionary keywords that has value != None
-    keywords = {
-        x[0]: x[1]['value'] for x in list(metadata.dict['properties'].items())
-        if x[1]['value'] is not None}
-
     if keyword:
         try:
             return keywords[keyword]
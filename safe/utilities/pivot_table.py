@@ -13,14 +13,22 @@ Contact : ole.moller.nielsen@gmail.com
 
 import json
 
+import numpy as np
+
 
 class FlatTable():
     """ Flat table object - used as a source of data for pivot tables.
     After constructing the object, repeatedly call "add_value" method
-    for each row of the input table. FlatTable stores only fields
-    that are important for the creation of pivot tables later. It also
-    aggregates values of rows where specified fields have the same value,
-    saving memory by not storing all source data.
+    for each row of the input table, or "add_values" once with whole
+    columns. FlatTable stores only fields that are important for the
+    creation of pivot tables later. It also aggregates values of rows where
+    specified fields have the same value, saving memory by not storing all
+    source data.
+
+    Each distinct value of a group is stored once and replaced by an integer
+    code, in order of first appearance. Sums are stored in a NumPy array with
+    one item for each distinct combination of codes. A sum of integers is
+    returned as an integer.
 
     An example of use for the flat table - afterwards it can be converted
     into a pivot table:
@@ -33,37 +41,188 @@ class FlatTable():
             hazard_type=f['hazard'],
             road_type=f['road'],
             zone=f['zone'])
+
+    Or with columns:
+
+    flat_table.add_values(
+        lengths, hazard_type=hazards, road_type=roads, district=districts)
     """
 
     def __init__(self, *args):
         """ Construct flat table, fields are passed"""
         self.groups = args
-        self.data = {}
-        # Store keys, allowing for consistent ordered
-        self.data_keys = []
+        self._clear()
+
+    def _clear(self):
+        """Remove all the data from the table."""
+        # For each group, the code of each value and the value of each code.
+        self._codes = [{} for _ in self.groups]
+        self._values = [[] for _ in self.groups]
+        # Position in the sums of each key, a key is a tuple of codes.
+        self._positions = {}
+        self._keys = []
+        self._sums = np.zeros(16, dtype=np.float64)
+        # If only integers were added to each sum.
+        self._integers = np.ones(16, dtype=bool)
+
+    def __len__(self):
+        """Number of distinct keys in the table."""
+        return len(self._keys)
+
+    def _code(self, group_index, value):
+        """Code of a group value, a new code is created if needed."""
+        codes = self._codes[group_index]
+        code = codes.get(value)
+        if code is None:
+            code = len(codes)
+            codes[value] = code
+            self._values[group_index].append(value)
+        return code
+
+    def _position(self, key):
+        """Position of a key in the sums, a new one is created if needed."""
+        position = self._positions.get(key)
+        if position is None:
+            position = len(self._keys)
+            self._positions[key] = position
+            self._keys.append(key)
+            if position == len(self._sums):
+                self._sums = np.concatenate(
+                    (self._sums, np.zeros_like(self._sums)))
+                self._integers = np.concatenate(
+                    (self._integers, np.ones_like(self._integers)))
+        return position
+
+    def _sum(self, position):
+        """Sum at a position, as an integer if only integers were added."""
+        value = self._sums[position].item()
+        if self._integers[position]:
+            return int(value)
+        return value
 
     def add_value(self, value, **kwargs):
-        key = tuple(kwargs[group] for group in self.groups)
-        if key not in self.data:
-            self.data[key] = 0
-        self.data_keys.append(key)
-        self.data[key] += value
+        key = tuple(
+            self._code(index, kwargs[group])
+            for index, group in enumerate(self.groups))
+        position = self._position(key)
+        self._sums[position] += value
+        if not isinstance(value, (int, np.integer)):
+            self._integers[position] = False
+
+    def add_values(self, values, **columns):
+        """Add many values at once.
+
+        :param values: The values to sum.
+        :type values: list, numpy.ndarray
+
+        :param columns: The value of each group, for each value. A single
+            value can be used if it's the same for all values.
+        :type columns: list, numpy.ndarray
+        """
+        array = np.asarray(values)
+        if array.dtype.kind in 'biu':
+            not_integers = None
+        elif isinstance(values, (list, tuple)):
+            # A list can mix integers and floats.
+            not_integers = np.array(
+                [not isinstance(value, (int, np.integer))
+                 for value in values],
+                dtype=bool)
+        else:
+            not_integers = np.ones(array.size, dtype=bool)
+        values = array.astype(np.float64).ravel()
+        if not len(values):
+            return
+
+        codes = np.empty((len(values), len(self.groups)), dtype=np.int64)
+        for index, group in enumerate(self.groups):
+            column = columns[group]
+            if isinstance(column, np.ndarray):
+                column = column.tolist()
+            if not isinstance(column, (list, tuple)):
+                codes[:, index] = self._code(index, column)
+                continue
+            # Distinct values, in order of first appearance.
+            mapping = {
+                value: self._code(index, value)
+                for value in dict.fromkeys(column)}
+            codes[:, index] = [mapping[value] for value in column]
+
+        # One integer for each key, the codes are digits in mixed radix.
+        radix = [max(len(codes), 1) for codes in self._codes]
+        if np.prod(radix, dtype=np.float64) < 2 ** 62:
+            combined = np.zeros(len(values), dtype=np.int64)
+            for index, size in enumerate(radix):
+                combined = combined * size + codes[:, index]
+            _, first, inverse = np.unique(
+                combined, return_index=True, return_inverse=True)
+            keys = codes[first]
+        else:
+            keys, first, inverse = np.unique(
+                codes, axis=0, return_index=True, return_inverse=True)
+        positions = np.empty(len(keys), dtype=np.int64)
+        for key_index in np.argsort(first).tolist():
+            positions[key_index] = self._position(
+                tuple(keys[key_index].tolist()))
+        self._sums[positions] += np.bincount(
+            inverse.ravel(), weights=values, minlength=len(keys))
+        if not_integers is not None:
+            self._integers[
+                positions[np.unique(inverse.ravel()[not_integers])]] = False
 
     def get_value(self, **kwargs):
         """Return the value for a specific key."""
-        key = tuple(kwargs[group] for group in self.groups)
-        if key not in self.data:
-            self.data[key] = 0
-        return self.data[key]
+        key = []
+        for index, group in enumerate(self.groups):
+            code = self._codes[index].get(kwargs[group])
+            if code is None:
+                return 0
+            key.append(code)
+        position = self._positions.get(tuple(key))
+        if position is None:
+            return 0
+        return self._sum(position)
 
     def group_values(self, group_name):
         """Return all distinct group values for given group."""
         group_index = self.groups.index(group_name)
-        values = []
-        for key in self.data_keys:
-            if key[group_index] not in values:
-                values.append(key[group_index])
-        return values
+        return list(self._values[group_index])
+
+    def code(self, group_name, value):
+        """Return the integer code of a group value.
+
+        :param group_name: The group name.
+        :type group_name: str
+
+        :param value: The group value.
+        :type value: object
+
+        :returns: The code, which is the position of the value in
+            group_values, or None if the value is not in the table.
+        :rtype: int
+        """
+        return self._codes[self.groups.index(group_name)].get(value)
+
+    def arrays(self):
+        """Return the keys and the sums as arrays.
+
+        :returns: Tuple with the codes, one row for each key and one column
+            for each group, and the sum of each key.
+        :rtype: (numpy.ndarray, numpy.ndarray)
+        """
+        codes = np.array(self._keys, dtype=np.int64).reshape(
+            len(self._keys), len(self.groups))
+        return codes, self._sums[:len(self._keys)].copy()
+
+    @property
+    def data(self):
+        """Dictionary of the sum for each key, a key is a tuple of values."""
+        data = {}
+        for position, key in enumerate(self._keys):
+            data[tuple(
+                self._values[index][code]
+                for index, code in enumerate(key))] = self._sum(position)
+        return data
 
     def to_json(self):
         """Return json representation of FlatTable
@@ -118,12 +277,17 @@ class FlatTable():
             ["primary", "medium", 20]
             ]
         """
-        self.groups = tuple(groups)
-        for item in data:
-            kwargs = {}
-            for i in range(len(self.groups)):
-                kwargs[self.groups[i]] = item[i]
-            self.add_value(item[-1], **kwargs)
+        if tuple(groups) != self.groups:
+            self.groups = tuple(groups)
+            self._clear()
+        if not data:
+            return self
+
+        columns = list(zip(*data))
+        kwargs = {}
+        for i in range(len(self.groups)):
+            kwargs[self.groups[i]] = list(columns[i])
+        self.add_values(columns[-1], **kwargs)
 
         return self
 
@@ -210,46 +374,19 @@ class PivotTable():
         if affected_columns is None:
             affected_columns = []
 
-        if len(flat_table.data) == 0:
+        if len(flat_table) == 0:
             raise ValueError('No input data')
 
-        if row_field is not None:
-            flat_row_index = flat_table.groups.index(row_field)
-        if column_field is not None:
-            flat_column_index = flat_table.groups.index(column_field)
+        codes, sums = flat_table.arrays()
+
+        # apply filtering
         if filter_field is not None:
-            flat_filter_index = flat_table.groups.index(filter_field)
-
-        sums = {}  # key = (row, column), value = sum
-        sums_affected = {}  # key = row, value = sum
-        for flat_key, flat_value in list(flat_table.data.items()):
-            # apply filtering
-            if filter_field is not None:
-                if flat_key[flat_filter_index] != filter_value:
-                    continue
-
-            if column_field is not None:
-                current_value = flat_key[flat_column_index]
-                if current_value in affected_columns:
-                    if row_field is not None:
-                        row_key = flat_key[flat_row_index]
-                    else:
-                        row_key = ''
-
-                    if row_key not in list(sums_affected.keys()):
-                        sums_affected[row_key] = 0
-                    sums_affected[row_key] += flat_value
-
-            if column_field is not None and row_field is not None:
-                key = flat_key[flat_row_index], flat_key[flat_column_index]
-            elif row_field is not None:
-                key = (flat_key[flat_row_index], '')
-            elif column_field is not None:
-                key = ('', flat_key[flat_column_index])
-
-            if key not in sums:
-                sums[key] = 0
-            sums[key] += flat_value
+            filter_code = flat_table.code(filter_field, filter_value)
+            selected = (
+                codes[:, flat_table.groups.index(filter_field)]
+                == filter_code)
+            codes = codes[selected]
+            sums = sums[selected]
 
         # TODO: configurable order of rows
         # - undefined
@@ -258,44 +395,60 @@ class PivotTable():
         # - custom (using function)
 
         # determine rows
-
+        # Codes are positions in group_values.
         if row_field is None:
             self.rows = ['']
+            row_positions = np.zeros(len(sums), dtype=np.int64)
         else:
             self.rows = flat_table.group_values(row_field)
+            row_positions = codes[:, flat_table.groups.index(row_field)]
 
         # determine columns
+        if column_field is None:
+            column_values = ['']
+            column_codes = np.zeros(len(sums), dtype=np.int64)
+        else:
+            column_values = flat_table.group_values(column_field)
+            column_codes = codes[:, flat_table.groups.index(column_field)]
+
         if columns is not None:
             self.columns = columns
+            lookup = np.array(
+                [columns.index(value) if value in columns else -1
+                 for value in column_values],
+                dtype=np.int64)
+            column_positions = lookup[column_codes]
+            missing = column_positions < 0
+            if missing.any():
+                value = column_values[column_codes[missing][0]]
+                raise ValueError('%r is not in list' % (value, ))
         elif column_field is None:
             self.columns = ['']
+            column_positions = column_codes
         else:
-            self.columns = flat_table.group_values(column_field)
+            self.columns = column_values
+            column_positions = column_codes
 
         self.affected_columns = affected_columns
 
-        self.total = 0.0
-        self.total_rows = [0.0] * len(self.rows)
-        self.total_columns = [0.0] * len(self.columns)
-        self.data = [[] for i in range(len(self.rows))]
-        for i in range(len(self.rows)):
-            self.data[i] = [0.0] * len(self.columns)
-
-        for (sum_row, sum_column), sum_value in list(sums.items()):
-            sum_row_index = self.rows.index(sum_row)
-            sum_column_index = self.columns.index(sum_column)
-            self.data[sum_row_index][sum_column_index] = sum_value
-
-            self.total_rows[sum_row_index] += sum_value
-            self.total_columns[sum_column_index] += sum_value
-            self.total += sum_value
-
-        self.total_rows_affected = [0.0] * len(self.rows)
-        self.total_affected = 0.0
-        for row, value in list(sums_affected.items()):
-            self.total_affected += value
-            sum_row_index = self.rows.index(row)
-            self.total_rows_affected[sum_row_index] = value
+        data = np.zeros((len(self.rows), len(self.columns)))
+        np.add.at(data, (row_positions, column_positions), sums)
+        self.data = data.tolist()
+        self.total_rows = data.sum(axis=1).tolist()
+        self.total_columns = data.sum(axis=0).tolist()
+        self.total = float(data.sum())
+
+        total_rows_affected = np.zeros(len(self.rows))
+        if column_field is not None:
+            affected = np.array(
+                [value in affected_columns for value in column_values],
+                dtype=bool)[column_codes]
+            np.add.at(
+                total_rows_affected,
+                row_positions[affected],
+                sums[affected])
+        self.total_rows_affected = total_rows_affected.tolist()
+        self.total_affected = float(total_rows_affected.sum())
 
         self.total_percent_rows_affected = [0.0] * len(self.rows)
         for row, value in enumerate(self.total_rows_affected):
@@ -2,55 +2,198 @@
 
 """This module contains logic for performance profiling.
 
-This code was taken from http://stackoverflow.com/a/3620972
+This code was first taken from http://stackoverflow.com/a/3620972
 
-"""
+Each call to a function decorated with ``profile`` is a step in a tree. The
+current step is kept in a context variable, so a new step is attached to its
+parent without looking at the call stack. When the memory_profile setting is
+enabled, each step records the resident memory of the process and the peak of
+the memory allocated by Python with tracemalloc.
 
+The tree can be exported as JSON or as a Chrome trace, which can be opened in
+chrome://tracing or https://ui.perfetto.dev.
+"""
 
-import inspect
+import json
+import os
+import threading
 import time
+import tracemalloc
+from contextvars import ContextVar
 from functools import wraps
 
-from safe.utilities.memory_checker import get_free_memory
 from safe.utilities.settings import setting
 
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    # Not available on Windows.
+    HAS_RESOURCE = False
+
 __copyright__ = "Vadim Shender (original poster in stack overflow), InaSAFE"
 __license__ = "Creative Commons"
 __email__ = "info@inasafe.org"
 __revision__ = '$Format:%H$'
 
+MEGABYTE = 1024 * 1024
+
+# Path to the memory statistics of this process on Linux.
+_statm_path = '/proc/self/statm'
+
+
+def resident_memory():
+    """Return the resident memory of this process.
+
+    It's read from /proc on Linux. Otherwise, the maximum resident memory is
+    used if the resource module is available.
+
+    ..versionadded:: 5.0
+
+    :return: The resident memory in MB, None if it's not available.
+    :rtype: float
+    """
+    try:
+        with open(_statm_path) as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / MEGABYTE
+    except (IOError, OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    if HAS_RESOURCE:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Bytes on MacOS, kilobytes otherwise.
+        if os.uname()[0] == 'Darwin':
+            return max_rss / MEGABYTE
+        return max_rss / 1024
+
+    return None
+
+
+def feature_count(value):
+    """Count the features of vector layers.
+
+    ..versionadded:: 5.0
+
+    :param value: A layer, or a list, tuple or dict of values.
+    :type value: object
+
+    :return: The number of features, None if there is no vector layer.
+    :rtype: int
+    """
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        counts = [feature_count(item) for item in value]
+        counts = [count for count in counts if count is not None]
+        return sum(counts) if counts else None
+    # We don't import QgsVectorLayer, the profiler must stay cheap.
+    if hasattr(value, 'featureCount') and hasattr(value, 'getFeatures'):
+        try:
+            count = value.featureCount()
+        except RuntimeError:
+            # The C++ object has been deleted.
+            return None
+        return count if count >= 0 else None
+    return None
+
 
 class Tree():
     """Internal representation of the tree."""
 
-    def __init__(self, key):
+    def __init__(self, key, parent=None, memory_profile=None):
+        """Constructor.
+
+        :param key: The name of the function.
+        :type key: str
 
+        :param parent: The parent step, None for the root.
+        :type parent: Tree
+
+        :param memory_profile: If the memory is recorded. If None, the
+            parent value or the memory_profile setting is used.
+        :type memory_profile: bool
+        """
         # Name of the current function
         self.key = key
-        self.parent = None
+        self.parent = parent
+        if memory_profile is None:
+            if parent is not None:
+                memory_profile = parent.memory_profile
+            else:
+                memory_profile = setting(
+                    key='memory_profile', expected_type=bool)
+        self.memory_profile = memory_profile
 
-        # Time of creation
-        self._start_time = time.time()
+        # Children
+        self.children = []
 
-        # Time at the end.
-        self._end_time = None
+        # Features of the vector layers in the arguments and the result.
+        self.input_features = None
+        self.output_features = None
 
-        if setting(key='memory_profile', expected_type=bool):
-            # memory at creation
-            self._start_memory = get_free_memory()
+        self.thread = threading.get_ident()
 
-            # memory at termination
-            self._end_memory = None
+        # Time of creation
+        self._start_time = time.time()
+        self._start_counter = time.perf_counter()
 
-        # Children
-        self.children = []
+        # Time at the end.
+        self._end_counter = None
+
+        # Resident memory in MB at the start and at the end.
+        self._start_memory = None
+        self._end_memory = None
+
+        # Memory allocated by Python in bytes, from tracemalloc.
+        self._start_traced = None
+        self._peak_traced = 0
+        self._tracing = False
+
+        if self.memory_profile:
+            self._start_memory = resident_memory()
+            if parent is None and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracing = True
+            if tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                if parent is not None:
+                    parent._update_peak(peak)
+                if hasattr(tracemalloc, 'reset_peak'):
+                    tracemalloc.reset_peak()
+                    peak = current
+                self._start_traced = current
+                self._peak_traced = peak
+
+    def _update_peak(self, peak):
+        """Keep the highest memory allocated by Python during this step.
+
+        :param peak: Allocated memory in bytes.
+        :type peak: int
+        """
+        self._peak_traced = max(self._peak_traced, peak)
 
     def ended(self):
         """We call this method when the function is finished."""
-        self._end_time = time.time()
+        self._end_counter = time.perf_counter()
+
+        if self.memory_profile:
+            self._end_memory = resident_memory()
+            if self._start_traced is not None and tracemalloc.is_tracing():
+                self._update_peak(tracemalloc.get_traced_memory()[1])
+                if self.parent is not None:
+                    self.parent._update_peak(self._peak_traced)
+            if self._tracing:
+                tracemalloc.stop()
+                self._tracing = False
+
+    @property
+    def is_running(self):
+        """If the function is still running.
 
-        if setting(key='memory_profile', expected_type=bool):
-            self._end_memory = get_free_memory()
+        ..versionadded:: 5.0
+        """
+        return self._end_counter is None
 
     @property
     def elapsed_time(self):
@@ -58,11 +201,9 @@ class Tree():
 
         This property might return None if the function is still running.
         """
-        if self._end_time:
-            elapsed_time = round(self._end_time - self._start_time, 3)
-            return elapsed_time
-        else:
+        if self._end_counter is None:
             return None
+        return round(self._end_counter - self._start_counter, 3)
 
     @property
     def memory_used(self):
@@ -73,22 +214,102 @@ class Tree():
         This property might return None if the function is still running.
 
         This function should help to show memory leaks or ram greedy code.
+
+        :return: The change of the resident memory of the process in MB.
+        :rtype: float
         """
-        if self._end_memory:
-            memory_used = self._end_memory - self._start_memory
-            return memory_used
-        else:
+        if self._end_memory is None or self._start_memory is None:
             return None
+        return round(self._end_memory - self._start_memory, 3)
+
+    @property
+    def memory_peak(self):
+        """To know the peak of the memory allocated by Python in the function.
+
+        ..versionadded:: 5.0
+
+        This property might return None if the function is still running.
+
+        :return: The peak in MB above the memory allocated at the start.
+        :rtype: float
+        """
+        if self.is_running or self._start_traced is None:
+            return None
+        return round(
+            (self._peak_traced - self._start_traced) / MEGABYTE, 3)
 
     def append(self, node):
-        """To append a new child."""
-        if node.parent == self.key and not self.elapsed_time:
-            self.children.append(node)
-        else:
-            # Recursive call
-            for child in self.children:
-                if not child.elapsed_time:
-                    child.append(node)
+        """To append a new child.
+
+        :param node: The new step.
+        :type node: Tree
+        """
+        node.parent = self
+        self.children.append(node)
+
+    def to_dict(self):
+        """Return the tree as a dictionary which can be saved in JSON.
+
+        ..versionadded:: 5.0
+
+        :return: The step and its children.
+        :rtype: dict
+        """
+        return {
+            'function': self.key,
+            'name': str(self),
+            'time': self.elapsed_time,
+            'memory': self.memory_used,
+            'memory_peak': self.memory_peak,
+            'input_features': self.input_features,
+            'output_features': self.output_features,
+            'children': [child.to_dict() for child in self.children],
+        }
+
+    def to_chrome_trace(self):
+        """Return the tree in the Chrome trace event format.
+
+        Each step is a complete event. The time is in microseconds from the
+        start of this step.
+
+        ..versionadded:: 5.0
+
+        :return: The trace with the key traceEvents.
+        :rtype: dict
+        """
+        events = []
+        pid = os.getpid()
+        start = self._start_counter
+
+        def add_events(tree):
+            end = tree._end_counter
+            if end is None:
+                end = time.perf_counter()
+            events.append({
+                'name': str(tree),
+                'cat': 'inasafe',
+                'ph': 'X',
+                'ts': round((tree._start_counter - start) * 1e6, 1),
+                'dur': round((end - tree._start_counter) * 1e6, 1),
+                'pid': pid,
+                'tid': tree.thread,
+                'args': {
+                    'function': tree.key,
+                    'memory': tree.memory_used,
+                    'memory_peak': tree.memory_peak,
+                    'input_features': tree.input_features,
+                    'output_features': tree.output_features,
+                },
+            })
+            for child in tree.children:
+                add_events(child)
+
+        add_events(self)
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'start_time': self._start_time},
+        }
 
     def __str__(self):
         # It might be a private function.
@@ -105,27 +326,36 @@ class Tree():
 
 ROOT = None
 
+# The step running in the current context.
+_current_step = ContextVar('current_step', default=None)
+
 
 def profile(fn):
     @wraps(fn)
     def with_profiling(*args, **kwargs):
         global ROOT
 
-        current_frame = inspect.currentframe()
-        parent_frame = inspect.getouterframes(current_frame)[1]
-        parent_name = parent_frame[3]
+        parent = _current_step.get()
+        if parent is None and ROOT is not None and ROOT.is_running:
+            # A thread started without our context, during the analysis.
+            parent = ROOT
 
-        current_step = Tree(fn.__name__)
-
-        if ROOT:
-            current_step.parent = parent_name
-            ROOT.append(current_step)
-        else:
+        current_step = Tree(fn.__name__, parent)
+        if parent is not None:
+            parent.append(current_step)
+        elif ROOT is None:
             ROOT = current_step
 
-        ret = fn(*args, **kwargs)
+        current_step.input_features = feature_count(
+            list(args) + list(kwargs.values()))
+        token = _current_step.set(current_step)
+        try:
+            ret = fn(*args, **kwargs)
+        finally:
+            _current_step.reset(token)
+            current_step.ended()
 
-        current_step.ended()
+        current_step.output_features = feature_count(ret)
         return ret
 
     return with_profiling
@@ -140,3 +370,26 @@ def profiling_log():
 def clear_prof_data():
     global ROOT
     ROOT = None
+
+
+def write_trace(tree, path, chrome_trace=True):
+    """Write the profiling tree in a JSON file.
+
+    ..versionadded:: 5.0
+
+    :param tree: The root of the profiling tree.
+    :type tree: Tree
+
+    :param path: The JSON file path.
+    :type path: str
+
+    :param chrome_trace: True for the Chrome trace event format, False for
+        the tree from Tree.to_dict.
+    :type chrome_trace: bool
+    """
+    if chrome_trace:
+        data = tree.to_chrome_trace()
+    else:
+        data = tree.to_dict()
+    with open(path, 'w') as json_file:
+        json.dump(data, json_file, indent=2)
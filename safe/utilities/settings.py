@@ -7,7 +7,7 @@ from collections import OrderedDict
 
 from qgis.PyQt.QtCore import QSettings
 
-from safe.definitions import APPLICATION_NAME
+from safe.definitions.constants import APPLICATION_NAME
 from safe.definitions.default_settings import inasafe_default_settings
 
 LOGGER = logging.getLogger("InaSAFE")
@@ -4,13 +4,15 @@ import unittest
 
 from qgis.core import QgsDataSourceUri, QgsVectorLayer
 
-from safe.common.exceptions import NoKeywordsFoundError
+from safe.common.exceptions import (
+    KeywordNotFoundError, NoKeywordsFoundError)
 from safe.definitions.constants import INASAFE_TEST
 from safe.test.utilities import (
     get_qgis_app,
     standard_data_path,
     clone_raster_layer, load_layer)
-from safe.utilities.keyword_io import KeywordIO
+from safe.utilities.keyword_io import KeywordIO, keyword_cache
+from safe.utilities.metadata import write_iso19115_metadata
 
 __copyright__ = "Copyright 2011, The InaSAFE Project"
 __license__ = "GPL version 3"
@@ -94,6 +96,45 @@ class KeywordIOTest(unittest.TestCase):
 
         self.assertDictEqual(keywords, expected_keywords)
 
+    def test_keyword_cache(self):
+        """Test the keywords are read once until they are written."""
+        layer = clone_raster_layer(
+            name='generic_continuous_flood',
+            extension='.asc',
+            include_keywords=True,
+            source_directory=standard_data_path('hazard'))
+        keyword_cache.invalidate()
+        keyword_cache.reset_statistics()
+
+        keywords = self.keyword_io.read_keywords(layer)
+        self.assertEqual(keyword_cache.statistics()['misses'], 1)
+
+        # The copy from the cache can be modified by the caller.
+        keywords['title'] = 'New title'
+        self.assertEqual(
+            self.keyword_io.read_keywords(layer, 'title'),
+            self.expected_raster_keywords['title'])
+        self.assertRaises(
+            KeywordNotFoundError,
+            self.keyword_io.read_keywords,
+            layer,
+            'not_a_keyword')
+        self.assertEqual(keyword_cache.statistics()['hits'], 2)
+
+        self.keyword_io.write_keywords(layer, keywords)
+        self.assertEqual(
+            self.keyword_io.read_keywords(layer, 'title'), 'New title')
+        self.assertDictEqual(
+            keyword_cache.statistics(),
+            {'hits': 2, 'misses': 2, 'entries': 1})
+
+        # Writing the metadata without Keyword IO removes the cache entry.
+        keywords['title'] = 'Another title'
+        write_iso19115_metadata(layer.source(), keywords)
+        self.assertEqual(keyword_cache.statistics()['entries'], 0)
+        self.assertEqual(
+            self.keyword_io.read_keywords(layer, 'title'), 'Another title')
+
     def test_read_keywordless_layer(self):
         """Test read 'keyword' file from keywordless layer.
         """
@@ -130,6 +130,21 @@ class PivotTableTest(unittest.TestCase):
             tuple(flat_table_dict['groups']), self.flat_table.groups)
         self.assertEqual(
             len(flat_table_dict['data']), len(self.flat_table.data))
+        # Sums of integers are still integers.
+        self.assertEqual(
+            json_string,
+            '{"groups": ["road_type", "hazard"], "data": '
+            '[["residential", "high", 0], ["residential", "medium", 30], '
+            '["residential", "low", 50], ["primary", "high", 10], '
+            '["primary", "medium", 20], ["secondary", "low", 40]]}')
+
+        # A float sum is kept in the round trip.
+        self.flat_table.add_value(0.5, road_type="primary", hazard="high")
+        json_string = self.flat_table.to_json()
+        flat_table = FlatTable().from_json(json_string)
+        self.assertEqual(flat_table.to_json(), json_string)
+        self.assertEqual(
+            flat_table.get_value(road_type="primary", hazard="high"), 10.5)
 
     def test_from_json(self):
         """Test FlatTable from_json method"""
@@ -202,6 +217,32 @@ class PivotTableTest(unittest.TestCase):
         self.assertEqual(flat_table.data[('primary', 'high')], 10)
         self.assertEqual(flat_table.data[('primary', 'medium')], 20)
 
+    def test_add_values(self):
+        """Test we can add whole columns to the FlatTable."""
+        flat_table = FlatTable("road_type", "hazard")
+        flat_table.add_values(
+            [0, 30, 50, 10, 20, 40],
+            road_type=[
+                "residential", "residential", "residential",
+                "primary", "primary", "secondary"],
+            hazard=["high", "medium", "low", "high", "medium", "low"])
+        self.assertEqual(flat_table.data, self.flat_table.data)
+        self.assertEqual(
+            flat_table.group_values('road_type'),
+            ['residential', 'primary', 'secondary'])
+
+        # A single value is used for all the rows.
+        flat_table.add_values([5, 5], road_type='primary', hazard='low')
+        self.assertEqual(
+            flat_table.get_value(road_type='primary', hazard='low'), 10)
+        self.assertEqual(
+            flat_table.get_value(road_type='unknown', hazard='low'), 0)
+
+        pivot_table = PivotTable(
+            flat_table, row_field="road_type", column_field="hazard")
+        self.assertEqual(
+            pivot_table.data, [[0, 30, 50], [10, 20, 10], [0, 0, 40]])
+
 
 if __name__ == '__main__':
     suite = unittest.makeSuite(PivotTableTest, 'test')
@@ -0,0 +1,110 @@
+# coding=utf-8
+
+"""Test for the profiling."""
+
+import json
+import os
+import threading
+import unittest
+
+from safe.definitions.constants import INASAFE_TEST
+from safe.test.utilities import get_qgis_app, load_test_vector_layer
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app(qsetting=INASAFE_TEST)
+
+from safe.common.utilities import unique_filename
+from safe.utilities.profiling import (
+    clear_prof_data, feature_count, profile, profiling_log, write_trace)
+from safe.utilities.settings import set_setting, setting
+
+__copyright__ = "Copyright 2018, The InaSAFE Project"
+__license__ = "GPL version 3"
+__email__ = "info@inasafe.org"
+__revision__ = '$Format:%H$'
+
+
+@profile
+def _child_step(layer):
+    """A profiled function returning its layer."""
+    return layer, bytearray(1024 * 1024)
+
+
+@profile
+def parent_step(layer):
+    """A profiled function with children in this thread and another one."""
+    _child_step(layer)
+    thread = threading.Thread(target=_child_step, args=(layer, ))
+    thread.start()
+    thread.join()
+    return layer
+
+
+class TestProfiling(unittest.TestCase):
+
+    """Test the profiling."""
+
+    def setUp(self):
+        self.memory_profile = setting('memory_profile', expected_type=bool)
+        set_setting('memory_profile', True)
+        clear_prof_data()
+
+    def tearDown(self):
+        set_setting('memory_profile', self.memory_profile)
+        clear_prof_data()
+
+    def test_profile(self):
+        """Test the tree of the steps."""
+        layer = load_test_vector_layer(
+            'gisv4', 'exposure', 'building-points.geojson')
+        count = layer.featureCount()
+        self.assertEqual(feature_count([layer, None, 'text']), count)
+        self.assertIsNone(feature_count('text'))
+
+        parent_step(layer)
+        root = profiling_log()
+        self.assertEqual(root.key, 'parent_step')
+        self.assertEqual(str(root), 'Parent step')
+        self.assertIsNotNone(root.elapsed_time)
+        self.assertEqual(root.input_features, count)
+        self.assertEqual(root.output_features, count)
+        self.assertIsNotNone(root.memory_peak)
+
+        # The step in the other thread is attached to the root.
+        self.assertEqual(len(root.children), 2)
+        for child in root.children:
+            self.assertIs(child.parent, root)
+            self.assertEqual(child.key, '_child_step')
+            self.assertEqual(child.output_features, count)
+            self.assertEqual(child.children, [])
+        self.assertGreaterEqual(root.memory_peak, 1)
+
+        # A new step after the end of the root is not in the tree.
+        _child_step(layer)
+        self.assertEqual(len(root.children), 2)
+
+    def test_write_trace(self):
+        """Test we can export the profiling as JSON."""
+        parent_step(None)
+        root = profiling_log()
+
+        path = unique_filename(suffix='.json')
+        write_trace(root, path)
+        with open(path) as json_file:
+            trace = json.load(json_file)
+        events = trace['traceEvents']
+        self.assertEqual(len(events), 3)
+        self.assertEqual(events[0]['name'], 'Parent step')
+        self.assertEqual(events[0]['ts'], 0)
+        self.assertEqual(events[0]['ph'], 'X')
+        self.assertIsNone(events[0]['args']['input_features'])
+        os.remove(path)
+
+        write_trace(root, path, chrome_trace=False)
+        with open(path) as json_file:
+            tree = json.load(json_file)
+        self.assertEqual(tree['function'], 'parent_step')
+        self.assertEqual(len(tree['children']), 2)
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,7 +25,6 @@ from safe.definitions.versions import (
 from safe.messaging import styles, Message
 from safe.messaging.error_message import ErrorMessage
 from safe.utilities.i18n import tr
-from safe.utilities.keyword_io import KeywordIO
 
 __copyright__ = "Copyright 2016, The InaSAFE Project"
 __license__ = "GPL version 3"
@@ -363,6 +362,8 @@ def monkey_patch_keywords(layer):
     :param layer: The layer to monkey patch keywords.
     :type layer: QgsMapLayer
     """
+    # Imported here, so importing safe doesn't load the keywords and report.
+    from safe.utilities.keyword_io import KeywordIO
     keyword_io = KeywordIO()
     try:
         layer.keywords = keyword_io.read_keywords(layer)